@@ -0,0 +1,115 @@
+import numpy as np
+from audio_decode import decode_pcm
+
+# =============== TRACK ALIGNMENT ENGINE ===============
+# Finds where the accompaniment sits inside the original mix so the player
+# can start both tracks on the same musical sample. Both tracks are decoded
+# once to low-rate mono PCM; ANALYSIS_WINDOWS windows spread over the song
+# are cross-correlated against the original in a single batched FFT
+# (GCC-PHAT, so the vocals and different mastering do not blur the peak).
+# A weighted line through the per-window lags gives the start offset and
+# the clock drift between the two files:
+#     original_time = accompaniment_time * (1 + drift) + offset
+
+ANALYSIS_RATE = 4000
+WINDOW_SECONDS = 12.0
+MAX_LAG_SECONDS = 8.0
+ANALYSIS_WINDOWS = 8
+MIN_CONFIDENCE = 8.0     # correlation peak over the window's noise floor (chance is ~5)
+MIN_DRIFT = 2e-5         # below this the line is indistinguishable from flat
+MAX_DRIFT = 5e-4         # 150 ms over five minutes; more means the pair does not match
+AGREEMENT_SECONDS = 0.1
+
+
+def window_starts(length, window, max_lag, count=ANALYSIS_WINDOWS):
+    """Accompaniment sample positions of the analysis windows"""
+    last = length - window
+    if last < 0:
+        return np.zeros(0, dtype=np.int64)
+    # Stay clear of the very start and end, where fades and silence live
+    margin = min(max_lag, last // 4)
+    return np.unique(np.linspace(margin, last - margin, count).astype(np.int64))
+
+
+def window_lags(original, accompaniment, starts, window, max_lag):
+    """Lag (samples) and confidence of each window, all windows in one FFT batch"""
+    span = window + 2 * max_lag
+    n_fft = 1 << int(np.ceil(np.log2(span + window)))
+
+    # Stack the windows: accompaniment rows and the wider original rows
+    # around the same position, zero padded where they run off either end
+    padded = np.concatenate([np.zeros(max_lag, np.float32), original,
+                             np.zeros(span, np.float32)])
+    acc_rows = accompaniment[starts[:, None] + np.arange(window)]
+    orig_rows = padded[starts[:, None] + np.arange(span)]
+    taper = np.hanning(window).astype(np.float32)
+    acc_rows = acc_rows * taper
+
+    # GCC-PHAT: whiten the cross spectrum so only the phase (timing) counts
+    cross = np.fft.rfft(orig_rows, n_fft, axis=1) * np.conj(np.fft.rfft(acc_rows, n_fft, axis=1))
+    cross /= np.maximum(np.abs(cross), 1e-12)
+    correlation = np.fft.irfft(cross, n_fft, axis=1)[:, :2 * max_lag + 1]
+
+    peaks = np.argmax(correlation, axis=1)
+    rows = np.arange(len(starts))
+    peak_values = correlation[rows, peaks]
+    noise = np.std(correlation, axis=1) + 1e-12
+    confidence = peak_values / noise
+
+    # Parabolic interpolation for sub-sample precision
+    left = correlation[rows, np.clip(peaks - 1, 0, correlation.shape[1] - 1)]
+    right = correlation[rows, np.clip(peaks + 1, 0, correlation.shape[1] - 1)]
+    curvature = left - 2 * peak_values + right
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shift = np.where(np.abs(curvature) > 1e-12, 0.5 * (left - right) / curvature, 0.0)
+    lags = peaks + np.clip(shift, -0.5, 0.5) - max_lag
+    return lags, confidence
+
+
+def align_signals(original, accompaniment, rate=ANALYSIS_RATE):
+    """Offset (s), drift and confidence of accompaniment inside original, or None"""
+    window = int(WINDOW_SECONDS * rate)
+    max_lag = int(MAX_LAG_SECONDS * rate)
+    length = min(len(original), len(accompaniment))
+    starts = window_starts(length, window, max_lag)
+    if len(starts) == 0:
+        return None
+
+    lags, confidence = window_lags(original, accompaniment, starts, window, max_lag)
+    good = confidence >= MIN_CONFIDENCE
+    if not np.any(good):
+        return None
+
+    times = starts[good] / rate
+    offsets = lags[good] / rate
+    weights = confidence[good]
+    # Discard windows that disagree with the consensus (repeated choruses
+    # can correlate with the wrong bar)
+    median = np.median(offsets)
+    keep = np.abs(offsets - median) < AGREEMENT_SECONDS
+    times, offsets, weights = times[keep], offsets[keep], weights[keep]
+    if len(times) < max(2, len(starts) // 3):
+        # Too few windows agree to trust the result (unrelated tracks?)
+        return None
+
+    drift = 0.0
+    offset = float(np.average(offsets, weights=weights))
+    if len(times) >= 3 and np.ptp(times) > 0:
+        slope, intercept = np.polyfit(times, offsets, 1, w=weights)
+        if MIN_DRIFT <= abs(slope) <= MAX_DRIFT:
+            drift, offset = float(slope), float(intercept)
+    return {
+        "offset": round(offset, 4),
+        "drift": drift,
+        "confidence": round(float(np.median(weights)), 2),
+        "windows": int(len(times)),
+    }
+
+
+def align_files(original_path, accompaniment_path):
+    """Decode both tracks and align them. Returns the align_signals() dict or None"""
+    original = decode_pcm(original_path, ANALYSIS_RATE)
+    accompaniment = decode_pcm(accompaniment_path, ANALYSIS_RATE)
+    if original is None or accompaniment is None:
+        return None
+    return align_signals(original, accompaniment)
@@ -1,144 +1,52 @@
+import startup_profile
+startup_profile.begin_run()
 import streamlit as st
 import os
-import base64
 import json
 from streamlit.components.v1 import html
 import hashlib
+from html import escape as html_escape
 from urllib.parse import unquote, quote
 import time
-import sqlite3
-from datetime import datetime
-from PIL import Image, ImageDraw
-import requests
-from io import BytesIO
 import subprocess
-import tempfile
-import numpy as np
-
-# =============== RESPONSIVE FIXES ===============
-st.markdown("""
-<style>
-/* Force mobile view for all devices */
-@media only screen and (min-width: 769px) {
-    .main .block-container {
-        max-width: 360px !important;
-        padding-left: 1rem !important;
-        padding-right: 1rem !important;
-    }
-    
-    section[data-testid="stSidebar"] {
-        display: none !important;
-    }
-    
-    header[data-testid="stHeader"] {
-        display: none !important;
-    }
-    
-    .stApp {
-        width: 360px !important;
-        margin: 0 auto !important;
-        border-left: 1px solid #ddd;
-        border-right: 1px solid #ddd;
-        min-height: 100vh;
-        position: relative;
-    }
-}
-
-/* Mobile optimization */
-@media only screen and (max-width: 768px) {
-    .main .block-container {
-        padding-top: 1rem !important;
-        padding-bottom: 1rem !important;
-        width: 100% !important;
-        max-width: 100% !important;
-    }
-    
-    .stApp {
-        min-height: 100vh !important;
-    }
-}
-
-/* Force 9:16 aspect ratio for karaoke player */
-.karaoke-container {
-    aspect-ratio: 9/16 !important;
-    width: 100% !important;
-    max-width: 360px !important;
-    margin: 0 auto !important;
-    position: relative !important;
-    background: #000 !important;
-}
-
-html, body, #root, .stApp {
-    min-height: 100vh !important;
-}
-
-/* Remove all scrolling */
-[data-testid="stAppViewContainer"] {
-    overflow: hidden !important;
-}
-
-.stApp {
-    overflow: hidden !important;
-}
-
-/* Mobile specific fixes */
-@media (max-width: 768px) {
-    .stButton > button {
-        width: 100% !important;
-        margin: 4px 0 !important;
-    }
-    
-    .stTextInput > div > div > input {
-        font-size: 16px !important;
-    }
-    
-    [data-testid="stSidebar"] {
-        min-width: 200px !important;
-        max-width: 80% !important;
-    }
-}
-</style>
-""", unsafe_allow_html=True)
-
-# =============== LOGO DOWNLOAD AND LOADING ===============
-def ensure_logo_exists():
-    logo_dir = os.path.join(os.getcwd(), "media", "logo")
-    os.makedirs(logo_dir, exist_ok=True)
-    
-    logo_path = os.path.join(logo_dir, "logoo.png")
-    
-    if not os.path.exists(logo_path):
-        try:
-            logo_url = "https://github.com/Swarna-0/karaoke_songs-/raw/main/media/logo/logoo.png"
-            response = requests.get(logo_url, timeout=10)
-            if response.status_code == 200:
-                with open(logo_path, "wb") as f:
-                    f.write(response.content)
-                print(f"✅ Logo downloaded from GitHub")
-            else:
-                img = Image.new('RGB', (512, 512), color='#1E3A8A')
-                d = ImageDraw.Draw(img)
-                d.text((200, 220), "🎤", fill='white', font_size=100)
-                img.save(logo_path, 'PNG')
-                print(f"✅ Created placeholder logo")
-        except Exception as e:
-            print(f"⚠️ Could not download logo: {e}")
-            with open(logo_path, 'wb') as f:
-                f.write(b'')
-    
-    return logo_path
+import sys
+import media_server
+import media_routes
+import assets
+import session_store
+import catalog_index
+import song_search
+import uploads
+import image_derivatives
+import media_store
+import ingest
+from ingest import (
+    AUDIO_RENDITIONS, AUDIO_TRACKS, SEGMENT_MANIFEST,
+    get_audio_duration, rendition_path, segments_dir_for, loudness_gain,
+    load_song_blobs_from_db, store_completed_upload, forget_song
+)
+from waveform import PEAKS_SUFFIX
+from catalog import (
+    save_song_metadata, delete_metadata,
+    save_shared_link, delete_shared_link, load_loudness,
+    load_alignment
+)
+from settings import (
+    base_dir, songs_dir, lyrics_dir, logo_dir,
+    store_dir
+)
+# Heavy libraries (numpy, PIL) load inside the analysis and image functions
+# that need them; see startup_profile.py for the cold-start measurements
+startup_profile.imports_done()
 
-# Try to load logo for page icon
-try:
-    logo_path = ensure_logo_exists()
-    page_icon = Image.open(logo_path)
-except:
-    page_icon = "𝄞"
+# =============== STARTUP ASSETS ===============
+# Icon, logo and CSS come from the prebuilt asset bundle (python assets.py),
+# loaded once per process; nothing here touches the network
 
 # Set page config
 st.set_page_config(
     page_title="Sing Along",
-    page_icon=page_icon,
+    page_icon=assets.page_icon(),
     layout="wide",
     initial_sidebar_state="collapsed"
 )
@@ -146,234 +54,95 @@ st.set_page_config(
 # --------- CONFIG: set your deployed app URL here ----------
 APP_URL = "www.branks3.com"
 
+# --------- MEDIA SERVER: byte-range streaming for songs and lyrics images ----------
+# serve.py (the Procfile entry point) mounts the media routes on the app's
+# own server, so the browser reaches them on the page's origin and port under
+# media_server.MOUNT_PATH. MEDIA_BASE_URL overrides that with the
+# browser-visible address of the standalone media server on MEDIA_PORT, e.g.
+# a subdomain a reverse proxy forwards to it. A plain `streamlit run app.py`
+# without it falls back to the standalone server on localhost.
+MEDIA_HOST = os.getenv("MEDIA_HOST", "0.0.0.0")
+MEDIA_PORT = int(os.getenv("MEDIA_PORT", "8502"))
+MEDIA_BASE_URL = os.getenv("MEDIA_BASE_URL", "").rstrip("/")
+SONGS_PER_PAGE = int(os.getenv("SONGS_PER_PAGE", "25"))
+# Browser-side budget for cached song media (Cache API), evicted least recently used
+PLAYER_CACHE_MB = int(os.getenv("PLAYER_CACHE_MB", "200"))
+
 # 🔒 SECURITY: Environment Variables for Password Hashes
 ADMIN_HASH = os.getenv("ADMIN_HASH", "")
 USER1_HASH = os.getenv("USER1_HASH", "")
 USER2_HASH = os.getenv("USER2_HASH", "")
 
-# Base directories
-base_dir = os.getcwd()
-media_dir = os.path.join(base_dir, "media")
-songs_dir = os.path.join(media_dir, "songs")
-lyrics_dir = os.path.join(media_dir, "lyrics_images")
-logo_dir = os.path.join(media_dir, "logo")
-shared_links_dir = os.path.join(media_dir, "shared_links")
-metadata_path = os.path.join(media_dir, "song_metadata.json")
-session_db_path = os.path.join(base_dir, "session_data.db")
+@st.cache_resource
+def resolve_media_base_url():
+    # Once per process: the configured URL, the mounted routes or the local fallback
+    if MEDIA_BASE_URL:
+        return MEDIA_BASE_URL
+    if media_server.is_mounted():
+        return media_server.MOUNT_PATH
+    fallback = f"http://localhost:{MEDIA_PORT}"
+    print(f"⚠️ Media routes are not mounted (run serve.py) and MEDIA_BASE_URL is not set; "
+          f"using {fallback}, which only a browser on this machine can reach")
+    return fallback
+
+MEDIA_BASE_URL = resolve_media_base_url()
 
 # Create directories
 os.makedirs(songs_dir, exist_ok=True)
 os.makedirs(lyrics_dir, exist_ok=True)
 os.makedirs(logo_dir, exist_ok=True)
-os.makedirs(shared_links_dir, exist_ok=True)
+media_store.init_store(store_dir)
 
-# =============== IMPROVED ACCURATE AUDIO DURATION FUNCTIONS ===============
-def get_audio_duration(file_path):
-    """Get accurate audio duration using multiple methods"""
-    if not os.path.exists(file_path):
-        return None
-    
-    methods_tried = []
-    
-    # Method 1: ffprobe (most accurate)
-    try:
-        cmd = [
-            'ffprobe', '-v', 'error', '-show_entries', 
-            'format=duration', '-of', 
-            'default=noprint_wrappers=1:nokey=1', file_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-        if result.returncode == 0:
-            duration = float(result.stdout.strip())
-            if duration > 0:
-                print(f"✅ ffprobe duration for {os.path.basename(file_path)}: {duration}")
-                return duration
-        methods_tried.append("ffprobe")
-    except Exception as e:
-        methods_tried.append(f"ffprobe failed: {str(e)[:50]}")
-    
-    # Method 2: mutagen (if installed) - pure Python MP3 metadata
-    try:
-        from mutagen.mp3 import MP3
-        audio = MP3(file_path)
-        duration = audio.info.length
-        if duration > 0:
-            print(f"✅ mutagen duration for {os.path.basename(file_path)}: {duration}")
-            return duration
-        methods_tried.append("mutagen")
-    except Exception as e:
-        methods_tried.append(f"mutagen failed: {str(e)[:50]}")
-    
-    # Method 3: pydub (if installed)
-    try:
-        from pydub import AudioSegment
-        audio = AudioSegment.from_file(file_path)
-        duration = len(audio) / 1000.0
-        if duration > 0:
-            print(f"✅ pydub duration for {os.path.basename(file_path)}: {duration}")
-            return duration
-        methods_tried.append("pydub")
-    except Exception as e:
-        methods_tried.append(f"pydub failed: {str(e)[:50]}")
-    
-    # Method 4: wave module for WAV files
-    try:
-        import wave
-        if file_path.lower().endswith('.wav'):
-            with wave.open(file_path, 'rb') as wav_file:
-                frames = wav_file.getnframes()
-                rate = wav_file.getframerate()
-                duration = frames / float(rate)
-                if duration > 0:
-                    print(f"✅ wave duration for {os.path.basename(file_path)}: {duration}")
-                    return duration
-    except Exception as e:
-        methods_tried.append(f"wave failed: {str(e)[:50]}")
-    
-    # Method 5: File size estimation for MP3 (last resort)
+# =============== PERSISTENT SESSION DATABASE ===============
+@st.cache_resource
+def init_session_db():
+    # Once per process, before the media server can take an upload
     try:
-        if file_path.lower().endswith('.mp3'):
-            # More accurate estimation: 128kbps = 0.94 MB per minute
-            file_size = os.path.getsize(file_path)
-            # Convert bytes to bits: *8, convert kbps to bps: *1024
-            estimated_duration = (file_size * 8) / (128 * 1024)  # Convert to seconds
-            if estimated_duration > 0:
-                print(f"⚠️ Estimated duration for {os.path.basename(file_path)}: {estimated_duration}")
-                return estimated_duration
+        session_store.init_session_store()
+        session_store.start_session_writer()
+        uploads.init_upload_db()
+        startup_profile.init_profile_db()
+        # Catalog (metadata, shared links), song_blobs and jobs are shared with the ingest workers
+        ingest.init_ingest_db()
     except Exception as e:
-        methods_tried.append(f"size estimation failed: {str(e)[:50]}")
-    
-    print(f"❌ All methods failed for {os.path.basename(file_path)}: {methods_tried}")
-    return None
+        print(f"Database init error: {e}")
 
-def fix_audio_duration(input_path, output_path):
-    """Fix audio duration metadata"""
-    try:
-        cmd = [
-            'ffmpeg', '-i', input_path,
-            '-c', 'copy',
-            '-map_metadata', '0',
-            '-y',
-            output_path
-        ]
-        subprocess.run(cmd, capture_output=True, timeout=15)
-        return True
-    except Exception as e:
-        print(f"Warning: Could not fix audio duration: {e}")
-        import shutil
-        shutil.copy2(input_path, output_path)
-        return True
+init_session_db()
 
-# =============== HIGH QUALITY AUDIO PROCESSING ===============
-def process_audio_for_quality(input_path, output_path):
-    """Process audio for better quality and fix duration issues"""
-    try:
-        # Use ffmpeg to process audio with optimal settings
-        cmd = [
-            'ffmpeg', '-i', input_path,
-            '-c:a', 'libmp3lame',
-            '-q:a', '0',  # Highest quality (0-9, 0 is best)
-            '-ar', '48000',  # High sample rate
-            '-b:a', '320k',  # High bitrate
-            '-map_metadata', '0',
-            '-id3v2_version', '3',
-            '-write_xing', '0',  # Fix duration issues
-            '-y',
-            output_path
-        ]
-        subprocess.run(cmd, capture_output=True, timeout=20)
-        
-        # Verify duration after processing
-        duration = get_audio_duration(output_path)
-        print(f"✅ Processed audio duration: {duration} seconds")
-        return True
-    except Exception as e:
-        print(f"⚠️ Audio processing failed, using original: {e}")
-        import shutil
-        shutil.copy2(input_path, output_path)
-        return True
+media_routes.register()
+
+@st.cache_resource
+def get_media_server():
+    # One server per process, shared by every session
+    return media_server.start_media_server(MEDIA_HOST, MEDIA_PORT)
+
+if MEDIA_BASE_URL != media_server.MOUNT_PATH:
+    get_media_server()
 
 # =============== CACHED FUNCTIONS FOR PERFORMANCE ===============
-@st.cache_data(ttl=5)
+catalog_index.start(songs_dir)
+
 def get_song_files_cached():
-    songs = []
-    if not os.path.exists(songs_dir):
-        return songs
-    
-    for f in os.listdir(songs_dir):
-        if f.endswith("_original.mp3"):
-            song_name = f.replace("_original.mp3", "")
-            songs.append(song_name)
-    return sorted(songs)
+    return catalog_index.song_names()
 
-@st.cache_data(ttl=5)
 def get_shared_links_cached():
-    return load_shared_links()
+    return catalog_index.shared_links()
 
-@st.cache_data(ttl=5)
 def get_metadata_cached():
-    return load_metadata()
-
-# =============== PERSISTENT SESSION DATABASE ===============
-def init_session_db():
-    try:
-        conn = sqlite3.connect(session_db_path)
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS sessions
-                     (session_id TEXT PRIMARY KEY,
-                      user TEXT,
-                      role TEXT,
-                      page TEXT,
-                      selected_song TEXT,
-                      last_active TIMESTAMP)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS shared_links
-                     (song_name TEXT PRIMARY KEY,
-                      shared_by TEXT,
-                      active BOOLEAN,
-                      created_at TIMESTAMP)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS metadata
-                     (song_name TEXT PRIMARY KEY,
-                      uploaded_by TEXT,
-                      timestamp REAL,
-                      duration REAL,
-                      processed BOOLEAN DEFAULT 0)''')
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"Database init error: {e}")
+    return catalog_index.metadata()
 
 def save_session_to_db():
-    try:
-        conn = sqlite3.connect(session_db_path)
-        c = conn.cursor()
-        session_id = st.session_state.get('session_id', 'default')
-        
-        c.execute('''INSERT OR REPLACE INTO sessions 
-                     (session_id, user, role, page, selected_song, last_active)
-                     VALUES (?, ?, ?, ?, ?, ?)''',
-                  (session_id,
-                   st.session_state.get('user'),
-                   st.session_state.get('role'),
-                   st.session_state.get('page'),
-                   st.session_state.get('selected_song'),
-                   datetime.now()))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"Save session error: {e}")
+    # Cheap on every rerun: only queues a background write when something changed
+    session_id = st.session_state.get('session_id', 'default')
+    session_store.save(session_id, {field: st.session_state.get(field) for field in session_store.SESSION_FIELDS})
 
 def load_session_from_db():
     try:
         session_id = st.session_state.get('session_id', 'default')
-        conn = sqlite3.connect(session_db_path)
-        c = conn.cursor()
-        c.execute('SELECT user, role, page, selected_song FROM sessions WHERE session_id = ?', 
-                  (session_id,))
-        result = c.fetchone()
-        conn.close()
+        result = session_store.load(session_id)
         
         if result:
-            user, role, page, selected_song = result
+            user, role, page, selected_song = (result[field] for field in session_store.SESSION_FIELDS)
             if user and user != 'None':
                 st.session_state.user = user
             if role and role != 'None':
@@ -385,195 +154,126 @@ def load_session_from_db():
     except Exception as e:
         print(f"Load session error: {e}")
 
-def save_shared_link_to_db(song_name, shared_by):
-    try:
-        conn = sqlite3.connect(session_db_path)
-        c = conn.cursor()
-        c.execute('''INSERT OR REPLACE INTO shared_links 
-                     (song_name, shared_by, active, created_at)
-                     VALUES (?, ?, ?, ?)''',
-                  (song_name, shared_by, True, datetime.now()))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"Save shared link error: {e}")
-
-def delete_shared_link_from_db(song_name):
-    try:
-        conn = sqlite3.connect(session_db_path)
-        c = conn.cursor()
-        c.execute('DELETE FROM shared_links WHERE song_name = ?', (song_name,))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"Delete shared link error: {e}")
-
-def load_shared_links_from_db():
-    links = {}
-    try:
-        conn = sqlite3.connect(session_db_path)
-        c = conn.cursor()
-        c.execute('SELECT song_name, shared_by FROM shared_links WHERE active = 1')
-        results = c.fetchall()
-        conn.close()
-        
-        for song_name, shared_by in results:
-            links[song_name] = {"shared_by": shared_by, "active": True}
-    except Exception as e:
-        print(f"Load shared links error: {e}")
-    return links
-
-def save_metadata_to_db(song_name, uploaded_by, duration=None, processed=False):
-    try:
-        conn = sqlite3.connect(session_db_path)
-        c = conn.cursor()
-        c.execute('''INSERT OR REPLACE INTO metadata 
-                     (song_name, uploaded_by, timestamp, duration, processed)
-                     VALUES (?, ?, ?, ?, ?)''',
-                  (song_name, uploaded_by, time.time(), duration, processed))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"Save metadata error: {e}")
-
-def delete_metadata_from_db(song_name):
-    try:
-        conn = sqlite3.connect(session_db_path)
-        c = conn.cursor()
-        c.execute('DELETE FROM metadata WHERE song_name = ?', (song_name,))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"Delete metadata error: {e}")
-
-def load_metadata_from_db():
-    metadata = {}
-    try:
-        conn = sqlite3.connect(session_db_path)
-        c = conn.cursor()
-        c.execute('SELECT song_name, uploaded_by, duration, processed FROM metadata')
-        results = c.fetchall()
-        conn.close()
-        
-        for song_name, uploaded_by, duration, processed in results:
-            metadata[song_name] = {
-                "uploaded_by": uploaded_by, 
-                "timestamp": str(time.time()),
-                "duration": duration,
-                "processed": bool(processed)
-            }
-    except Exception as e:
-        print(f"Load metadata error: {e}")
-    return metadata
-
-# Initialize database
-init_session_db()
-
 # =============== HELPER FUNCTIONS ===============
-def file_to_base64(path):
-    if os.path.exists(path):
-        with open(path, "rb") as f:
-            return base64.b64encode(f.read()).decode()
-    return ""
+def media_url(route, path):
+    """Versioned, cacheable, signed media server path for a file (empty if missing)"""
+    if not path or not os.path.exists(path):
+        return ""
+    version = media_server.media_version(path)
+    url_path = f"/media/{route}/{quote(os.path.basename(path))}"
+    return f"{url_path}?v={version}&{media_server.sign_url(url_path)}"
+
+def blob_url(blob_key, ext):
+    """Immutable, signed media server path for a content-addressed blob"""
+    relpath = media_store.blob_relpath(blob_key, ext).replace(os.sep, "/")
+    url_path = f"/media/blobs/{relpath}"
+    return f"{url_path}?v={blob_key[:16]}&{media_server.sign_url(url_path)}"
+
+def song_media_url(song_name, kind, path, route):
+    """Prefer the song's content-addressed blob, fall back to the named file"""
+    blob = load_song_blobs_from_db(song_name).get(kind)
+    if blob and os.path.exists(media_store.blob_path(*blob)):
+        return blob_url(*blob)
+    return media_url(route, path)
+
+def segment_manifest_url(manifest_path):
+    """Media server path of a segment manifest; segments share its version
+    token and its signature, which covers the whole package directory"""
+    package_dir = f"/media/songs/{quote(os.path.basename(os.path.dirname(manifest_path)))}/"
+    version = media_server.media_version(manifest_path)
+    signature = media_server.sign_url(package_dir + SEGMENT_MANIFEST, scope=package_dir)
+    return f"{package_dir}{SEGMENT_MANIFEST}?v={version}&{signature}"
+
+def get_lyrics_image_urls(song_name, lyrics_url):
+    """Lyrics image candidates per size for the player, best format first.
+    The original upload is the last resort for the player and canvas sizes"""
+    images = {}
+    formats = image_derivatives.available_formats() or image_derivatives.FORMATS
+    for variant in image_derivatives.LYRICS_VARIANTS:
+        urls = []
+        for _, ext, _ in formats:
+            path = image_derivatives.derivative_path(lyrics_dir, song_name, variant, ext)
+            if os.path.exists(path):
+                urls.append(media_url("lyrics_images", path))
+        if variant != "thumb" and lyrics_url:
+            urls.append(lyrics_url)
+        images[variant] = urls
+    return images
+
+def render_song_thumb(song_name):
+    """The song's small lyrics thumbnail in a list row, if ingest has made one"""
+    for _, ext, _ in image_derivatives.available_formats() or image_derivatives.FORMATS:
+        path = image_derivatives.derivative_path(lyrics_dir, song_name, "thumb", ext)
+        if os.path.exists(path):
+            # Raw <img>: st.image would read a relative URL as a local file
+            src = html_escape(MEDIA_BASE_URL + media_url("lyrics_images", path))
+            st.markdown(f'<img src="{src}" width="36" loading="lazy" alt="">',
+                        unsafe_allow_html=True)
+            return
+
+def get_song_renditions(song_name):
+    """Playable renditions of a song (lowest bitrate first) for the player to choose from"""
+    renditions = []
+    for rendition in AUDIO_RENDITIONS:
+        paths = {track: rendition_path(song_name, track, rendition) for track in AUDIO_TRACKS}
+        if not all(os.path.exists(path) for path in paths.values()):
+            continue
+        entry = {"name": rendition["name"], "kbps": rendition["kbps"], "mime": rendition["mime"]}
+        for track, path in paths.items():
+            entry[track] = song_media_url(song_name, f"{track}_{rendition['name']}", path, "songs")
+        
+        manifests = {
+            track: os.path.join(segments_dir_for(song_name, track, rendition), SEGMENT_MANIFEST)
+            for track in AUDIO_TRACKS
+        }
+        if all(os.path.exists(path) for path in manifests.values()):
+            entry["segments"] = {track: segment_manifest_url(path) for track, path in manifests.items()}
+        renditions.append(entry)
+    
+    if not renditions:
+        # Not processed yet: serve the uploaded files as they are
+        entry = {"name": "source", "kbps": 320, "mime": "audio/mpeg"}
+        for track in AUDIO_TRACKS:
+            path = os.path.join(songs_dir, f"{song_name}_{track}.mp3")
+            entry[track] = song_media_url(song_name, track, path, "songs")
+        renditions.append(entry)
+    return renditions
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
-def load_metadata():
-    file_metadata = {}
-    if os.path.exists(metadata_path):
-        try:
-            with open(metadata_path, "r") as f:
-                file_metadata = json.load(f)
-        except:
-            file_metadata = {}
-    
-    db_metadata = load_metadata_from_db()
-    for song_name, info in db_metadata.items():
-        file_metadata[song_name] = info
-    
-    return file_metadata
-
-def save_metadata(data):
-    with open(metadata_path, "w") as f:
-        json.dump(data, f, indent=2)
-    
-    for song_name, info in data.items():
-        uploaded_by = info.get("uploaded_by", "unknown")
-        duration = info.get("duration")
-        processed = info.get("processed", False)
-        save_metadata_to_db(song_name, uploaded_by, duration, processed)
-
-def delete_metadata(song_name):
-    metadata = load_metadata()
-    
-    if song_name in metadata:
-        del metadata[song_name]
-    
-    with open(metadata_path, "w") as f:
-        json.dump(metadata, f, indent=2)
-    
-    delete_metadata_from_db(song_name)
-
-def load_shared_links():
-    file_links = {}
-    if os.path.exists(shared_links_dir):
-        for filename in os.listdir(shared_links_dir):
-            if filename.endswith('.json'):
-                song_name = filename[:-5]
-                filepath = os.path.join(shared_links_dir, filename)
-                try:
-                    with open(filepath, 'r') as f:
-                        data = json.load(f)
-                        if data.get("active", True):
-                            file_links[song_name] = data
-                except:
-                    pass
-    
-    db_links = load_shared_links_from_db()
-    file_links.update(db_links)
-    return file_links
-
-def save_shared_link(song_name, link_data):
-    filepath = os.path.join(shared_links_dir, f"{song_name}.json")
-    with open(filepath, 'w') as f:
-        json.dump(link_data, f)
-    
-    shared_by = link_data.get("shared_by", "unknown")
-    save_shared_link_to_db(song_name, shared_by)
-
-def delete_shared_link(song_name):
-    filepath = os.path.join(shared_links_dir, f"{song_name}.json")
-    if os.path.exists(filepath):
-        os.remove(filepath)
-    
-    delete_shared_link_from_db(song_name)
-
 def get_uploaded_songs(show_unshared=False):
     return get_song_files_cached()
 
 def delete_song_files(song_name):
     try:
-        original_path = os.path.join(songs_dir, f"{song_name}_original.mp3")
-        if os.path.exists(original_path):
-            os.remove(original_path)
+        removed = []
+        def remove(path):
+            if os.path.exists(path):
+                os.remove(path)
+                removed.append(path)
+        
+        remove(os.path.join(songs_dir, f"{song_name}_original.mp3"))
+        remove(os.path.join(songs_dir, f"{song_name}_accompaniment.mp3"))
         
-        acc_path = os.path.join(songs_dir, f"{song_name}_accompaniment.mp3")
-        if os.path.exists(acc_path):
-            os.remove(acc_path)
+        for track in AUDIO_TRACKS:
+            remove(os.path.join(songs_dir, f"{song_name}_{track}{PEAKS_SUFFIX}"))
+            for rendition in AUDIO_RENDITIONS:
+                remove(rendition_path(song_name, track, rendition))
+                segment_dir = segments_dir_for(song_name, track, rendition)
+                if os.path.isdir(segment_dir):
+                    import shutil
+                    shutil.rmtree(segment_dir, ignore_errors=True)
         
         for ext in [".jpg", ".jpeg", ".png"]:
-            lyrics_path = os.path.join(lyrics_dir, f"{song_name}_lyrics_bg{ext}")
-            if os.path.exists(lyrics_path):
-                os.remove(lyrics_path)
+            remove(os.path.join(lyrics_dir, f"{song_name}_lyrics_bg{ext}"))
+        for derivative in image_derivatives.derivative_paths(lyrics_dir, song_name):
+            remove(derivative)
         
-        shared_link_path = os.path.join(shared_links_dir, f"{song_name}.json")
-        if os.path.exists(shared_link_path):
-            os.remove(shared_link_path)
+        # Blobs, processing fingerprint and probe rows go with the files
+        forget_song(song_name, removed)
         
-        get_song_files_cached.clear()
-        get_shared_links_cached.clear()
-        get_metadata_cached.clear()
+        catalog_index.invalidate()
         
         return True
     except Exception as e:
@@ -585,6 +285,40 @@ def check_and_create_session_id():
         import uuid
         st.session_state.session_id = str(uuid.uuid4())
 
+# =============== PAGINATED LISTS ===============
+def paginate(items, key, reset_on=None, page_size=None):
+    """Return (visible_items, offset) and render pager controls.
+    Only one page of rows is ever built, however long the list is"""
+    page_size = page_size or SONGS_PER_PAGE
+    page_count = max(1, -(-len(items) // page_size))
+    page_key = f"{key}_page"
+    # A new search starts from the first page
+    if st.session_state.get(f"{key}_reset_on") != reset_on:
+        st.session_state[f"{key}_reset_on"] = reset_on
+        st.session_state[page_key] = 0
+    page = min(st.session_state.get(page_key, 0), page_count - 1)
+    st.session_state[page_key] = page
+    
+    if page_count > 1:
+        col_prev, col_info, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            if st.button("◀ Prev", key=f"{key}_prev", disabled=page == 0, use_container_width=True):
+                st.session_state[page_key] = page - 1
+                st.rerun()
+        with col_info:
+            st.markdown(
+                f"<div style='text-align:center;padding-top:0.4rem;'>Page {page + 1} of {page_count} "
+                f"· {len(items)} songs</div>",
+                unsafe_allow_html=True
+            )
+        with col_next:
+            if st.button("Next ▶", key=f"{key}_next", disabled=page >= page_count - 1, use_container_width=True):
+                st.session_state[page_key] = page + 1
+                st.rerun()
+    
+    offset = page * page_size
+    return items[offset:offset + page_size], offset
+
 # =============== FAST SONG PLAYER NAVIGATION ===============
 def open_song_player(song_name):
     st.session_state.selected_song = song_name
@@ -618,88 +352,216 @@ def get_song_duration(song_name):
     if song_name in metadata and "duration" in metadata[song_name]:
         stored_duration = metadata[song_name]["duration"]
         if stored_duration and stored_duration > 0:
-            print(f"✅ Using stored duration for {song_name}: {stored_duration}")
             return stored_duration
     
-    # Try processed accompaniment file first
-    acc_path = os.path.join(songs_dir, f"{song_name}_accompaniment.mp3")
-    if os.path.exists(acc_path):
-        try:
-            duration = get_audio_duration(acc_path)
-            if duration and duration > 0:
-                # Store in metadata
-                if song_name in metadata:
-                    metadata[song_name]["duration"] = duration
-                else:
-                    metadata[song_name] = {"duration": duration, "uploaded_by": "unknown"}
-                
-                save_metadata(metadata)
-                get_metadata_cached.clear()
-                print(f"✅ Calculated accompaniment duration for {song_name}: {duration}")
-                return duration
-        except Exception as e:
-            print(f"⚠️ Failed to get accompaniment duration for {song_name}: {e}")
-    
-    # Try original file as fallback
-    original_path = os.path.join(songs_dir, f"{song_name}_original.mp3")
-    if os.path.exists(original_path):
-        try:
-            duration = get_audio_duration(original_path)
-            if duration and duration > 0:
-                print(f"✅ Calculated original duration for {song_name}: {duration}")
-                return duration
-        except Exception as e:
-            print(f"⚠️ Failed to get original duration for {song_name}: {e}")
-    
-    # If we can't determine duration, try to estimate from file size
-    if os.path.exists(acc_path):
-        try:
-            file_size = os.path.getsize(acc_path)
-            # Better estimation: MP3 at 128kbps
-            estimated_duration = (file_size * 8) / (128 * 1024)
-            if estimated_duration > 30:
-                print(f"⚠️ Estimated duration from file size for {song_name}: {estimated_duration}")
-                return estimated_duration
-        except:
-            pass
+    # Probe cache: measured once per file version, then a single indexed read
+    for track in ["accompaniment", "original"]:
+        duration = get_audio_duration(os.path.join(songs_dir, f"{song_name}_{track}.mp3"))
+        if duration and duration > 0:
+            return duration
     
     # Return reasonable default
     print(f"⚠️ Using default duration for {song_name}")
     return 180
 
-def ensure_audio_processed(song_name):
-    """Ensure audio files are processed for high quality"""
-    metadata = get_metadata_cached()
-    
-    if song_name in metadata and metadata[song_name].get("processed", False):
-        return True
-    
-    original_path = os.path.join(songs_dir, f"{song_name}_original.mp3")
-    acc_path = os.path.join(songs_dir, f"{song_name}_accompaniment.mp3")
-    
-    # Create processed versions
-    processed_original = os.path.join(songs_dir, f"{song_name}_original_processed.mp3")
-    processed_acc = os.path.join(songs_dir, f"{song_name}_accompaniment_processed.mp3")
-    
+# =============== RESUMABLE UPLOAD WIDGET ===============
+UPLOAD_LABELS = {
+    "original": ("Original Song (_original.mp3)", ".mp3"),
+    "accompaniment": ("Accompaniment (_accompaniment.mp3)", ".mp3"),
+    "lyrics": ("Lyrics Image (_lyrics_bg.jpg / .png)", ".jpg,.jpeg,.png"),
+}
+
+UPLOAD_WIDGET_TEMPLATE = """
+<style>
+  body { margin: 0; font-family: "Source Sans Pro", sans-serif; color: #fafafa; }
+  .upload-row { margin-bottom: 14px; }
+  .upload-row label { display: block; font-size: 14px; margin-bottom: 4px; }
+  .upload-row input { font-size: 13px; color: #fafafa; }
+  .upload-row progress { width: 100%; height: 8px; margin-top: 4px; }
+  .upload-status { font-size: 12px; color: #bbb; min-height: 15px; }
+  .upload-status.error { color: #ff6b6b; }
+</style>
+<div id="uploads"></div>
+<script>
+  const MEDIA_BASE = "%%MEDIA_BASE%%";
+  const FIELDS = %%UPLOAD_FIELDS_JSON%%;
+  const CHUNK_SIZE = 4 * 1024 * 1024;
+
+  const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+
+  async function serverOffset(url) {
+      const head = await fetch(url, { method: "HEAD", cache: "no-store" });
+      if (!head.ok) throw new Error("Upload expired, reload the page");
+      return {
+          received: parseInt(head.headers.get("Upload-Offset") || "0", 10),
+          size: parseInt(head.headers.get("Upload-Length") || "-1", 10)
+      };
+  }
+
+  async function uploadFile(field, file, ui) {
+      const url = MEDIA_BASE + "/uploads/" + field.token;
+      // Resume only if the server holds the start of this very file
+      const resumeKey = "singalong_upload_" + field.token;
+      const fileId = [file.name, file.size, file.lastModified].join(":");
+      let offset = 0;
+      try {
+          const state = await serverOffset(url);
+          if (localStorage.getItem(resumeKey) === fileId && state.size === file.size) {
+              offset = state.received;
+          }
+      } catch (e) {}
+      try { localStorage.setItem(resumeKey, fileId); } catch (e) {}
+
+      let attempt = 0;
+      ui.progress(offset, file.size);
+      while (offset < file.size) {
+          const end = Math.min(offset + CHUNK_SIZE, file.size);
+          try {
+              const response = await fetch(url, {
+                  method: "PATCH",
+                  headers: {
+                      "Content-Type": "application/offset+octet-stream",
+                      "Upload-Offset": String(offset),
+                      "Upload-Length": String(file.size),
+                      "Upload-Name": encodeURIComponent(file.name)
+                  },
+                  body: file.slice(offset, end)
+              });
+              if (response.status === 409) {
+                  offset = (await serverOffset(url)).received;
+                  continue;
+              }
+              if (response.status >= 400 && response.status < 500) {
+                  ui.fail(await response.text());
+                  return;
+              }
+              if (!response.ok) throw new Error("Server error " + response.status);
+              offset = parseInt(response.headers.get("Upload-Offset"), 10);
+              attempt = 0;
+              ui.progress(offset, file.size);
+          } catch (e) {
+              attempt += 1;
+              const wait = Math.min(30000, 1000 * Math.pow(2, attempt));
+              ui.status("Connection lost, resuming in " + Math.round(wait / 1000) + "s…");
+              await sleep(wait);
+              try { offset = (await serverOffset(url)).received; } catch (err) {}
+          }
+      }
+      ui.done(file.name);
+  }
+
+  const container = document.getElementById("uploads");
+  FIELDS.forEach(field => {
+      const row = document.createElement("div");
+      row.className = "upload-row";
+      row.innerHTML = '<label></label><input type="file"><progress max="1" value="0"></progress>' +
+                      '<div class="upload-status"></div>';
+      row.querySelector("label").textContent = field.label;
+      const input = row.querySelector("input");
+      input.accept = field.accept;
+      const bar = row.querySelector("progress");
+      const statusLine = row.querySelector(".upload-status");
+      const ui = {
+          progress(done, total) {
+              bar.value = total ? done / total : 0;
+              statusLine.className = "upload-status";
+              statusLine.textContent = (done / 1048576).toFixed(1) + " / " + (total / 1048576).toFixed(1) + " MB";
+          },
+          status(text) { statusLine.className = "upload-status"; statusLine.textContent = text; },
+          fail(text) { statusLine.className = "upload-status error"; statusLine.textContent = "❌ " + text; },
+          done(name) { bar.value = 1; statusLine.className = "upload-status"; statusLine.textContent = "✅ " + name + " uploaded"; }
+      };
+      // The page is static per upload slot; ask the server how far it got
+      let started = false;
+      serverOffset(MEDIA_BASE + "/uploads/" + field.token).then(state => {
+          if (started) return;
+          if (state.size > 0 && state.received === state.size) ui.done("File");
+          else if (state.received > 0) ui.status("Partly uploaded: pick the same file again to resume");
+      }).catch(() => {});
+      input.addEventListener("change", () => {
+          if (!input.files.length) return;
+          started = true;
+          uploadFile(field, input.files[0], ui);
+      });
+      container.appendChild(row);
+  });
+</script>
+"""
+
+def render_upload_widget(tokens):
+    """Chunked, resumable uploads straight to the media server. The HTML only
+    depends on the upload tokens, so reruns during an upload leave the
+    iframe (and its running upload loop) alone"""
+    fields = []
+    for kind, token in tokens.items():
+        label, accept = UPLOAD_LABELS[kind]
+        fields.append({"token": token, "label": label, "accept": accept})
+    widget_html = UPLOAD_WIDGET_TEMPLATE.replace("%%MEDIA_BASE%%", MEDIA_BASE_URL)
+    widget_html = widget_html.replace("%%UPLOAD_FIELDS_JSON%%", json.dumps(fields).replace("</", "<\\/"))
+    html(widget_html, height=90 * len(fields))
+
+# =============== BACKGROUND PROCESSING ===============
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+
+@st.cache_resource
+def start_ingest_workers():
+    # Encoding runs in separate processes so uploads never block this web
+    # worker. Set INGEST_WORKERS=0 only when `python worker.py` runs elsewhere
+    # on the same machine or volume (it needs session_data.db and media/).
+    if INGEST_WORKERS <= 0:
+        return None
+    worker_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.py")
     try:
-        # Process both files
-        print(f"🔧 Processing audio for {song_name}...")
-        process_audio_for_quality(original_path, processed_original)
-        process_audio_for_quality(acc_path, processed_acc)
-        
-        # Update metadata
-        if song_name in metadata:
-            metadata[song_name]["processed"] = True
-        else:
-            metadata[song_name] = {"processed": True, "uploaded_by": "unknown"}
-        
-        save_metadata(metadata)
-        get_metadata_cached.clear()
-        print(f"✅ Audio processed for {song_name}")
-        return True
+        return subprocess.Popen([sys.executable, worker_script, str(INGEST_WORKERS)], cwd=base_dir)
     except Exception as e:
-        print(f"⚠️ Audio processing failed for {song_name}: {e}")
-        return False
+        print(f"⚠️ Could not start ingest workers: {e}")
+        return None
+
+def render_job_action(description, label, key, kind):
+    """One Process Audio maintenance action: a button that queues a job of
+    this kind for every song on the ingest workers"""
+    st.markdown("---")
+    st.info(description)
+    if st.button(label, key=key):
+        queued = ingest.enqueue_jobs(get_song_files_cached(), kind)
+        st.success(f"✅ Queued {queued} songs; progress is shown under Processing Jobs")
+
+JOB_STATUS_ICONS = {"queued": "⏳", "running": "🔄", "done": "✅", "failed": "❌"}
+
+def render_ingest_jobs():
+    """Per-job status, progress and retry for background processing"""
+    st.markdown("---")
+    col_title, col_refresh = st.columns([3, 1])
+    with col_title:
+        st.subheader("📋 Processing Jobs")
+    with col_refresh:
+        if st.button("🔄 Refresh", key="refresh_jobs"):
+            catalog_index.invalidate()
+            st.rerun()
+    
+    jobs = ingest.list_jobs(limit=20)
+    if not jobs:
+        st.caption("No processing jobs yet.")
+        return
+    
+    counts = ingest.job_counts()
+    st.caption(" · ".join(f"{JOB_STATUS_ICONS[status]} {counts.get(status, 0)} {status}"
+                          for status in JOB_STATUS_ICONS))
+    for job in jobs:
+        icon = JOB_STATUS_ICONS.get(job["status"], "•")
+        label = f"{icon} {job['song_name']} ({job['kind']}) — {job['status']}: {job['message'] or ''}"
+        if job["status"] == "failed":
+            col_label, col_retry = st.columns([3, 1])
+            with col_label:
+                st.write(label)
+            with col_retry:
+                if st.button("🔁 Retry", key=f"retry_job_{job['id']}"):
+                    ingest.retry_job(job["id"])
+                    st.rerun()
+        else:
+            st.progress(min(max(job["progress"] or 0, 0.0), 1.0), text=label)
+
+start_ingest_workers()
 
 # =============== INITIALIZE SESSION ===============
 check_and_create_session_id()
@@ -727,256 +589,13 @@ process_query_params()
 # Get cached metadata
 metadata = get_metadata_cached()
 
-# Logo
-default_logo_path = os.path.join(logo_dir, "branks3_logo.png")
-if not os.path.exists(default_logo_path):
-    pass
-logo_b64 = file_to_base64(default_logo_path) if os.path.exists(default_logo_path) else ""
+# Logo (180 px, from the asset bundle) and this page's CSS in one block
+logo_b64 = assets.logo_b64()
+st.markdown(assets.page_css(st.session_state.page), unsafe_allow_html=True)
 
 # =============== RESPONSIVE LOGIN PAGE ===============
 if st.session_state.page == "Login":
     save_session_to_db()
-    
-    st.markdown("""
-    <style>
-    [data-testid="stSidebar"] {display:none;}
-    header {visibility:hidden;}
-    
-    html, body, #root, .stApp {
-        overflow: hidden !important;
-        height: 100vh !important;
-        width: 100vw !important;
-        margin: 0 !important;
-        padding: 0 !important;
-        position: fixed !important;
-        top: 0 !important;
-        left: 0 !important;
-        right: 0 !important;
-        bottom: 0 !important;
-    }
-    
-    body {
-        background: radial-gradient(circle at top,#335d8c 0,#0b1b30 55%,#020712 100%);
-        position: fixed !important;
-        top: 0 !important;
-        left: 0 !important;
-        right: 0 !important;
-        bottom: 0 !important;
-        overflow: hidden !important;
-    }
-
-    .login-content {
-        padding: 1.8rem 2.2rem 2.2rem 2.2rem;
-        max-height: 90vh;
-        overflow-y: auto;
-    }
-
-    .login-header {
-        display: flex;
-        flex-direction: column;
-        align-items: center;
-        justify-content: center;
-        gap: 0.8rem;
-        margin-bottom: 1.6rem;
-        text-align: center;
-    }
-
-    .login-header img {
-        width: 60px;
-        height: 60px;
-        border-radius: 50%;
-        border: 2px solid rgba(255,255,255,0.4);
-    }
-
-    .login-title {
-        font-size: 1.6rem;
-        font-weight: 700;
-        width: 100%;
-    }
-
-    .login-sub {
-        font-size: 0.9rem;
-        color: #c3cfdd;
-        margin-bottom: 0.5rem;
-        width: 100%;
-    }
-
-    .stTextInput input {
-        background: rgba(5,10,25,0.7) !important;
-        border-radius: 10px !important;
-        color: white !important;
-        border: 1px solid rgba(255,255,255,0.2) !important;
-        padding: 12px 14px !important;
-    }
-
-    .stTextInput input:focus {
-        border-color: rgba(255,255,255,0.6) !important;
-        box-shadow: 0 0 0 1px rgba(255,255,255,0.3);
-    }
-
-    .stButton button {
-        width: 100%;
-        height: 44px;
-        background: linear-gradient(to right, #1f2937, #020712);
-        border-radius: 10px;
-        font-weight: 600;
-        margin-top: 0.6rem;
-        color: white;
-        border: none;
-    }
-    
-    @media (max-width: 768px) {
-        .login-content {
-            padding: 1.5rem 1rem 1.5rem 1rem;
-        }
-        
-        .login-header img {
-            width: 50px;
-            height: 50px;
-        }
-        
-        .login-title {
-            font-size: 1.4rem;
-        }
-        
-        .stTextInput input {
-            font-size: 14px !important;
-            padding: 10px 12px !important;
-        }
-        
-        .stButton button {
-            font-size: 14px !important;
-            height: 40px !important;
-        }
-        
-        .stColumn {
-            padding: 0 5px !important;
-        }
-    }
-    
-    @media (max-width: 480px) {
-        .login-content {
-            padding: 1rem 0.8rem 1rem 0.8rem;
-        }
-        
-        .login-header img {
-            width: 40px;
-            height: 40px;
-        }
-        
-        .login-title {
-            font-size: 1.2rem;
-        }
-        
-        .stTextInput input {
-            font-size: 13px !important;
-            padding: 8px 10px !important;
-        }
-        
-        .stButton button {
-            font-size: 13px !important;
-            height: 36px !important;
-        }
-    }
-    
-    .contact-links-row {
-        display: flex;
-        justify-content: center;
-        align-items: center;
-        flex-wrap: wrap;
-        gap: 8px;
-        margin-top: 20px;
-        margin-bottom: 15px;
-    }
-    
-    .contact-link-item {
-        text-decoration: none !important;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        gap: 4px;
-        font-size: 0.75rem !important;
-        font-weight: 500;
-        padding: 6px 10px;
-        border-radius: 6px;
-        transition: transform 0.2s, opacity 0.2s;
-    }
-    
-    .contact-link-item:hover {
-        transform: translateY(-1px);
-        opacity: 0.9;
-        text-decoration: none !important;
-    }
-    
-    .contact-link-item.email {
-        color: #4285F4 !important;
-        background: rgba(66, 133, 244, 0.1);
-        border: none;
-    }
-    
-    .contact-link-item.instagram {
-        background: linear-gradient(45deg, #405DE6, #5851DB, #833AB4, #C13584, #E1306C, #FD1D1D) !important;
-        -webkit-background-clip: text !important;
-        background-clip: text !important;
-        -webkit-text-fill-color: transparent !important;
-        text-fill-color: transparent !important;
-        border: none;
-    }
-    
-    .contact-link-item.youtube {
-        color: #FF0000 !important;
-        background: rgba(255, 0, 0, 0.1);
-        border: none;
-    }
-    
-    @media (max-width: 768px) {
-        .contact-links-row {
-            gap: 4px;
-        }
-        
-        .contact-link-item {
-            font-size: 0.7rem !important;
-            padding: 4px 8px;
-        }
-    }
-    
-    @media (max-width: 480px) {
-        .contact-links-row {
-            gap: 3px;
-        }
-        
-        .contact-link-item {
-            font-size: 0.65rem !important;
-            padding: 3px 6px;
-        }
-    }
-    
-    .dashboard-buttons-row {
-        display: flex;
-        justify-content: center;
-        gap: 10px;
-        margin-top: 10px;
-        margin-bottom: 5px;
-    }
-    
-    .dashboard-button {
-        font-size: 0.8rem;
-        padding: 4px 12px;
-        border-radius: 4px;
-        background: rgba(255, 255, 255, 0.1);
-        color: white;
-        border: 1px solid rgba(255, 255, 255, 0.2);
-        cursor: pointer;
-        text-decoration: none;
-        transition: all 0.2s;
-    }
-    
-    .dashboard-button:hover {
-        background: rgba(255, 255, 255, 0.2);
-        text-decoration: none;
-    }
-    </style>
-    """, unsafe_allow_html=True)
 
     left, center, right = st.columns([0.5, 2, 0.5])
 
@@ -1051,156 +670,12 @@ if st.session_state.page == "Login":
 # =============== ADMIN DASHBOARD ===============
 elif st.session_state.page == "Admin Dashboard" and st.session_state.role == "admin":
     save_session_to_db()
-    
-    st.markdown("""
-    <style>
-    @media (max-width: 768px) {
-        h1 {
-            font-size: 1.5rem !important;
-        }
-        
-        h3 {
-            font-size: 1.2rem !important;
-        }
-        
-        .stButton > button {
-            font-size: 14px !important;
-            padding: 8px 12px !important;
-        }
-        
-        .stRadio > div[role="radiogroup"] > label {
-            font-size: 14px !important;
-        }
-        
-        [data-testid="stSidebar"] * {
-            font-size: 14px !important;
-        }
-        
-        .song-name {
-            font-size: 14px !important;
-        }
-        
-        .stColumn {
-            padding: 2px !important;
-        }
-        
-        .stTextInput > div > div > input {
-            font-size: 14px !important;
-            padding: 8px !important;
-        }
-        
-        .stFileUploader > div {
-            font-size: 12px !important;
-        }
-        
-        .main .block-container {
-            padding: 1rem !important;
-        }
-    }
-    
-    @media (max-width: 480px) {
-        h1 {
-            font-size: 1.3rem !important;
-        }
-        
-        h3 {
-            font-size: 1.1rem !important;
-        }
-        
-        .stButton > button {
-            font-size: 12px !important;
-            padding: 6px 10px !important;
-        }
-        
-        .stTextInput > div > div > input {
-            font-size: 12px !important;
-            padding: 6px !important;
-        }
-        
-        .stRadio > div[role="radiogroup"] > label {
-            font-size: 12px !important;
-        }
-        
-        .stColumn {
-            width: 100% !important;
-            padding: 0 !important;
-            margin-bottom: 10px !important;
-        }
-    }
-    
-    .delete-button {
-        background: transparent !important;
-        border: none !important;
-        padding: 0 !important;
-        margin: 0 !important;
-        min-width: auto !important;
-        width: auto !important;
-        color: #ff4444 !important;
-        font-size: 20px !important;
-        box-shadow: none !important;
-    }
-    
-    .delete-button:hover {
-        background: transparent !important;
-        color: #ff0000 !important;
-        transform: scale(1.1);
-    }
-    
-    .song-item-row {
-        display: flex;
-        align-items: center;
-        margin-bottom: 4px !important;
-        padding: 0 !important;
-        background: transparent !important;
-    }
-    
-    .play-button {
-        background: transparent !important;
-        border: none !important;
-        color: #4CAF50 !important;
-        text-align: left !important;
-        padding: 0 !important;
-        margin: 0 !important;
-        width: 100% !important;
-    }
-    
-    .play-button:hover {
-        background: rgba(76, 175, 80, 0.1) !important;
-    }
-    
-    .share-link-button {
-        background: transparent !important;
-        border: none !important;
-        padding: 0 !important;
-        margin: 0 !important;
-        min-width: auto !important;
-        width: auto !important;
-        color: #667eea !important;
-        font-size: 20px !important;
-    }
-    
-    .share-link-button:hover {
-        color: #764ba2 !important;
-        transform: scale(1.1);
-    }
-    
-    @media (max-width: 768px) {
-        .song-item-row {
-            flex-direction: column;
-            align-items: flex-start;
-            margin-bottom: 10px !important;
-            border-bottom: 1px solid rgba(255,255,255,0.1);
-            padding-bottom: 10px !important;
-        }
-    }
-    </style>
-    """, unsafe_allow_html=True)
-    
+
     st.title(f"👑 Admin Dashboard - {st.session_state.user}")
 
     page_sidebar = st.sidebar.radio(
         "Navigate",
-        ["Upload Songs", "Songs List", "Share Links", "Process Audio"],
+        ["Upload Songs", "Songs List", "Share Links", "Process Audio", "Startup Profile"],
         key="admin_nav"
     )
 
@@ -1213,86 +688,59 @@ elif st.session_state.page == "Admin Dashboard" and st.session_state.role == "ad
             key="song_name_input"
         )
 
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            uploaded_original = st.file_uploader(
-                "Original Song (_original.mp3)",
-                type=["mp3"],
-                key="original_upload"
-            )
-        with col2:
-            uploaded_accompaniment = st.file_uploader(
-                "Accompaniment (_accompaniment.mp3)",
-                type=["mp3"],
-                key="acc_upload"
-            )
-        with col3:
-            uploaded_lyrics_image = st.file_uploader(
-                "Lyrics Image (_lyrics_bg.jpg / .png)",
-                type=["jpg", "jpeg", ".png"],
-                key="lyrics_upload"
-            )
+        # Files stream to the media server in resumable chunks; each admin
+        # keeps the same upload slots until the song is saved
+        upload_tokens = {
+            kind: uploads.open_upload(kind, st.session_state.user)
+            for kind in uploads.UPLOAD_KINDS
+        }
+        render_upload_widget(upload_tokens)
 
         if st.button("⬆ Upload Song", key="upload_song_btn"):
+            completed = {kind: uploads.completed_file(token) for kind, token in upload_tokens.items()}
             if not song_name_input:
                 st.error("❌ Please enter song name")
-            elif not uploaded_original or not uploaded_accompaniment or not uploaded_lyrics_image:
-                st.error("❌ Please upload all required files")
+            elif not all(completed.values()):
+                st.error("❌ Please upload all required files (wait until each one shows ✅)")
             else:
                 song_name = song_name_input.strip()
 
                 original_path = os.path.join(songs_dir, f"{song_name}_original.mp3")
                 acc_path = os.path.join(songs_dir, f"{song_name}_accompaniment.mp3")
-                lyrics_ext = os.path.splitext(uploaded_lyrics_image.name)[1]
+                lyrics_ext = completed["lyrics"][1]["ext"]
                 lyrics_path = os.path.join(
                     lyrics_dir,
                     f"{song_name}_lyrics_bg{lyrics_ext}"
                 )
 
-                with open(original_path, "wb") as f:
-                    f.write(uploaded_original.getbuffer())
-                with open(acc_path, "wb") as f:
-                    f.write(uploaded_accompaniment.getbuffer())
-                with open(lyrics_path, "wb") as f:
-                    f.write(uploaded_lyrics_image.getbuffer())
-                
-                # Process audio for high quality
-                with st.spinner("🔄 Processing audio for high quality..."):
-                    processed_original = os.path.join(songs_dir, f"{song_name}_original_processed.mp3")
-                    processed_acc = os.path.join(songs_dir, f"{song_name}_accompaniment_processed.mp3")
-                    
-                    process_audio_for_quality(original_path, processed_original)
-                    process_audio_for_quality(acc_path, processed_acc)
+                # Identical uploads are stored once and hard-linked by name
+                store_completed_upload(upload_tokens["original"], original_path, song_name, "original")
+                store_completed_upload(upload_tokens["accompaniment"], acc_path, song_name, "accompaniment")
+                store_completed_upload(upload_tokens["lyrics"], lyrics_path, song_name, "lyrics")
                 
-                # Get accurate duration
-                duration = get_audio_duration(processed_acc)
-                if not duration or duration <= 0:
-                    duration = get_audio_duration(acc_path)
-                
-                metadata = get_metadata_cached()
-                metadata[song_name] = {
-                    "uploaded_by": st.session_state.user,
-                    "timestamp": str(time.time()),
-                    "duration": duration,
-                    "processed": True
-                }
-                save_metadata(metadata)
+                save_song_metadata(
+                    song_name,
+                    uploaded_by=st.session_state.user,
+                    timestamp=time.time(),
+                    # Header read only; also seeds the probe cache
+                    duration=get_audio_duration(acc_path),
+                    processed=False
+                )
 
-                get_song_files_cached.clear()
-                get_metadata_cached.clear()
+                # Encoding happens in the background workers; the song is
+                # playable from the uploaded files straight away
+                ingest.enqueue_job(song_name)
 
-                if duration:
-                    minutes = int(duration // 60)
-                    seconds = int(duration % 60)
-                    st.success(f"✅ Song Uploaded Successfully: {song_name}")
-                    st.info(f"⏱️ Duration: {minutes}:{seconds:02d}")
-                else:
-                    st.success(f"✅ Song Uploaded Successfully: {song_name}")
-                    st.warning("⚠️ Could not determine song duration")
+                catalog_index.invalidate()
+
+                st.success(f"✅ Song Uploaded Successfully: {song_name}")
+                st.info("🔄 Audio processing queued, progress is shown below")
                 st.balloons()
                 time.sleep(1)
                 st.rerun()
 
+        render_ingest_jobs()
+
     elif page_sidebar == "Songs List":
         st.subheader("🎵 All Songs List (Admin View)")
         
@@ -1307,8 +755,8 @@ elif st.session_state.page == "Admin Dashboard" and st.session_state.role == "ad
         uploaded_songs = get_song_files_cached()
         
         if search_query:
-            uploaded_songs = [song for song in uploaded_songs 
-                            if search_query.lower() in song.lower()]
+            # Ranked fuzzy match; also finds Telugu titles from a romanised query
+            uploaded_songs = song_search.search(search_query, uploaded_songs)
         
         if not uploaded_songs:
             if search_query:
@@ -1316,8 +764,12 @@ elif st.session_state.page == "Admin Dashboard" and st.session_state.role == "ad
             else:
                 st.warning("❌ No songs uploaded yet.")
         else:
-            for idx, s in enumerate(uploaded_songs):
-                col1, col2, col3 = st.columns([3, 1, 1])
+            visible_songs, offset = paginate(uploaded_songs, "admin_songs", reset_on=search_query)
+            for idx, s in enumerate(visible_songs, start=offset):
+                col_thumb, col1, col2, col3 = st.columns([0.4, 3, 1, 1])
+                
+                with col_thumb:
+                    render_song_thumb(s)
                 
                 with col1:
                     # Display song name 
@@ -1372,9 +824,7 @@ elif st.session_state.page == "Admin Dashboard" and st.session_state.role == "ad
                             st.success(f"✅ Song '{song_to_delete}' deleted successfully!")
                             st.session_state.confirm_delete = None
                             
-                            get_song_files_cached.clear()
-                            get_shared_links_cached.clear()
-                            get_metadata_cached.clear()
+                            catalog_index.invalidate()
                             
                             time.sleep(1)
                             st.rerun()
@@ -1400,8 +850,8 @@ elif st.session_state.page == "Admin Dashboard" and st.session_state.role == "ad
         st.session_state.search_query = search_query
         
         if search_query:
-            all_songs = [song for song in all_songs 
-                        if search_query.lower() in song.lower()]
+            # Ranked fuzzy match; also finds Telugu titles from a romanised query
+            all_songs = song_search.search(search_query, all_songs)
         
         shared_links_data = get_shared_links_cached()
 
@@ -1411,7 +861,8 @@ elif st.session_state.page == "Admin Dashboard" and st.session_state.role == "ad
             else:
                 st.warning("❌ No songs available to share.")
         else:
-            for song in all_songs:
+            visible_songs, _ = paginate(all_songs, "share_songs", reset_on=search_query)
+            for song in visible_songs:
                 col1, col2 = st.columns([3, 1])
                 
                 with col1:
@@ -1427,17 +878,14 @@ elif st.session_state.page == "Admin Dashboard" and st.session_state.role == "ad
                         if is_shared:
                             if st.button("🚫", key=f"unshare_{song}", help="Unshare"):
                                 delete_shared_link(song)
-                                get_shared_links_cached.clear()
+                                catalog_index.invalidate()
                                 st.success(f"✅ {song} unshared!")
                                 time.sleep(0.5)
                                 st.rerun()
                         else:
                             if st.button("🔗", key=f"share_{song}", help="Share"):
-                                save_shared_link(
-                                    song,
-                                    {"shared_by": st.session_state.user, "active": True}
-                                )
-                                get_shared_links_cached.clear()
+                                save_shared_link(song, st.session_state.user)
+                                catalog_index.invalidate()
                                 share_url = f"{APP_URL}?song={safe_song}"
                                 st.success(f"✅ {song} shared!\n{share_url}")
                                 time.sleep(0.5)
@@ -1464,23 +912,79 @@ elif st.session_state.page == "Admin Dashboard" and st.session_state.role == "ad
 
     elif page_sidebar == "Process Audio":
         st.header("🔧 Process Audio for Quality")
-        st.info("This will re-process all audio files for better quality and fix duration issues.")
+        st.info("This will re-process all audio files for better quality and fix duration issues. "
+                "Songs whose source audio and pipeline version are unchanged are skipped.")
+        
+        force_reprocess = st.checkbox("Force reprocess every song", key="force_reprocess")
         
         if st.button("🔄 Process All Audio Files", key="process_all_audio"):
-            all_songs = get_song_files_cached()
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            for idx, song in enumerate(all_songs):
-                status_text.text(f"Processing {song}...")
-                ensure_audio_processed(song)
-                progress_bar.progress((idx + 1) / len(all_songs))
-            
-            status_text.text("✅ All audio files processed!")
-            st.success("Audio processing completed successfully!")
-            get_metadata_cached.clear()
-            time.sleep(1)
-            st.rerun()
+            # One job per song: the ingest workers do the encoding, not this web process
+            queued = ingest.enqueue_jobs(get_song_files_cached(), "reprocess" if force_reprocess else "ingest")
+            st.success(f"✅ Queued {queued} songs; progress is shown under Processing Jobs")
+        
+        st.markdown("---")
+        st.info("Fold duplicate songs and lyrics images into the content-addressed store and delete blobs no song uses.")
+        
+        if st.button("🧹 Deduplicate Media Files", key="dedupe_media"):
+            with st.spinner("Hashing media files..."):
+                total_files = 0
+                total_saved = 0
+                for directory in [songs_dir, lyrics_dir]:
+                    files, saved = media_store.dedupe_directory(directory)
+                    total_files += files
+                    total_saved += saved
+                orphans, orphan_bytes = media_store.sweep_orphans()
+                total_saved += orphan_bytes
+            st.success(f"✅ Stored {total_files} files, removed {orphans} unused blobs, "
+                       f"freed {total_saved / (1024 * 1024):.1f} MB")
+
+        render_job_action(
+            "Measure every song's audio files once and cache duration, bitrate and format details.",
+            "📏 Backfill Media Probe Cache", "backfill_probes", "probe"
+        )
+        render_job_action(
+            "Measure EBU R128 loudness of every track so songs play at a consistent level.",
+            "🔊 Backfill Loudness Analysis", "backfill_loudness", "loudness"
+        )
+        render_job_action(
+            "Find the offset between each song's original and accompaniment so they play in sync.",
+            "🎯 Align All Tracks", "backfill_alignment", "alignment"
+        )
+        render_job_action(
+            "Generate waveform peak files so the player can show a waveform and scrub bar instantly.",
+            "〰️ Generate Waveforms", "backfill_waveforms", "waveform"
+        )
+        render_job_action(
+            "Create small, upright WebP/AVIF versions of lyrics images for the song lists, the player and the recording canvas.",
+            "🖼️ Generate Image Derivatives", "backfill_images", "images"
+        )
+        
+        render_ingest_jobs()
+
+    elif page_sidebar == "Startup Profile":
+        st.header("⏱️ Startup Profile")
+        st.info("Import time and first render of each page, per server process. "
+                "Start the app with STARTUP_PROFILE=1 to log the slowest imports as well.")
+
+        import_ms = startup_profile.process_import_ms()
+        if import_ms is not None:
+            st.write(f"This process (pid {os.getpid()}) imported the app in **{import_ms:.0f} ms**.")
+
+        timings = startup_profile.recent_timings()
+        if timings:
+            st.table([
+                {
+                    "When": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["recorded_at"])),
+                    "Process": row["pid"],
+                    "Page": row["page"],
+                    "Cold start": "✅" if row["cold"] else "",
+                    "Imports (ms)": f"{row['import_ms']:.0f}",
+                    "First render (ms)": f"{row['render_ms']:.0f}",
+                }
+                for row in timings
+            ])
+        else:
+            st.write("No renders recorded yet.")
 
     if st.sidebar.button("Logout", key="admin_logout"):
         for key in list(st.session_state.keys()):
@@ -1492,98 +996,6 @@ elif st.session_state.page == "Admin Dashboard" and st.session_state.role == "ad
 # =============== USER DASHBOARD ===============
 elif st.session_state.page == "User Dashboard" and st.session_state.role == "user":
     save_session_to_db()
-    
-    st.markdown("""
-    <style>
-    @media (max-width: 768px) {
-        h3 {
-            font-size: 1.2rem !important;
-        }
-        
-        [data-testid="stSidebar"] h2 {
-            font-size: 1.3rem !important;
-        }
-        
-        [data-testid="stSidebar"] h3 {
-            font-size: 1.1rem !important;
-        }
-        
-        .stButton > button {
-            font-size: 14px !important;
-            padding: 8px 12px !important;
-        }
-        
-        .user-song-name {
-            font-size: 14px !important;
-        }
-        
-        .stTextInput > div > div > input {
-            font-size: 14px !important;
-            padding: 8px !important;
-        }
-        
-        [data-testid="stSidebar"] {
-            min-width: 200px !important;
-            max-width: 250px !important;
-        }
-        
-        .main .block-container {
-            padding: 1rem !important;
-        }
-    }
-    
-    @media (max-width: 480px) {
-        h3 {
-            font-size: 1.1rem !important;
-        }
-        
-        .stButton > button {
-            font-size: 12px !important;
-            padding: 6px 10px !important;
-        }
-        
-        .stTextInput > div > div > input {
-            font-size: 12px !important;
-            padding: 6px !important;
-        }
-        
-        [data-testid="stSidebar"] {
-            min-width: 180px !important;
-            max-width: 220px !important;
-        }
-        
-        [data-testid="stSidebar"] h2 {
-            font-size: 1.2rem !important;
-        }
-    }
-    
-    .clickable-song {
-        cursor: pointer;
-        padding: 12px 8px;
-        transition: all 0.2s ease;
-        border-radius: 0px;
-        background: transparent !important;
-        border: none !important;
-        text-align: left;
-        width: 100%;
-        display: block;
-        margin: 0 !important;
-    }
-    
-    .clickable-song:hover {
-        background: rgba(255, 0, 102, 0.1) !important;
-        transform: translateX(5px);
-    }
-    
-    @media (max-width: 768px) {
-        .clickable-song {
-            padding: 10px 6px;
-            margin-bottom: 5px !important;
-            border-bottom: 1px solid rgba(255,255,255,0.1);
-        }
-    }
-    </style>
-    """, unsafe_allow_html=True)
 
     with st.sidebar:
         st.markdown("<h2 style='text-align: center;'>🎵 User Dashboard</h2>", unsafe_allow_html=True)
@@ -1592,8 +1004,7 @@ elif st.session_state.page == "User Dashboard" and st.session_state.role == "use
         st.markdown("### Quick Actions")
         
         if st.button("🔄 Refresh Songs List", key="user_refresh"):
-            get_song_files_cached.clear()
-            get_shared_links_cached.clear()
+            catalog_index.invalidate()
             st.rerun()
             
         if st.button("Logout", key="user_sidebar_logout"):
@@ -1619,8 +1030,8 @@ elif st.session_state.page == "User Dashboard" and st.session_state.role == "use
     uploaded_songs = [song for song in all_songs if song in shared_links]
     
     if search_query:
-        uploaded_songs = [song for song in uploaded_songs 
-                         if search_query.lower() in song.lower()]
+        # Ranked fuzzy match; also finds Telugu titles from a romanised query
+        uploaded_songs = song_search.search(search_query, uploaded_songs)
 
     if not uploaded_songs:
         if search_query:
@@ -1629,7 +1040,8 @@ elif st.session_state.page == "User Dashboard" and st.session_state.role == "use
             st.warning("❌ No shared songs available. Contact admin to share songs.")
             st.info("👑 Only admin-shared songs appear here for users.")
     else:
-        for idx, song in enumerate(uploaded_songs):
+        visible_songs, offset = paginate(uploaded_songs, "user_songs", reset_on=search_query)
+        for idx, song in enumerate(visible_songs, start=offset):
             # Display song with duration
             duration = get_song_duration(song)
             if duration:
@@ -1639,85 +1051,22 @@ elif st.session_state.page == "User Dashboard" and st.session_state.role == "use
             else:
                 display_name = f"✅ *{song}*"
             
-            if st.button(
-                display_name,
-                key=f"user_song_{song}_{idx}",
-                help="Click to play song",
-                use_container_width=True,
-                type="secondary"
-            ):
-                open_song_player(song)
+            col_thumb, col_song = st.columns([0.4, 5])
+            with col_thumb:
+                render_song_thumb(song)
+            with col_song:
+                if st.button(
+                    display_name,
+                    key=f"user_song_{song}_{idx}",
+                    help="Click to play song",
+                    use_container_width=True,
+                    type="secondary"
+                ):
+                    open_song_player(song)
 
 # =============== SONG PLAYER WITH FIXED ISSUES ===============
 elif st.session_state.page == "Song Player" and st.session_state.get("selected_song"):
     save_session_to_db()
-    
-    st.markdown("""
-    <style>
-    [data-testid="stSidebar"] {display: none !important;}
-    header {visibility: hidden !important;}
-    .st-emotion-cache-1pahdxg {display:none !important;}
-    .st-emotion-cache-18ni7ap {padding: 0 !important;}
-    footer {visibility: hidden !important;}
-    div.block-container {
-        padding: 0 !important;
-        margin: 0 auto !important;
-        width: 360px !important;
-        max-width: 360px !important;
-        overflow: hidden !important;
-        aspect-ratio: 9/16 !important;
-        position: relative !important;
-    }
-    html, body {
-        overflow: hidden !important;
-        margin: 0 !important;
-        padding: 0 !important;
-        width: 100% !important;
-        height: 100vh !important;
-    }
-    #root > div > div > div > div > section > div {padding-top: 0rem !important;}
-    .stApp {
-        overflow: hidden !important;
-        width: 100% !important;
-        height: 100vh !important;
-        margin: 0 auto !important;
-        display: flex !important;
-        justify-content: center !important;
-        align-items: center !important;
-    }
-    
-    /* Mobile specific */
-    @media (max-width: 768px) {
-        div.block-container {
-            width: 100% !important;
-            max-width: 100% !important;
-            height: 100vh !important;
-        }
-        
-        .stButton > button[kind="secondary"] {
-            font-size: 14px !important;
-            padding: 8px 12px !important;
-            margin: 5px !important;
-        }
-    }
-    
-    /* Desktop: force 9:16 aspect ratio */
-    @media (min-width: 769px) {
-        div.block-container {
-            width: 360px !important;
-            height: 640px !important;
-            margin: 20px auto !important;
-            border: 1px solid #ddd;
-            border-radius: 20px;
-            box-shadow: 0 10px 30px rgba(0,0,0,0.3);
-        }
-        
-        .stApp {
-            background: #f0f0f0 !important;
-        }
-    }
-    </style>
-    """, unsafe_allow_html=True)
 
     selected_song = st.session_state.get("selected_song", None)
     if not selected_song:
@@ -1747,21 +1096,6 @@ elif st.session_state.page == "Song Player" and st.session_state.get("selected_s
         st.error("❌ Access denied!")
         st.stop()
 
-    # Check for processed audio files first
-    processed_original_path = os.path.join(songs_dir, f"{selected_song}_original_processed.mp3")
-    processed_accompaniment_path = os.path.join(songs_dir, f"{selected_song}_accompaniment_processed.mp3")
-    
-    # Use processed files if available, otherwise use original
-    if os.path.exists(processed_original_path):
-        original_path = processed_original_path
-    else:
-        original_path = os.path.join(songs_dir, f"{selected_song}_original.mp3")
-    
-    if os.path.exists(processed_accompaniment_path):
-        accompaniment_path = processed_accompaniment_path
-    else:
-        accompaniment_path = os.path.join(songs_dir, f"{selected_song}_accompaniment.mp3")
-
     lyrics_path = ""
     for ext in [".jpg", ".jpeg", ".png"]:
         p = os.path.join(lyrics_dir, f"{selected_song}_lyrics_bg{ext}")
@@ -1769,831 +1103,50 @@ elif st.session_state.page == "Song Player" and st.session_state.get("selected_s
             lyrics_path = p
             break
 
-    original_b64 = file_to_base64(original_path)
-    accompaniment_b64 = file_to_base64(accompaniment_path)
-    lyrics_b64 = file_to_base64(lyrics_path)
+    # Media is streamed from the media server; only URLs go into the page.
+    # Content-addressed blob URLs never change, so browsers cache them for good.
+    renditions = get_song_renditions(selected_song)
+    lyrics_url = song_media_url(selected_song, "lyrics", lyrics_path, "lyrics_images")
+    lyrics_images = get_lyrics_image_urls(selected_song, lyrics_url)
     
     song_duration = get_song_duration(selected_song)
     if not song_duration or song_duration <= 0:
         song_duration = 180
 
-    # ✅ FIXED KARAOKE TEMPLATE - PLAYBACK IN SAME INTERFACE
-    karaoke_template = """
-<!doctype html>
-<html>
-<head>
-  <meta charset="utf-8" />
-  <title>🎤 Sing Along</title>
-  <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no, viewport-fit=cover">
-  <style>
-  * { 
-      margin: 0; 
-      padding: 0; 
-      box-sizing: border-box; 
-      -webkit-tap-highlight-color: transparent;
-  }
-  html, body {
-      overflow: hidden !important;
-      width: 100% !important;
-      height: 100% !important;
-      position: fixed !important;
-      top: 0 !important;
-      left: 0 !important;
-      background: #000 !important;
-      touch-action: manipulation;
-  }
-  body { 
-      background: #000; 
-      font-family: 'Poppins', sans-serif; 
-      height: 100% !important;
-      width: 100% !important;
-      overflow: hidden !important;
-      position: fixed !important;
-      margin: 0 !important;
-      padding: 0 !important;
-  }
-  .karaoke-wrapper {
-      width: 100% !important;
-      height: 100% !important;
-      position: absolute !important;
-      top: 0 !important;
-      left: 0 !important;
-      background: #111 !important;
-      overflow: hidden !important;
-      aspect-ratio: 9/16 !important;
-  }
-  #status { 
-      position: absolute; 
-      top: 10px; 
-      width: 100%; 
-      text-align: center; 
-      font-size: 12px; 
-      color: #ccc; 
-      z-index: 20; 
-      text-shadow: 1px 1px 6px rgba(0,0,0,0.9); 
-      padding: 5px;
-  }
-  .reel-bg { 
-      position: absolute; 
-      top: 0; 
-      left: 0; 
-      width: 100% !important; 
-      height: 75% !important; 
-      object-fit: contain !important;
-      object-position: center !important;
-  }
-  .lyrics { 
-      position: absolute; 
-      bottom: 30%; 
-      width: 100%; 
-      text-align: center; 
-      font-size: 4vw; 
-      font-weight: bold; 
-      color: white; 
-      text-shadow: 2px 2px 10px black; 
-      padding: 0 10px;
-  }
-  .controls { 
-      position: absolute; 
-      bottom: 10%; 
-      width: 100%; 
-      text-align: center; 
-      z-index: 30; 
-      display: flex;
-      justify-content: center;
-      flex-wrap: wrap;
-      gap: 5px;
-      padding: 0 10px;
-  }
-  button { 
-      background: linear-gradient(135deg, #ff0066, #ff66cc); 
-      border: none; 
-      color: white; 
-      padding: 10px 15px; 
-      border-radius: 20px; 
-      font-size: 12px; 
-      margin: 2px; 
-      box-shadow: 0px 3px 15px rgba(255,0,128,0.4); 
-      cursor: pointer; 
-      min-width: 100px;
-      flex: 1;
-      max-width: 150px;
-      -webkit-appearance: none;
-      -moz-appearance: none;
-      appearance: none;
-  }
-  button:active { 
-      transform: scale(0.95); 
-      opacity: 0.9;
-  }
-  .final-output { 
-      position: absolute !important; 
-      width: 100% !important; 
-      height: 100% !important; 
-      top: 0 !important; 
-      left: 0 !important; 
-      background: rgba(0,0,0,0.95); 
-      display: none; 
-      justify-content: center; 
-      align-items: center; 
-      z-index: 999; 
-  }
-  #logoImg { 
-      position: absolute; 
-      top: 10px; 
-      left: 10px; 
-      width: 30px;
-      height: 30px;
-      z-index: 50; 
-      opacity: 1;
-      filter: brightness(1.2);
-  }
-  canvas { 
-      display: none; 
-  }
-  .audio-player {
-      display: none;
-  }
-  /* Recording playback video */
-  #recordingVideoPlayer {
-      position: absolute;
-      top: 0;
-      left: 0;
-      width: 100%;
-      height: 100%;
-      object-fit: contain;
-      background: #000;
-      display: none;
-      z-index: 1000;
-  }
-  /* Video controls overlay */
-  .video-controls {
-      position: absolute;
-      bottom: 10%;
-      width: 100%;
-      text-align: center;
-      z-index: 1001;
-      display: flex;
-      justify-content: center;
-      gap: 10px;
-  }
-  .video-controls button {
-      background: rgba(0,0,0,0.7);
-      border: 1px solid rgba(255,255,255,0.3);
-  }
-  </style>
-</head>
-<body>
-  <div class="karaoke-wrapper" id="karaokeWrapper">
-      <img class="reel-bg" id="mainBg" src="data:image/jpeg;base64,%%LYRICS_B64%%" onerror="this.style.display='none'">
-      <img id="logoImg" src="data:image/png;base64,%%LOGO_B64%%" onerror="this.style.display='none'">
-      <div id="status">Ready 🎤 Tap screen first</div>
-      
-      <!-- Audio elements - hidden -->
-      <audio id="originalAudio" class="audio-player" preload="auto" data-src="data:audio/mp3;base64,%%ORIGINAL_B64%%"></audio>
-      <audio id="accompaniment" class="audio-player" preload="auto" data-src="data:audio/mp3;base64,%%ACCOMP_B64%%"></audio>
-      
-      <div class="controls">
-        <button id="playBtn">▶ Play Original</button>
-        <button id="recordBtn">🎙 Start Recording</button>
-        <button id="stopBtn" style="display:none;">⏹ Stop Recording</button>
-      </div>
-  </div>
-
-  <div class="final-output" id="finalOutputDiv">
-    <div class="karaoke-wrapper">
-      <img class="reel-bg" id="finalBg">
-      <div id="finalStatus">Recording Complete!</div>
-      <div class="controls">
-        <button id="playRecordingBtn">▶ Play</button>
-        <a id="downloadRecordingBtn" href="#" download>
-          <button>⬇ Download</button>
-        </a>
-        <button id="newRecordingBtn">New</button>
-      </div>
-    </div>
-  </div>
-
-  <!-- Video player for recording playback -->
-  <video id="recordingVideoPlayer" controls></video>
-  <div class="video-controls" id="videoControls" style="display:none;">
-    <button onclick="closeVideoPlayer()">Close</button>
-    <button onclick="toggleFullscreen()">Fullscreen</button>
-  </div>
-
-  <canvas id="recordingCanvas"></canvas>
-
-  <script>
-  /* ================== GLOBAL STATE ================== */
-  let mediaRecorder;
-  let recordedChunks = [];
-  let playRecordingAudio = null;
-  let lastRecordingURL = null;
-  let audioContext, micSource, accSource, micGain, accGain, destination, originalSource;
-  let canvasRafId = null;
-  let isRecording = false;
-  let isPlayingRecording = false;
-  let autoStopTimer = null;
-  let isSongPlaying = false;
-  let micStream = null;
-  let recordingStartTime = 0;
-  let recordingDuration = 0;
-  let originalAudioBuffer = null;
-  let accompanimentBuffer = null;
-
-  /* ================== ELEMENTS ================== */
-  const playBtn = document.getElementById("playBtn");
-  const recordBtn = document.getElementById("recordBtn");
-  const stopBtn = document.getElementById("stopBtn");
-  const status = document.getElementById("status");
-  const originalAudio = document.getElementById("originalAudio");
-  const accompanimentAudio = document.getElementById("accompaniment");
-  const finalDiv = document.getElementById("finalOutputDiv");
-  const mainBg = document.getElementById("mainBg");
-  const finalBg = document.getElementById("finalBg");
-  const finalStatus = document.getElementById("finalStatus");
-  const playRecordingBtn = document.getElementById("playRecordingBtn");
-  const downloadRecordingBtn = document.getElementById("downloadRecordingBtn");
-  const newRecordingBtn = document.getElementById("newRecordingBtn");
-  const canvas = document.getElementById("recordingCanvas");
-  const ctx = canvas.getContext("2d");
-  const logoImg = new Image();
-  logoImg.src = document.getElementById("logoImg").src;
-  const recordingVideoPlayer = document.getElementById("recordingVideoPlayer");
-  const videoControls = document.getElementById("videoControls");
-
-  /* ================== CANVAS SETUP ================== */
-  canvas.width = 720;
-  canvas.height = 1280;
-
-  /* ================== AUDIO CONTEXT FIX ================== */
-  async function ensureAudioContext() {
-      if (!audioContext) {
-          audioContext = new (window.AudioContext || window.webkitAudioContext)({
-              sampleRate: 48000,
-              latencyHint: 'playback'
-          });
-      }
-      if (audioContext.state === "suspended") {
-          await audioContext.resume();
-      }
-      return audioContext;
-  }
-
-  /* ================== LOAD AUDIO BUFFERS ================== */
-  async function loadAudioBuffers() {
-      const audioCtx = await ensureAudioContext();
-      
-      // Load original song
-      const originalRes = await fetch(originalAudio.getAttribute('data-src'));
-      const originalArrayBuffer = await originalRes.arrayBuffer();
-      originalAudioBuffer = await audioCtx.decodeAudioData(originalArrayBuffer);
-      
-      // Load accompaniment
-      const accRes = await fetch(accompanimentAudio.getAttribute('data-src'));
-      const accArrayBuffer = await accRes.arrayBuffer();
-      accompanimentBuffer = await audioCtx.decodeAudioData(accArrayBuffer);
-      
-      console.log("✅ Audio buffers loaded:");
-      console.log("- Original duration:", originalAudioBuffer.duration);
-      console.log("- Accompaniment duration:", accompanimentBuffer.duration);
-  }
-
-  /* ================== PLAY/STOP ORIGINAL SONG ================== */
-  playBtn.onclick = async function() {
-      await ensureAudioContext();
-      
-      if (!originalAudioBuffer) {
-          await loadAudioBuffers();
-      }
-      
-      if (!isSongPlaying) {
-          // Create and play original song buffer
-          originalSource = audioContext.createBufferSource();
-          originalSource.buffer = originalAudioBuffer;
-          originalSource.connect(audioContext.destination);
-          originalSource.start();
-          
-          isSongPlaying = true;
-          playBtn.innerText = "⏹ Stop Original";
-          status.innerText = "🎵 Playing original song...";
-          
-          // Auto stop when song ends
-          originalSource.onended = () => {
-              isSongPlaying = false;
-              playBtn.innerText = "▶ Play Original";
-              status.innerText = "✅ Song finished";
-          };
-      } else {
-          // Stop playing
-          if (originalSource) {
-              originalSource.stop();
-              originalSource.disconnect();
-              originalSource = null;
-          }
-          isSongPlaying = false;
-          playBtn.innerText = "▶ Play Original";
-          status.innerText = "⏹ Stopped";
-      }
-  };
-
-  /* ================== HIGH QUALITY CANVAS DRAW ================== */
-  function drawCanvas() {
-      ctx.fillStyle = "#000";
-      ctx.fillRect(0, 0, canvas.width, canvas.height);
-
-      const canvasW = canvas.width;
-      const canvasH = canvas.height * 0.75;
-
-      const imgRatio = mainBg.naturalWidth / mainBg.naturalHeight;
-      const canvasRatio = canvasW / canvasH;
-
-      let drawW, drawH;
-      if (imgRatio > canvasRatio) {
-          drawW = canvasW;
-          drawH = canvasW / imgRatio;
-      } else {
-          drawH = canvasH;
-          drawW = canvasH * imgRatio;
-      }
-
-      const x = (canvasW - drawW) / 2;
-      const y = 0;
-
-      ctx.imageSmoothingEnabled = true;
-      ctx.imageSmoothingQuality = 'high';
-      ctx.drawImage(mainBg, x, y, drawW, drawH);
-      
-      const logoSize = 60;
-      ctx.drawImage(logoImg, 20, 20, logoSize, logoSize);
-
-      canvasRafId = requestAnimationFrame(drawCanvas);
-  }
-
-  /* ================== FIXED: VOICE + ACCOMPANIMENT RECORDING ================== */
-  recordBtn.onclick = async function() {
-      if (isRecording) return;
-      
-      isRecording = true;
-      playBtn.style.display = "none";
-      recordBtn.style.display = "none";
-      stopBtn.style.display = "inline-block";
-      status.innerText = "🎙 Starting recording...";
-      
-      try {
-          const audioCtx = await ensureAudioContext();
-          
-          // Clear previous timer
-          if (autoStopTimer) {
-              clearTimeout(autoStopTimer);
-              autoStopTimer = null;
-          }
-          
-          // Stop any currently playing song
-          if (isSongPlaying && originalSource) {
-              originalSource.stop();
-              originalSource.disconnect();
-              originalSource = null;
-              isSongPlaying = false;
-          }
-          
-          // Load audio buffers if not loaded
-          if (!originalAudioBuffer || !accompanimentBuffer) {
-              await loadAudioBuffers();
-          }
-          
-          // ✅ CRITICAL FIX: Play original song through separate audio element (not recorded)
-          // Create hidden audio element for original song playback
-          const playbackAudio = new Audio(originalAudio.getAttribute('data-src'));
-          playbackAudio.volume = 1.0;
-          playbackAudio.play().catch(e => console.log("Playback error:", e));
-          
-          // Get microphone with optimized settings for CLEAR VOICE
-          micStream = await navigator.mediaDevices.getUserMedia({
-              audio: {
-                  echoCancellation: false,  // Better for voice clarity
-                  noiseSuppression: true,   // Reduce background noise
-                  autoGainControl: false,   // Manual control
-                  channelCount: 1,
-                  sampleRate: 48000,
-                  sampleSize: 24,
-                  latency: 0.01
-              },
-              video: false
-          }).catch(err => {
-              status.innerText = "❌ Microphone access required";
-              resetUIOnError();
-              throw err;
-          });
-          
-          // Create microphone source
-          micSource = audioCtx.createMediaStreamSource(micStream);
-          
-          // Create accompaniment source from buffer
-          accSource = audioCtx.createBufferSource();
-          accSource.buffer = accompanimentBuffer;
-          
-          // Get ACTUAL duration
-          const actualDuration = accompanimentBuffer.duration;
-          console.log("✅ Actual accompaniment duration:", actualDuration, "seconds");
-          
-          // Create gain nodes with optimal settings for CLEAR RECORDING
-          micGain = audioCtx.createGain();
-          micGain.gain.value = 1.5;  // Voice volume - CLEAR
-          
-          accGain = audioCtx.createGain();
-          accGain.gain.value = 0.4;  // Accompaniment volume
-          
-          // Create destination for recording
-          destination = audioCtx.createMediaStreamDestination();
-          
-          // ✅ IMPORTANT: Connect ONLY microphone and accompaniment to recording
-          // Original song is played separately and NOT connected to recording
-          micSource.connect(micGain);
-          micGain.connect(destination);
-          accSource.connect(accGain);
-          accGain.connect(destination);
-          
-          // Start canvas drawing
-          drawCanvas();
-          
-          // Start accompaniment for recording
-          accSource.start();
-          
-          // Create stream from canvas
-          const canvasStream = canvas.captureStream(30);
-          const mixedAudioStream = destination.stream;
-          
-          // Combine video and audio streams
-          const combinedStream = new MediaStream([
-              ...canvasStream.getVideoTracks(),
-              ...mixedAudioStream.getAudioTracks()
-          ]);
-          
-          // ✅ FIXED: USE MP4 FORMAT FOR BETTER COMPATIBILITY
-          let mimeType = 'video/mp4;codecs=avc1.42E01E,mp4a.40.2';
-          if (!MediaRecorder.isTypeSupported(mimeType)) {
-              mimeType = 'video/webm;codecs=vp9,opus';
-          }
-          if (!MediaRecorder.isTypeSupported(mimeType)) {
-              mimeType = 'video/webm;codecs=vp8,opus';
-          }
-          if (!MediaRecorder.isTypeSupported(mimeType)) {
-              mimeType = 'video/webm';
-          }
-          
-          // Create MediaRecorder with optimal settings
-          mediaRecorder = new MediaRecorder(combinedStream, {
-              mimeType: mimeType,
-              audioBitsPerSecond: 256000,    // High quality audio
-              videoBitsPerSecond: 5000000,   // High quality video
-              videoKeyFrameInterval: 30
-          });
-          
-          recordedChunks = [];
-          recordingStartTime = Date.now();
-          
-          mediaRecorder.ondataavailable = e => {
-              if (e.data.size > 0) {
-                  recordedChunks.push(e.data);
-              }
-          };
-          
-          mediaRecorder.onstop = () => {
-              cancelAnimationFrame(canvasRafId);
-              recordingDuration = (Date.now() - recordingStartTime) / 1000;
-              
-              // Stop playback audio
-              playbackAudio.pause();
-              playbackAudio.currentTime = 0;
-              
-              // Cleanup audio sources
-              cleanupAudioSources();
-              
-              // Create blob
-              if (recordedChunks.length > 0) {
-                  const blob = new Blob(recordedChunks, { type: mimeType });
-                  const url = URL.createObjectURL(blob);
-                  
-                  if (lastRecordingURL) URL.revokeObjectURL(lastRecordingURL);
-                  lastRecordingURL = url;
-                  
-                  finalBg.src = mainBg.src;
-                  finalDiv.style.display = "flex";
-                  
-                  // Show actual recording duration
-                  const minutes = Math.floor(recordingDuration / 60);
-                  const seconds = Math.floor(recordingDuration % 60);
-                  finalStatus.innerText = `✅ Recording Complete! (${minutes}:${seconds.toString().padStart(2, '0')})`;
-                  
-                  // ✅ FIXED: Set download link with proper metadata
-                  const songName = "%%SONG_NAME%%".replace(/[^a-zA-Z0-9]/g, '_');
-                  
-                  // Determine file extension
-                  let extension = '';
-                  if (mimeType.includes('mp4')) {
-                      extension = '_KARAOKE.mp4';
-                  } else {
-                      extension = '_KARAOKE.webm';
-                  }
-                  
-                  const fileName = songName + extension;
-                  downloadRecordingBtn.href = url;
-                  downloadRecordingBtn.download = fileName;
-                  
-                  // ✅ FIXED: Play recording in same interface
-                  playRecordingBtn.onclick = () => {
-                      if (!isPlayingRecording) {
-                          // Show video player
-                          recordingVideoPlayer.src = url;
-                          recordingVideoPlayer.style.display = 'block';
-                          videoControls.style.display = 'flex';
-                          
-                          // Hide final output
-                          finalDiv.style.display = 'none';
-                          
-                          // Play the video
-                          recordingVideoPlayer.play();
-                          
-                          playRecordingBtn.innerText = "⏹ Stop";
-                          isPlayingRecording = true;
-                          
-                          // Update button text when video ends
-                          recordingVideoPlayer.onended = () => {
-                              closeVideoPlayer();
-                              playRecordingBtn.innerText = "▶ Play";
-                              isPlayingRecording = false;
-                          };
-                      } else {
-                          closeVideoPlayer();
-                          playRecordingBtn.innerText = "▶ Play";
-                          isPlayingRecording = false;
-                      }
-                  };
-              }
-          };
-          
-          // Start recording
-          mediaRecorder.start(1000);
-          
-          status.innerText = "🎙 Recording... Original song playing (not recorded) + Your voice + Accompaniment";
-          
-          // AUTO-STOP TIMER based on accompaniment duration
-          autoStopTimer = setTimeout(() => {
-              if (isRecording) {
-                  stopRecording();
-                  status.innerText = "✅ Auto-stopped: Recording complete!";
-              }
-          }, (actualDuration * 1000) + 1000);
-          
-      } catch (error) {
-          console.error("Recording error:", error);
-          status.innerText = "❌ Failed: " + (error.message || "Check microphone access");
-          resetUIOnError();
-      }
-  };
-
-  /* ================== CLEANUP AUDIO SOURCES ================== */
-  function cleanupAudioSources() {
-      if (accSource) {
-          try { 
-              accSource.stop(); 
-              accSource.disconnect();
-          } catch(e) {}
-          accSource = null;
-      }
-      
-      if (originalSource) {
-          try { 
-              originalSource.stop(); 
-              originalSource.disconnect();
-          } catch(e) {}
-          originalSource = null;
-      }
-      
-      if (micSource) {
-          try { 
-              micSource.disconnect(); 
-          } catch(e) {}
-          micSource = null;
-      }
-      
-      if (micGain) {
-          try {
-              micGain.disconnect();
-          } catch(e) {}
-          micGain = null;
-      }
-      
-      if (accGain) {
-          try {
-              accGain.disconnect();
-          } catch(e) {}
-          accGain = null;
-      }
-      
-      if (destination) {
-          try {
-              destination.disconnect();
-          } catch(e) {}
-          destination = null;
-      }
-      
-      if (micStream) {
-          micStream.getTracks().forEach(track => track.stop());
-          micStream = null;
-      }
-  }
-
-  /* ================== STOP RECORDING ================== */
-  function stopRecording() {
-      if (!isRecording) return;
-      
-      // Clear timer
-      if (autoStopTimer) {
-          clearTimeout(autoStopTimer);
-          autoStopTimer = null;
-      }
-      
-      // Stop media recorder
-      if (mediaRecorder && mediaRecorder.state !== 'inactive') {
-          mediaRecorder.stop();
-      }
-      
-      // Cleanup audio sources
-      cleanupAudioSources();
-      
-      // Stop original song if playing
-      if (isSongPlaying && originalSource) {
-          originalSource.stop();
-          originalSource.disconnect();
-          originalSource = null;
-          isSongPlaying = false;
-      }
-      
-      // Stop canvas
-      if (canvasRafId) {
-          cancelAnimationFrame(canvasRafId);
-          canvasRafId = null;
-      }
-      
-      // Update UI
-      isRecording = false;
-      stopBtn.style.display = "none";
-      status.innerText = "Processing recording...";
-  }
-
-  /* ================== STOP BUTTON CLICK ================== */
-  stopBtn.onclick = function() {
-      stopRecording();
-  };
-
-  /* ================== NEW RECORDING ================== */
-  newRecordingBtn.onclick = function() {
-      closeVideoPlayer();
-      finalDiv.style.display = "none";
-      
-      // Reset audio
-      if (isSongPlaying && originalSource) {
-          originalSource.stop();
-          originalSource.disconnect();
-          originalSource = null;
-          isSongPlaying = false;
-      }
-      
-      // Reset UI
-      playBtn.style.display = "inline-block";
-      playBtn.innerText = "▶ Play Original";
-      recordBtn.style.display = "inline-block";
-      stopBtn.style.display = "none";
-      status.innerText = "Ready 🎤";
-      
-      // Reset state
-      recordedChunks = [];
-      isRecording = false;
-      isPlayingRecording = false;
-      recordingStartTime = 0;
-      recordingDuration = 0;
-      
-      // Release URL
-      if (lastRecordingURL) {
-          URL.revokeObjectURL(lastRecordingURL);
-          lastRecordingURL = null;
-      }
-  };
-
-  /* ================== VIDEO PLAYER FUNCTIONS ================== */
-  function closeVideoPlayer() {
-      if (recordingVideoPlayer) {
-          recordingVideoPlayer.pause();
-          recordingVideoPlayer.currentTime = 0;
-          recordingVideoPlayer.style.display = 'none';
-          videoControls.style.display = 'none';
-          recordingVideoPlayer.src = '';
-      }
-      finalDiv.style.display = 'flex';
-      playRecordingBtn.innerText = "▶ Play";
-      isPlayingRecording = false;
-      
-      // Exit fullscreen if active
-      if (document.fullscreenElement) {
-          document.exitFullscreen();
-      }
-  }
-
-  function toggleFullscreen() {
-      if (!document.fullscreenElement) {
-          recordingVideoPlayer.requestFullscreen().catch(err => {
-              console.log("Fullscreen error:", err);
-          });
-      } else {
-          document.exitFullscreen();
-      }
-  }
-
-  /* ================== HELPER FUNCTIONS ================== */
-  function resetUIOnError() {
-      isRecording = false;
-      playBtn.style.display = "inline-block";
-      playBtn.innerText = "▶ Play Original";
-      recordBtn.style.display = "inline-block";
-      stopBtn.style.display = "none";
-      
-      // Reset song playing state
-      isSongPlaying = false;
-      
-      // Stop original song
-      if (originalSource) {
-          originalSource.stop();
-          originalSource.disconnect();
-          originalSource = null;
-      }
-      
-      if (autoStopTimer) {
-          clearTimeout(autoStopTimer);
-          autoStopTimer = null;
-      }
-      
-      // Cleanup
-      cleanupAudioSources();
-  }
-
-  /* ================== TOUCH EVENTS FOR MOBILE ================== */
-  document.addEventListener('touchstart', async () => {
-      await ensureAudioContext();
-  }, { once: true });
-
-  /* ================== INITIALIZE ================== */
-  window.addEventListener('load', async () => {
-      status.innerText = "Ready 🎤 - Tap screen first";
-      
-      // Pre-warm audio context and load buffers
-      try {
-          await ensureAudioContext();
-          await loadAudioBuffers();
-          status.innerText = "Ready 🎤 - Click 'Play Original' to listen";
-      } catch(e) {
-          console.log("Initialization error:", e);
-          status.innerText = "Ready 🎤";
-      }
-  });
-
-  /* ================== CLEANUP ================== */
-  window.addEventListener('beforeunload', () => {
-      if (lastRecordingURL) {
-          URL.revokeObjectURL(lastRecordingURL);
-      }
-      if (audioContext) {
-          audioContext.close();
-      }
-      cleanupAudioSources();
-  });
-
-  /* ================== VIDEO PLAYER EVENT LISTENERS ================== */
-  recordingVideoPlayer.addEventListener('click', function() {
-      if (this.paused) {
-          this.play();
-      } else {
-          this.pause();
-      }
-  });
-
-  document.addEventListener('fullscreenchange', function() {
-      if (!document.fullscreenElement) {
-          videoControls.style.display = 'flex';
-      }
-  });
-  </script>
-</body>
-</html>
-"""
-
-    karaoke_html = karaoke_template.replace("%%LYRICS_B64%%", lyrics_b64 or "")
-    karaoke_html = karaoke_html.replace("%%LOGO_B64%%", logo_b64 or "")
-    karaoke_html = karaoke_html.replace("%%ORIGINAL_B64%%", original_b64 or "")
-    karaoke_html = karaoke_html.replace("%%ACCOMP_B64%%", accompaniment_b64 or "")
-    karaoke_html = karaoke_html.replace("%%SONG_NAME%%", selected_song)
-    karaoke_html = karaoke_html.replace("%%SONG_DURATION%%", str(song_duration))
+    # Precomputed EBU R128 gains level every song without re-encoding
+    loudness = load_loudness(selected_song)
+    track_gains = {track: loudness_gain(loudness.get(track)) for track in AUDIO_TRACKS}
+
+    # Where the accompaniment sits inside the original, measured at ingest
+    alignment = load_alignment(selected_song)
+    track_alignment = {"offset": 0.0, "drift": 0.0}
+    if alignment and alignment["offset"] is not None:
+        track_alignment = {"offset": alignment["offset"], "drift": alignment["drift"] or 0.0}
+
+    # Waveform peaks (a few KB) let the player draw before the audio loads
+    peaks_urls = {}
+    for track in AUDIO_TRACKS:
+        peaks_file = os.path.join(songs_dir, f"{selected_song}_{track}{PEAKS_SUFFIX}")
+        if os.path.exists(peaks_file):
+            peaks_urls[track] = media_url("songs", peaks_file)
+
+    # The player code and styles are static, browser-cached files; the page
+    # carries only this song's config (a few KB)
+    player_config = {
+        "song_name": selected_song,
+        "duration": song_duration,
+        "media_base": MEDIA_BASE_URL,
+        "renditions": renditions,
+        "lyrics_images": lyrics_images,
+        "track_gains": track_gains,
+        "alignment": track_alignment,
+        "peaks_urls": peaks_urls,
+        "logo_url": assets.player_logo_url(),
+        "cache_mb": PLAYER_CACHE_MB,
+    }
+    karaoke_html = assets.player_shell().replace(
+        "%%PLAYER_CONFIG_JSON%%", json.dumps(player_config).replace("</", "<\\/")
+    )
 
     # Back button
     if st.session_state.role in ["admin", "user"]:
@@ -2624,3 +1177,6 @@ else:
         st.session_state.page = "Login"
     save_session_to_db()
     st.rerun()
+
+# First render per page and process, for the startup profile
+startup_profile.page_rendered(st.session_state.page)
@@ -0,0 +1,215 @@
+import os
+import re
+import io
+import json
+import base64
+import hashlib
+import threading
+from settings import media_dir, logo_dir
+
+# =============== STARTUP ASSET BUNDLE ===============
+# Page icon, logo and CSS are built once into a versioned JSON bundle
+# (python assets.py, run before the web process starts) and loaded once per
+# process, so a rerun never re-reads or re-encodes an image and nothing at
+# startup touches the network. The bundle records the size and mtime of
+# every source; if a source changed or the bundle is missing, the first
+# process to need it rebuilds it locally.
+#
+#   page_icon   64x64 PNG derived from media/logo/logoo.png
+#   logo        180x180 PNG of the branks3 logo (shown at <= 60 px)
+#   css         per page: the global rules followed by that page's rules,
+#               one <style> block per rerun instead of several
+#   player      the song player shell (assets/player/shell.html). Its CSS,
+#               JS and the logo are written next to the bundle under
+#               content-hashed names and served by the media server with
+#               immutable caching, so the browser downloads them once and a
+#               player open only sends the shell and the song's JSON config
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+CSS_DIR = os.path.join(ASSETS_DIR, "css")
+PLAYER_DIR = os.path.join(ASSETS_DIR, "player")
+STATIC_DIR = os.path.join(media_dir, "assets")
+STATIC_URL = "/media/assets/"
+BUNDLE_PATH = os.path.join(STATIC_DIR, "asset_bundle.json")
+ICON_SOURCE = os.path.join(logo_dir, "logoo.png")
+LOGO_SOURCE = os.path.join(logo_dir, "branks3_logo.png")
+ICON_SIZE = 64
+LOGO_SIZE = 180
+DEFAULT_ICON = "𝄞"
+
+# Streamlit page name -> stylesheet in assets/css (after global.css)
+PAGE_CSS = {
+    "Login": "login.css",
+    "Admin Dashboard": "admin.css",
+    "User Dashboard": "user.css",
+    "Song Player": "player.css",
+}
+
+PLAYER_SOURCES = ("shell.html", "player.css", "player.js")
+_static_re = re.compile(r"^(player|logo)\.[0-9a-f]{16}\.(css|js|png)$")
+
+_lock = threading.Lock()
+_bundle = None
+_page_icon = None
+
+
+def _sources():
+    paths = [ICON_SOURCE, LOGO_SOURCE, os.path.join(CSS_DIR, "global.css")]
+    paths += [os.path.join(CSS_DIR, name) for name in PAGE_CSS.values()]
+    paths += [os.path.join(PLAYER_DIR, name) for name in PLAYER_SOURCES]
+    return paths
+
+
+def _source_stamp():
+    """Size and mtime of every input, to tell whether the bundle is stale"""
+    stamp = {}
+    for path in _sources():
+        try:
+            stat = os.stat(path)
+            stamp[os.path.relpath(path, os.path.dirname(ASSETS_DIR))] = [stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            stamp[os.path.relpath(path, os.path.dirname(ASSETS_DIR))] = None
+    return stamp
+
+
+def _png_b64(path, size):
+    """Square PNG thumbnail of an image as base64, or "" if it cannot be read"""
+    try:
+        from PIL import Image
+        with Image.open(path) as image:
+            image = image.convert("RGBA")
+            image.thumbnail((size, size), Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, "PNG", optimize=True)
+        return base64.b64encode(buffer.getvalue()).decode()
+    except Exception as e:
+        print(f"⚠️ Could not read {os.path.basename(path)}: {e}")
+        return ""
+
+
+def _read_css(name):
+    try:
+        with open(os.path.join(CSS_DIR, name), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError as e:
+        print(f"⚠️ Missing stylesheet {name}: {e}")
+        return ""
+
+
+def _read_player(name):
+    with open(os.path.join(PLAYER_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _write_static(stem, ext, data, static_dir):
+    """Write data under a content-hashed name. Returns its versioned URL path"""
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    name = f"{stem}.{digest}{ext}"
+    path = os.path.join(static_dir, name)
+    if not os.path.exists(path):
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    return f"{STATIC_URL}{name}?v={digest}"
+
+
+def _build_player(logo, static_dir):
+    """Shell HTML and logo URL of the song player, writing its static files"""
+    css_url = _write_static("player", ".css", _read_player("player.css").encode(), static_dir)
+    js_url = _write_static("player", ".js", _read_player("player.js").encode(), static_dir)
+    logo_url = _write_static("logo", ".png", base64.b64decode(logo), static_dir) if logo else ""
+    shell = _read_player("shell.html")
+    shell = shell.replace("%%PLAYER_CSS_URL%%", css_url).replace("%%PLAYER_JS_URL%%", js_url)
+
+    # Drop earlier versions; the shell only ever points at the current ones
+    current = {url[len(STATIC_URL):].split("?")[0] for url in (css_url, js_url, logo_url) if url}
+    for name in os.listdir(static_dir):
+        if _static_re.match(name) and name not in current:
+            try:
+                os.remove(os.path.join(static_dir, name))
+            except OSError:
+                pass
+    return {"shell": shell, "logo_url": logo_url}
+
+
+def build_bundle(path=BUNDLE_PATH):
+    """Build the bundle from the sources and write it atomically. Returns it"""
+    global_css = _read_css("global.css")
+    css = {"": f"<style>\n{global_css}\n</style>"}
+    for page, name in PAGE_CSS.items():
+        css[page] = f"<style>\n{global_css}\n\n{_read_css(name)}\n</style>"
+    logo = _png_b64(LOGO_SOURCE, LOGO_SIZE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    bundle = {
+        "sources": _source_stamp(),
+        "page_icon": _png_b64(ICON_SOURCE, ICON_SIZE),
+        "logo": logo,
+        "css": css,
+        "player": _build_player(logo, os.path.dirname(path)),
+    }
+    content = json.dumps(bundle, sort_keys=True)
+    bundle["version"] = hashlib.sha256(content.encode()).hexdigest()[:16]
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(bundle, f)
+    os.replace(temp_path, path)
+    return bundle
+
+
+def load_bundle():
+    """The asset bundle, read (or rebuilt if stale) once per process"""
+    global _bundle
+    if _bundle is not None:
+        return _bundle
+    with _lock:
+        if _bundle is None:
+            bundle = None
+            try:
+                with open(BUNDLE_PATH, "r", encoding="utf-8") as f:
+                    bundle = json.load(f)
+            except (OSError, ValueError):
+                pass
+            if not bundle or bundle.get("sources") != _source_stamp():
+                bundle = build_bundle()
+                print(f"✅ Built asset bundle {bundle['version']}")
+            _bundle = bundle
+    return _bundle
+
+
+def page_icon():
+    """PNG bytes of the page icon, or an emoji when there is no logo.
+    Streamlit takes the encoded image as is, so no image library is loaded"""
+    global _page_icon
+    if _page_icon is None:
+        data = load_bundle().get("page_icon")
+        try:
+            _page_icon = base64.b64decode(data) if data else DEFAULT_ICON
+        except ValueError:
+            _page_icon = DEFAULT_ICON
+    return _page_icon
+
+
+def logo_b64():
+    return load_bundle().get("logo", "")
+
+
+def player_shell():
+    """The song player page; %%PLAYER_CONFIG_JSON%% marks the song config"""
+    return load_bundle()["player"]["shell"]
+
+
+def player_logo_url():
+    return load_bundle()["player"]["logo_url"]
+
+
+def page_css(page):
+    """One <style> block with the global rules and the page's own"""
+    css = load_bundle()["css"]
+    return css.get(page, css[""])
+
+
+if __name__ == "__main__":
+    bundle = build_bundle()
+    print(f"✅ Asset bundle {bundle['version']} written to {BUNDLE_PATH}")
@@ -0,0 +1,1114 @@
+/* ================== SONG CONFIG ================== */
+// This file is static and cached by the browser; everything that differs
+// per song arrives in the small JSON config of the player shell, including
+// media_base (the app's MEDIA_BASE_URL).
+const CONFIG = window.PLAYER_CONFIG;
+
+/* ================== MEDIA URLS ================== */
+// Media is served with byte ranges by the media server, so playback
+// starts as soon as the first bytes arrive. media_base is a path on the
+// app's own origin unless the standalone server is used, so URLs are made
+// absolute against the page (segment URLs resolve against the manifest's).
+const MEDIA_BASE = CONFIG.media_base;
+function mediaUrl(path) {
+    return path ? new URL(MEDIA_BASE + path, document.baseURI).href : "";
+}
+const RENDITIONS = CONFIG.renditions;
+const SONG_DURATION = parseFloat(CONFIG.duration) || 0;
+// Per-track loudness normalization gains measured at ingest (1 = unmeasured)
+const TRACK_GAINS = Object.assign({original: 1, accompaniment: 1}, CONFIG.track_gains);
+// A media element cannot amplify, so the original is only ever attenuated
+const ORIGINAL_VOLUME = Math.min(1, TRACK_GAINS.original);
+// original_time = accompaniment_time * (1 + drift) + offset, measured at ingest
+const ALIGNMENT = Object.assign({offset: 0, drift: 0}, CONFIG.alignment);
+function originalTimeFor(accTime) {
+    return accTime * (1 + ALIGNMENT.drift) + ALIGNMENT.offset;
+}
+// Lyrics image candidates per size, best format first, the original last
+const LYRICS_IMAGES = CONFIG.lyrics_images;
+
+/* ================== RENDITION SELECTION ================== */
+// Renditions are ordered lowest bitrate first. Auto mode uses the user's
+// data-saver hint, network client hints and the throughput measured on
+// previous loads; the quality menu overrides it.
+function readSetting(key) {
+    try { return localStorage.getItem(key); } catch(e) { return null; }
+}
+function writeSetting(key, value) {
+    try { localStorage.setItem(key, value); } catch(e) {}
+}
+
+function pickRendition() {
+    const probe = document.createElement("audio");
+    const playable = RENDITIONS.filter(r => probe.canPlayType(r.mime) !== "");
+    const choices = playable.length ? playable : RENDITIONS;
+
+    const setting = readSetting("singalong_quality") || "auto";
+    const chosen = choices.find(r => r.name === setting);
+    if (chosen) return chosen;
+
+    const conn = navigator.connection || {};
+    let budgetKbps = Infinity;
+    if (conn.saveData || /2g$/.test(conn.effectiveType || "")) {
+        budgetKbps = 64;
+    } else if (conn.effectiveType === "3g") {
+        budgetKbps = 128;
+    }
+    // Both tracks download together, so leave each a quarter of the link
+    const measuredKbps = parseFloat(readSetting("singalong_kbps"));
+    if (measuredKbps > 0) {
+        budgetKbps = Math.min(budgetKbps, measuredKbps / 4);
+    } else if (conn.downlink) {
+        budgetKbps = Math.min(budgetKbps, conn.downlink * 1000 / 4);
+    } else if (window.matchMedia("(max-width: 768px)").matches) {
+        budgetKbps = Math.min(budgetKbps, 128);
+    }
+
+    let best = choices[0];
+    for (const r of choices) {
+        if (r.kbps <= budgetKbps) best = r;
+    }
+    return best;
+}
+
+function recordThroughput(bytes, millis) {
+    if (!bytes || millis <= 0) return;
+    const kbps = bytes * 8 / millis;
+    const previous = parseFloat(readSetting("singalong_kbps"));
+    const smoothed = previous > 0 ? previous * 0.7 + kbps * 0.3 : kbps;
+    writeSetting("singalong_kbps", smoothed.toFixed(0));
+}
+
+let rendition = pickRendition();
+let ORIGINAL_URL = mediaUrl(rendition.original);
+let ACCOMP_URL = mediaUrl(rendition.accompaniment);
+
+/* ================== GLOBAL STATE ================== */
+let mediaRecorder;
+let recordedChunks = [];
+let playRecordingAudio = null;
+let lastRecordingURL = null;
+let audioContext, micSource, accSource, micGain, accGain, destination;
+let canvasRafId = null;
+let isRecording = false;
+let isPlayingRecording = false;
+let autoStopTimer = null;
+let isSongPlaying = false;
+let micStream = null;
+let recordingStartTime = 0;
+let recordingDuration = 0;
+let accElementSource = null;
+let originalLoader = null;
+let accompanimentLoader = null;
+const SEGMENT_LOOKAHEAD = 30;
+
+/* ================== ELEMENTS ================== */
+const playBtn = document.getElementById("playBtn");
+const recordBtn = document.getElementById("recordBtn");
+const stopBtn = document.getElementById("stopBtn");
+const status = document.getElementById("status");
+const originalAudio = document.getElementById("originalAudio");
+const accompanimentAudio = document.getElementById("accompaniment");
+const finalDiv = document.getElementById("finalOutputDiv");
+const mainBg = document.getElementById("mainBg");
+const finalBg = document.getElementById("finalBg");
+const finalStatus = document.getElementById("finalStatus");
+const playRecordingBtn = document.getElementById("playRecordingBtn");
+const downloadRecordingBtn = document.getElementById("downloadRecordingBtn");
+const newRecordingBtn = document.getElementById("newRecordingBtn");
+const canvas = document.getElementById("recordingCanvas");
+const ctx = canvas.getContext("2d");
+// The logo is a static file on the media server; CORS keeps the recording
+// canvas exportable
+const logoImg = new Image();
+logoImg.crossOrigin = "anonymous";
+logoImg.src = mediaUrl(CONFIG.logo_url);
+document.getElementById("logoImg").src = logoImg.src;
+const recordingVideoPlayer = document.getElementById("recordingVideoPlayer");
+const videoControls = document.getElementById("videoControls");
+
+const qualitySelect = document.getElementById("qualitySelect");
+qualitySelect.value = readSetting("singalong_quality") || "auto";
+
+loadRenditionSources();
+console.log("🎚 Using rendition:", rendition.name, rendition.kbps + "kbps");
+/* ================== LYRICS IMAGE ================== */
+// Try each candidate until one decodes (e.g. AVIF on an older browser)
+function loadImageCandidates(img, urls) {
+    const queue = (urls || []).map(mediaUrl).filter(Boolean);
+    return new Promise(resolve => {
+        const next = () => {
+            if (!queue.length) {
+                resolve(false);
+                return;
+            }
+            img.onerror = next;
+            img.onload = () => resolve(true);
+            img.src = queue.shift();
+        };
+        next();
+    });
+}
+
+// The recording canvas gets a derivative already at its draw size, so
+// every frame is a 1:1 copy instead of a rescale of a camera photo
+const canvasBg = new Image();
+canvasBg.crossOrigin = "anonymous";
+let canvasBgReady = false;
+
+(async () => {
+    const displayUrls = (window.devicePixelRatio || 1) > 1.5 ? LYRICS_IMAGES.canvas : LYRICS_IMAGES.player;
+    if (!displayUrls || !displayUrls.length) {
+        mainBg.style.display = "none";
+        return;
+    }
+    // Tiny thumbnail first, blurred, while the sized image loads
+    if (LYRICS_IMAGES.thumb && LYRICS_IMAGES.thumb.length) {
+        mainBg.style.filter = "blur(6px)";
+        await loadImageCandidates(mainBg, LYRICS_IMAGES.thumb);
+    }
+    const full = new Image();
+    full.crossOrigin = "anonymous";
+    if (await loadImageCandidates(full, displayUrls)) {
+        mainBg.onerror = null;
+        mainBg.src = full.src;
+    } else if (!mainBg.naturalWidth) {
+        mainBg.style.display = "none";
+    }
+    mainBg.style.filter = "";
+    canvasBgReady = await loadImageCandidates(canvasBg, LYRICS_IMAGES.canvas);
+})();
+
+/* ================== CANVAS SETUP ================== */
+canvas.width = 720;
+canvas.height = 1280;
+
+/* ================== AUDIO CONTEXT FIX ================== */
+async function ensureAudioContext() {
+    if (!audioContext) {
+        audioContext = new (window.AudioContext || window.webkitAudioContext)({
+            sampleRate: 48000,
+            latencyHint: 'playback'
+        });
+    }
+    if (audioContext.state === "suspended") {
+        await audioContext.resume();
+    }
+    return audioContext;
+}
+
+/* ================== PERSISTENT MEDIA CACHE ================== */
+// A versioned media URL (?v= is the blob hash or file version from the
+// server) never changes content, so fetched manifests, segments, peaks and
+// whole files are kept in the Cache API across visits: rehearsing a song
+// again plays it without touching the network. A small index in
+// localStorage tracks sizes and last use, and the least recently used
+// entries are dropped once the cache outgrows its budget. Without the
+// Cache API (insecure origin, private mode) everything comes from the network.
+const MEDIA_CACHE_NAME = "singalong-media-v1";
+const MEDIA_INDEX_KEY = "singalong_media_index";
+const MEDIA_CACHE_BYTES = (parseFloat(CONFIG.cache_mb) || 200) * 1024 * 1024;
+let mediaCachePromise = null;
+
+function isVersioned(url) {
+    return !!url && /[?&]v=/.test(url);
+}
+
+// The access signature (exp, sig) is reissued every few hours; the bytes
+// of a version are not, so cache entries are keyed without it
+function cacheKey(url) {
+    const key = new URL(url);
+    key.searchParams.delete("exp");
+    key.searchParams.delete("sig");
+    return key.href;
+}
+
+function readMediaIndex() {
+    try { return JSON.parse(readSetting(MEDIA_INDEX_KEY)) || {}; } catch(e) { return {}; }
+}
+function writeMediaIndex(index) {
+    writeSetting(MEDIA_INDEX_KEY, JSON.stringify(index));
+}
+
+function touchMedia(url, size) {
+    const index = readMediaIndex();
+    index[url] = { size: size, used: Date.now() };
+    writeMediaIndex(index);
+}
+
+function openMediaCache() {
+    if (!mediaCachePromise) {
+        mediaCachePromise = (async () => {
+            if (!window.caches) return null;
+            try {
+                const cache = await caches.open(MEDIA_CACHE_NAME);
+                if (navigator.storage && navigator.storage.persist) {
+                    navigator.storage.persist().catch(() => {});
+                }
+                // Entries the index lost track of (cleared storage) cannot be
+                // evicted by size, so drop them
+                const index = readMediaIndex();
+                for (const request of await cache.keys()) {
+                    if (!index[request.url]) await cache.delete(request);
+                }
+                return cache;
+            } catch (e) {
+                console.log("Media cache unavailable:", e);
+                return null;
+            }
+        })();
+    }
+    return mediaCachePromise;
+}
+
+async function evictMedia(cache) {
+    let budget = MEDIA_CACHE_BYTES;
+    try {
+        const estimate = await navigator.storage.estimate();
+        if (estimate.quota) budget = Math.min(budget, estimate.quota / 2);
+    } catch(e) {}
+
+    const index = readMediaIndex();
+    const entries = Object.entries(index).sort((a, b) => a[1].used - b[1].used);
+    let total = entries.reduce((sum, [, entry]) => sum + entry.size, 0);
+    for (const [url, entry] of entries) {
+        if (total <= budget) break;
+        await cache.delete(url);
+        delete index[url];
+        total -= entry.size;
+    }
+    writeMediaIndex(index);
+}
+
+async function storeMedia(cache, url, data, type) {
+    try {
+        // The Response copies data, so the caller may keep using the buffer
+        await cache.put(url, new Response(data, {
+            headers: { "Content-Type": type || "application/octet-stream" }
+        }));
+        touchMedia(url, data.byteLength);
+        await evictMedia(cache);
+    } catch (e) {
+        console.log("Media cache write failed:", e);
+    }
+}
+
+// An ArrayBuffer of a media file, from the persistent cache when it holds
+// this version. Network fetches report their timing for rendition choice.
+async function fetchMedia(url) {
+    const cache = isVersioned(url) ? await openMediaCache() : null;
+    const key = cache ? cacheKey(url) : url;
+    if (cache) {
+        try {
+            const hit = await cache.match(key);
+            if (hit) {
+                const data = await hit.arrayBuffer();
+                touchMedia(key, data.byteLength);
+                return { data: data, cached: true, millis: 0 };
+            }
+        } catch (e) {
+            console.log("Media cache read failed:", e);
+        }
+    }
+    const fetchStart = performance.now();
+    const response = await fetch(url);
+    if (!response.ok) throw new Error(`HTTP ${response.status} for ${url}`);
+    const data = await response.arrayBuffer();
+    const millis = performance.now() - fetchStart;
+    if (cache) storeMedia(cache, key, data, response.headers.get("Content-Type"));
+    return { data: data, cached: false, millis: millis };
+}
+
+// Whole-file playback: a cached copy plays from a blob URL; otherwise the
+// file streams with range requests and, once the element has buffered all
+// of it, is copied into the cache (normally from the HTTP cache).
+async function attachWholeFile(loader, url) {
+    const audioEl = loader.audioEl;
+    const cache = isVersioned(url) ? await openMediaCache() : null;
+    if (loader.cancelled) return;
+    const key = cache ? cacheKey(url) : url;
+    if (cache) {
+        try {
+            const hit = await cache.match(key);
+            if (hit) {
+                const blob = await hit.blob();
+                if (loader.cancelled) return;
+                touchMedia(key, blob.size);
+                if (loader.objectUrl) URL.revokeObjectURL(loader.objectUrl);
+                loader.objectUrl = URL.createObjectURL(blob);
+                audioEl.src = loader.objectUrl;
+                return;
+            }
+        } catch (e) {
+            console.log("Media cache read failed:", e);
+        }
+    }
+    audioEl.src = url;
+    if (!cache) return;
+
+    let copying = false;
+    loader.progress = async () => {
+        const buffered = audioEl.buffered;
+        if (copying || loader.cancelled || !audioEl.duration || buffered.length !== 1 ||
+            buffered.start(0) > 0 || buffered.end(0) < audioEl.duration - 0.5) return;
+        copying = true;
+        audioEl.removeEventListener("progress", loader.progress);
+        try {
+            const response = await fetch(url, { cache: "force-cache" });
+            if (response.ok) {
+                storeMedia(cache, key, await response.arrayBuffer(), response.headers.get("Content-Type"));
+            }
+        } catch (e) {
+            console.log("Could not cache media:", e);
+        }
+    };
+    audioEl.addEventListener("progress", loader.progress);
+}
+
+/* ================== SEGMENTED STREAMING ================== */
+// Segmented renditions are fed through Media Source Extensions: playback
+// starts after the first segment, later segments are fetched just ahead of
+// the playhead and a seek only fetches the segments it lands in. Browsers
+// without MSE support for MP3 stream the whole file with range requests.
+function attachSegmentedSource(audioEl, manifestUrl, fallbackUrl) {
+    const loader = { audioEl: audioEl, cancelled: false, objectUrl: null, pump: null, progress: null };
+    if (!manifestUrl || !window.MediaSource || !MediaSource.isTypeSupported("audio/mpeg")) {
+        attachWholeFile(loader, fallbackUrl);
+        return loader;
+    }
+
+    const mediaSource = new MediaSource();
+    loader.objectUrl = URL.createObjectURL(mediaSource);
+    audioEl.src = loader.objectUrl;
+
+    mediaSource.addEventListener("sourceopen", async () => {
+        try {
+            const manifestLocation = new URL(manifestUrl);
+            const manifest = JSON.parse(new TextDecoder().decode((await fetchMedia(manifestUrl)).data));
+            if (loader.cancelled) return;
+            const segments = manifest.segments;
+            const sourceBuffer = mediaSource.addSourceBuffer(manifest.mime);
+            mediaSource.duration = manifest.duration;
+            const loaded = new Set();
+            let busy = false;
+
+            function nextMissing(time) {
+                let i = segments.findIndex(seg => time < seg.start + seg.duration);
+                if (i < 0) i = segments.length - 1;
+                for (; i < segments.length && segments[i].start < time + SEGMENT_LOOKAHEAD; i++) {
+                    if (!loaded.has(i)) return i;
+                }
+                return -1;
+            }
+
+            async function appendSegment(i) {
+                const segment = segments[i];
+                // Segments share the manifest's version token, so they cache immutably
+                const segmentUrl = new URL(segment.file + manifestLocation.search, manifestLocation).href;
+                const { data, cached, millis } = await fetchMedia(segmentUrl);
+                if (!cached) recordThroughput(data.byteLength, millis);
+                if (loader.cancelled) return;
+                sourceBuffer.timestampOffset = segment.start;
+                sourceBuffer.appendBuffer(data);
+                await new Promise(resolve => sourceBuffer.addEventListener("updateend", resolve, { once: true }));
+                loaded.add(i);
+            }
+
+            async function pump() {
+                if (busy || loader.cancelled) return;
+                busy = true;
+                try {
+                    // Re-read the playhead every time so a seek redirects the fetching
+                    let i = nextMissing(audioEl.currentTime);
+                    while (i >= 0 && !loader.cancelled) {
+                        await appendSegment(i);
+                        i = nextMissing(audioEl.currentTime);
+                    }
+                    if (loaded.size === segments.length && mediaSource.readyState === "open") {
+                        mediaSource.endOfStream();
+                    }
+                } catch (e) {
+                    console.log("Segment load error:", e);
+                } finally {
+                    busy = false;
+                }
+            }
+
+            loader.pump = pump;
+            audioEl.addEventListener("timeupdate", pump);
+            audioEl.addEventListener("seeking", pump);
+            pump();
+        } catch (e) {
+            console.log("Segmented load failed, streaming whole file:", e);
+            if (!loader.cancelled) attachWholeFile(loader, fallbackUrl);
+        }
+    }, { once: true });
+    return loader;
+}
+
+function detachSource(loader) {
+    if (!loader) return;
+    loader.cancelled = true;
+    if (loader.pump) {
+        loader.audioEl.removeEventListener("timeupdate", loader.pump);
+        loader.audioEl.removeEventListener("seeking", loader.pump);
+    }
+    if (loader.progress) loader.audioEl.removeEventListener("progress", loader.progress);
+    if (loader.objectUrl) URL.revokeObjectURL(loader.objectUrl);
+}
+
+function loadRenditionSources() {
+    detachSource(originalLoader);
+    detachSource(accompanimentLoader);
+    const segments = rendition.segments || {};
+    originalLoader = attachSegmentedSource(originalAudio, mediaUrl(segments.original), ORIGINAL_URL);
+    accompanimentLoader = attachSegmentedSource(accompanimentAudio, mediaUrl(segments.accompaniment), ACCOMP_URL);
+}
+
+/* ================== WAVEFORM & SCRUB BAR ================== */
+// Peaks are precomputed at ingest (a few KB), so the waveform and the
+// progress bar appear before the audio itself has loaded
+const PEAKS_URLS = CONFIG.peaks_urls;
+const waveformCanvas = document.getElementById("waveform");
+const waveformCtx = waveformCanvas.getContext("2d");
+const peaksByTrack = {};
+let waveformTrack = "original";
+
+function parsePeaks(buffer) {
+    const view = new DataView(buffer);
+    if (view.getUint32(0) !== 0x5347504B) return null;  // "SGPK"
+    const levelCount = view.getUint8(5);
+    const sampleRate = view.getUint32(8, true);
+    const totalSamples = view.getUint32(12, true);
+    const levels = [];
+    let offset = 16 + levelCount * 8;
+    let loudest = 1;
+    for (let i = 0; i < levelCount; i++) {
+        const buckets = view.getUint32(16 + i * 8, true);
+        const level = new Int8Array(buffer, offset, buckets * 2);
+        levels.push(level);
+        offset += buckets * 2;
+        if (i === levelCount - 1) {
+            for (const value of level) loudest = Math.max(loudest, Math.abs(value));
+        }
+    }
+    return { duration: totalSamples / sampleRate, levels: levels, loudest: loudest };
+}
+
+async function loadPeaks(track) {
+    if (!PEAKS_URLS[track] || peaksByTrack[track] !== undefined) return;
+    peaksByTrack[track] = null;
+    try {
+        peaksByTrack[track] = parsePeaks((await fetchMedia(mediaUrl(PEAKS_URLS[track]))).data);
+    } catch (e) {
+        console.log("Waveform unavailable:", e);
+    }
+    drawWaveform();
+}
+
+function waveformElement() {
+    return waveformTrack === "accompaniment" ? accompanimentAudio : originalAudio;
+}
+
+function drawWaveform() {
+    const peaks = peaksByTrack[waveformTrack];
+    waveformCanvas.style.display = peaks ? "block" : "none";
+    if (!peaks) return;
+    const width = waveformCanvas.clientWidth;
+    const height = waveformCanvas.clientHeight;
+    const ratio = window.devicePixelRatio || 1;
+    if (waveformCanvas.width !== Math.round(width * ratio)) {
+        waveformCanvas.width = Math.round(width * ratio);
+        waveformCanvas.height = Math.round(height * ratio);
+    }
+    waveformCtx.setTransform(ratio, 0, 0, ratio, 0, 0);
+    waveformCtx.clearRect(0, 0, width, height);
+
+    // Coarsest level that still has at least one bucket per pixel
+    let level = peaks.levels[0];
+    for (const candidate of peaks.levels) {
+        if (candidate.length / 2 >= width) level = candidate;
+    }
+    const buckets = level.length / 2;
+    const el = waveformElement();
+    const duration = peaks.duration || el.duration;
+    const playedX = duration ? Math.min(1, el.currentTime / duration) * width : 0;
+    const mid = height / 2;
+    const scale = mid / peaks.loudest;
+    for (let x = 0; x < width; x++) {
+        const start = Math.floor(x * buckets / width);
+        const end = Math.max(start + 1, Math.floor((x + 1) * buckets / width));
+        let low = 0, high = 0;
+        for (let b = start; b < end; b++) {
+            low = Math.min(low, level[2 * b]);
+            high = Math.max(high, level[2 * b + 1]);
+        }
+        waveformCtx.fillStyle = x < playedX ? "#ff4b8b" : "rgba(255,255,255,0.5)";
+        waveformCtx.fillRect(x, mid - high * scale, 1, Math.max(1, (high - low) * scale));
+    }
+}
+
+function waveformLoop() {
+    drawWaveform();
+    if (!waveformElement().paused) requestAnimationFrame(waveformLoop);
+}
+
+originalAudio.addEventListener("play", () => {
+    // While recording the accompaniment drives the bar
+    if (accompanimentAudio.paused) waveformTrack = "original";
+    loadPeaks(waveformTrack);
+    requestAnimationFrame(waveformLoop);
+});
+accompanimentAudio.addEventListener("play", () => {
+    waveformTrack = "accompaniment";
+    loadPeaks("accompaniment");
+    requestAnimationFrame(waveformLoop);
+});
+["pause", "seeked"].forEach(name => {
+    originalAudio.addEventListener(name, drawWaveform);
+    accompanimentAudio.addEventListener(name, drawWaveform);
+});
+window.addEventListener("resize", drawWaveform);
+
+// Scrub the original song (not while a recording is running)
+waveformCanvas.addEventListener("click", (event) => {
+    const peaks = peaksByTrack.original;
+    if (isRecording || !peaks) return;
+    waveformTrack = "original";
+    const rect = waveformCanvas.getBoundingClientRect();
+    const fraction = Math.min(1, Math.max(0, (event.clientX - rect.left) / rect.width));
+    originalAudio.currentTime = fraction * (peaks.duration || originalAudio.duration || 0);
+    drawWaveform();
+});
+
+loadPeaks("original");
+
+/* ================== PLAY/STOP ORIGINAL SONG ================== */
+function stopOriginalSong() {
+    originalAudio.pause();
+    originalAudio.currentTime = 0;
+    isSongPlaying = false;
+}
+
+qualitySelect.onchange = function() {
+    writeSetting("singalong_quality", qualitySelect.value);
+    if (isRecording) return;
+    const next = pickRendition();
+    if (next.name === rendition.name) return;
+    stopOriginalSong();
+    playBtn.innerText = "▶ Play Original";
+    rendition = next;
+    ORIGINAL_URL = mediaUrl(rendition.original);
+    ACCOMP_URL = mediaUrl(rendition.accompaniment);
+    loadRenditionSources();
+    status.innerText = "🎚 Quality: " + qualitySelect.options[qualitySelect.selectedIndex].text;
+};
+
+originalAudio.onended = () => {
+    isSongPlaying = false;
+    playBtn.innerText = "▶ Play Original";
+    status.innerText = "✅ Song finished";
+};
+
+playBtn.onclick = async function() {
+    await ensureAudioContext();
+
+    if (!isSongPlaying) {
+        // Streams via range requests: starts before the file is fully downloaded
+        status.innerText = "⏳ Buffering...";
+        try {
+            originalAudio.volume = ORIGINAL_VOLUME;
+            originalAudio.playbackRate = 1;
+            await originalAudio.play();
+        } catch (e) {
+            console.log("Playback error:", e);
+            status.innerText = "❌ Could not play song";
+            return;
+        }
+
+        isSongPlaying = true;
+        playBtn.innerText = "⏹ Stop Original";
+        status.innerText = "🎵 Playing original song...";
+    } else {
+        stopOriginalSong();
+        playBtn.innerText = "▶ Play Original";
+        status.innerText = "⏹ Stopped";
+    }
+};
+
+/* ================== HIGH QUALITY CANVAS DRAW ================== */
+function drawCanvas() {
+    ctx.fillStyle = "#000";
+    ctx.fillRect(0, 0, canvas.width, canvas.height);
+
+    const canvasW = canvas.width;
+    const canvasH = canvas.height * 0.75;
+
+    const bg = canvasBgReady ? canvasBg : mainBg;
+    const imgRatio = bg.naturalWidth / bg.naturalHeight;
+    const canvasRatio = canvasW / canvasH;
+
+    let drawW, drawH;
+    if (imgRatio > canvasRatio) {
+        drawW = canvasW;
+        drawH = canvasW / imgRatio;
+    } else {
+        drawH = canvasH;
+        drawW = canvasH * imgRatio;
+    }
+
+    const x = (canvasW - drawW) / 2;
+    const y = 0;
+
+    ctx.imageSmoothingEnabled = true;
+    ctx.imageSmoothingQuality = 'high';
+    if (bg.naturalWidth) ctx.drawImage(bg, x, y, drawW, drawH);
+
+    const logoSize = 60;
+    if (logoImg.naturalWidth) ctx.drawImage(logoImg, 20, 20, logoSize, logoSize);
+
+    canvasRafId = requestAnimationFrame(drawCanvas);
+}
+
+/* ================== FIXED: VOICE + ACCOMPANIMENT RECORDING ================== */
+recordBtn.onclick = async function() {
+    if (isRecording) return;
+
+    isRecording = true;
+    playBtn.style.display = "none";
+    recordBtn.style.display = "none";
+    stopBtn.style.display = "inline-block";
+    status.innerText = "🎙 Starting recording...";
+
+    try {
+        const audioCtx = await ensureAudioContext();
+
+        // Clear previous timer
+        if (autoStopTimer) {
+            clearTimeout(autoStopTimer);
+            autoStopTimer = null;
+        }
+
+        // Stop any currently playing song
+        if (isSongPlaying) {
+            stopOriginalSong();
+        }
+
+        // ✅ CRITICAL FIX: Play original song through its own audio element (not recorded)
+        originalAudio.currentTime = 0;
+        originalAudio.volume = ORIGINAL_VOLUME;
+        originalAudio.play().catch(e => console.log("Playback error:", e));
+
+        // Get microphone with optimized settings for CLEAR VOICE
+        micStream = await navigator.mediaDevices.getUserMedia({
+            audio: {
+                echoCancellation: false,  // Better for voice clarity
+                noiseSuppression: true,   // Reduce background noise
+                autoGainControl: false,   // Manual control
+                channelCount: 1,
+                sampleRate: 48000,
+                sampleSize: 24,
+                latency: 0.01
+            },
+            video: false
+        }).catch(err => {
+            status.innerText = "❌ Microphone access required";
+            resetUIOnError();
+            throw err;
+        });
+
+        // Create microphone source
+        micSource = audioCtx.createMediaStreamSource(micStream);
+
+        // Accompaniment streams through its element into the recording mix.
+        // A media element can only be wrapped once, so the node is reused.
+        if (!accElementSource) {
+            accElementSource = audioCtx.createMediaElementSource(accompanimentAudio);
+        }
+        accSource = accElementSource;
+
+        // Get ACTUAL duration
+        const actualDuration = isFinite(accompanimentAudio.duration) && accompanimentAudio.duration > 0
+            ? accompanimentAudio.duration
+            : SONG_DURATION;
+        console.log("✅ Actual accompaniment duration:", actualDuration, "seconds");
+
+        // Create gain nodes with optimal settings for CLEAR RECORDING
+        micGain = audioCtx.createGain();
+        micGain.gain.value = 1.5;  // Voice volume - CLEAR
+
+        accGain = audioCtx.createGain();
+        accGain.gain.value = 0.4 * TRACK_GAINS.accompaniment;  // Accompaniment volume, loudness-normalized
+
+        // Create destination for recording
+        destination = audioCtx.createMediaStreamDestination();
+
+        // ✅ IMPORTANT: Connect ONLY microphone and accompaniment to recording
+        // Original song is played separately and NOT connected to recording
+        micSource.connect(micGain);
+        micGain.connect(destination);
+        accSource.connect(accGain);
+        accGain.connect(destination);
+
+        // Start canvas drawing
+        drawCanvas();
+
+        // Start accompaniment for recording; if its music starts later than
+        // the original's, skip its extra lead-in
+        accompanimentAudio.currentTime = Math.max(0, -ALIGNMENT.offset / (1 + ALIGNMENT.drift));
+        await accompanimentAudio.play();
+
+        // Line the original up with the accompaniment sample for sample
+        // (it started earlier, before the microphone was granted)
+        originalAudio.playbackRate = 1 + ALIGNMENT.drift;
+        originalAudio.currentTime = Math.max(0, originalTimeFor(accompanimentAudio.currentTime));
+
+        // Create stream from canvas
+        const canvasStream = canvas.captureStream(30);
+        const mixedAudioStream = destination.stream;
+
+        // Combine video and audio streams
+        const combinedStream = new MediaStream([
+            ...canvasStream.getVideoTracks(),
+            ...mixedAudioStream.getAudioTracks()
+        ]);
+
+        // ✅ FIXED: USE MP4 FORMAT FOR BETTER COMPATIBILITY
+        let mimeType = 'video/mp4;codecs=avc1.42E01E,mp4a.40.2';
+        if (!MediaRecorder.isTypeSupported(mimeType)) {
+            mimeType = 'video/webm;codecs=vp9,opus';
+        }
+        if (!MediaRecorder.isTypeSupported(mimeType)) {
+            mimeType = 'video/webm;codecs=vp8,opus';
+        }
+        if (!MediaRecorder.isTypeSupported(mimeType)) {
+            mimeType = 'video/webm';
+        }
+
+        // Create MediaRecorder with optimal settings
+        mediaRecorder = new MediaRecorder(combinedStream, {
+            mimeType: mimeType,
+            audioBitsPerSecond: 256000,    // High quality audio
+            videoBitsPerSecond: 5000000,   // High quality video
+            videoKeyFrameInterval: 30
+        });
+
+        recordedChunks = [];
+        recordingStartTime = Date.now();
+
+        mediaRecorder.ondataavailable = e => {
+            if (e.data.size > 0) {
+                recordedChunks.push(e.data);
+            }
+        };
+
+        mediaRecorder.onstop = () => {
+            cancelAnimationFrame(canvasRafId);
+            recordingDuration = (Date.now() - recordingStartTime) / 1000;
+
+            // Stop playback audio
+            stopOriginalSong();
+
+            // Cleanup audio sources
+            cleanupAudioSources();
+
+            // Create blob
+            if (recordedChunks.length > 0) {
+                const blob = new Blob(recordedChunks, { type: mimeType });
+                const url = URL.createObjectURL(blob);
+
+                if (lastRecordingURL) URL.revokeObjectURL(lastRecordingURL);
+                lastRecordingURL = url;
+
+                finalBg.src = mainBg.src;
+                finalDiv.style.display = "flex";
+
+                // Show actual recording duration
+                const minutes = Math.floor(recordingDuration / 60);
+                const seconds = Math.floor(recordingDuration % 60);
+                finalStatus.innerText = `✅ Recording Complete! (${minutes}:${seconds.toString().padStart(2, '0')})`;
+
+                // ✅ FIXED: Set download link with proper metadata
+                const songName = String(CONFIG.song_name).replace(/[^a-zA-Z0-9]/g, '_');
+
+                // Determine file extension
+                let extension = '';
+                if (mimeType.includes('mp4')) {
+                    extension = '_KARAOKE.mp4';
+                } else {
+                    extension = '_KARAOKE.webm';
+                }
+
+                const fileName = songName + extension;
+                downloadRecordingBtn.href = url;
+                downloadRecordingBtn.download = fileName;
+
+                // ✅ FIXED: Play recording in same interface
+                playRecordingBtn.onclick = () => {
+                    if (!isPlayingRecording) {
+                        // Show video player
+                        recordingVideoPlayer.src = url;
+                        recordingVideoPlayer.style.display = 'block';
+                        videoControls.style.display = 'flex';
+
+                        // Hide final output
+                        finalDiv.style.display = 'none';
+
+                        // Play the video
+                        recordingVideoPlayer.play();
+
+                        playRecordingBtn.innerText = "⏹ Stop";
+                        isPlayingRecording = true;
+
+                        // Update button text when video ends
+                        recordingVideoPlayer.onended = () => {
+                            closeVideoPlayer();
+                            playRecordingBtn.innerText = "▶ Play";
+                            isPlayingRecording = false;
+                        };
+                    } else {
+                        closeVideoPlayer();
+                        playRecordingBtn.innerText = "▶ Play";
+                        isPlayingRecording = false;
+                    }
+                };
+            }
+        };
+
+        // Start recording
+        mediaRecorder.start(1000);
+
+        status.innerText = "🎙 Recording... Original song playing (not recorded) + Your voice + Accompaniment";
+
+        // AUTO-STOP TIMER based on accompaniment duration
+        autoStopTimer = setTimeout(() => {
+            if (isRecording) {
+                stopRecording();
+                status.innerText = "✅ Auto-stopped: Recording complete!";
+            }
+        }, (actualDuration * 1000) + 1000);
+
+    } catch (error) {
+        console.error("Recording error:", error);
+        status.innerText = "❌ Failed: " + (error.message || "Check microphone access");
+        resetUIOnError();
+    }
+};
+
+/* ================== CLEANUP AUDIO SOURCES ================== */
+function cleanupAudioSources() {
+    if (accSource) {
+        try { 
+            accSource.disconnect();
+        } catch(e) {}
+        accSource = null;
+    }
+    accompanimentAudio.pause();
+    accompanimentAudio.currentTime = 0;
+
+    if (micSource) {
+        try { 
+            micSource.disconnect(); 
+        } catch(e) {}
+        micSource = null;
+    }
+
+    if (micGain) {
+        try {
+            micGain.disconnect();
+        } catch(e) {}
+        micGain = null;
+    }
+
+    if (accGain) {
+        try {
+            accGain.disconnect();
+        } catch(e) {}
+        accGain = null;
+    }
+
+    if (destination) {
+        try {
+            destination.disconnect();
+        } catch(e) {}
+        destination = null;
+    }
+
+    if (micStream) {
+        micStream.getTracks().forEach(track => track.stop());
+        micStream = null;
+    }
+}
+
+/* ================== STOP RECORDING ================== */
+function stopRecording() {
+    if (!isRecording) return;
+
+    // Clear timer
+    if (autoStopTimer) {
+        clearTimeout(autoStopTimer);
+        autoStopTimer = null;
+    }
+
+    // Stop media recorder
+    if (mediaRecorder && mediaRecorder.state !== 'inactive') {
+        mediaRecorder.stop();
+    }
+
+    // Cleanup audio sources
+    cleanupAudioSources();
+
+    // Stop original song if playing
+    if (isSongPlaying) {
+        stopOriginalSong();
+    }
+
+    // Stop canvas
+    if (canvasRafId) {
+        cancelAnimationFrame(canvasRafId);
+        canvasRafId = null;
+    }
+
+    // Update UI
+    isRecording = false;
+    stopBtn.style.display = "none";
+    status.innerText = "Processing recording...";
+}
+
+/* ================== STOP BUTTON CLICK ================== */
+stopBtn.onclick = function() {
+    stopRecording();
+};
+
+/* ================== NEW RECORDING ================== */
+newRecordingBtn.onclick = function() {
+    closeVideoPlayer();
+    finalDiv.style.display = "none";
+
+    // Reset audio
+    if (isSongPlaying) {
+        stopOriginalSong();
+    }
+
+    // Reset UI
+    playBtn.style.display = "inline-block";
+    playBtn.innerText = "▶ Play Original";
+    recordBtn.style.display = "inline-block";
+    stopBtn.style.display = "none";
+    status.innerText = "Ready 🎤";
+
+    // Reset state
+    recordedChunks = [];
+    isRecording = false;
+    isPlayingRecording = false;
+    recordingStartTime = 0;
+    recordingDuration = 0;
+
+    // Release URL
+    if (lastRecordingURL) {
+        URL.revokeObjectURL(lastRecordingURL);
+        lastRecordingURL = null;
+    }
+};
+
+/* ================== VIDEO PLAYER FUNCTIONS ================== */
+function closeVideoPlayer() {
+    if (recordingVideoPlayer) {
+        recordingVideoPlayer.pause();
+        recordingVideoPlayer.currentTime = 0;
+        recordingVideoPlayer.style.display = 'none';
+        videoControls.style.display = 'none';
+        recordingVideoPlayer.src = '';
+    }
+    finalDiv.style.display = 'flex';
+    playRecordingBtn.innerText = "▶ Play";
+    isPlayingRecording = false;
+
+    // Exit fullscreen if active
+    if (document.fullscreenElement) {
+        document.exitFullscreen();
+    }
+}
+
+function toggleFullscreen() {
+    if (!document.fullscreenElement) {
+        recordingVideoPlayer.requestFullscreen().catch(err => {
+            console.log("Fullscreen error:", err);
+        });
+    } else {
+        document.exitFullscreen();
+    }
+}
+
+/* ================== HELPER FUNCTIONS ================== */
+function resetUIOnError() {
+    isRecording = false;
+    playBtn.style.display = "inline-block";
+    playBtn.innerText = "▶ Play Original";
+    recordBtn.style.display = "inline-block";
+    stopBtn.style.display = "none";
+
+    // Stop original song
+    stopOriginalSong();
+
+    if (autoStopTimer) {
+        clearTimeout(autoStopTimer);
+        autoStopTimer = null;
+    }
+
+    // Cleanup
+    cleanupAudioSources();
+}
+
+/* ================== TOUCH EVENTS FOR MOBILE ================== */
+document.addEventListener('touchstart', async () => {
+    await ensureAudioContext();
+}, { once: true });
+
+/* ================== INITIALIZE ================== */
+// player.js may run after the load event, it is injected by the shell
+function whenLoaded(callback) {
+    if (document.readyState === "complete") {
+        callback();
+    } else {
+        window.addEventListener('load', callback);
+    }
+}
+whenLoaded(async () => {
+    status.innerText = "Ready 🎤 - Tap screen first";
+
+    // Pre-warm audio context; segments are already streaming in
+    try {
+        await ensureAudioContext();
+        status.innerText = "Ready 🎤 - Click 'Play Original' to listen";
+    } catch(e) {
+        console.log("Initialization error:", e);
+        status.innerText = "Ready 🎤";
+    }
+});
+
+/* ================== CLEANUP ================== */
+window.addEventListener('beforeunload', () => {
+    if (lastRecordingURL) {
+        URL.revokeObjectURL(lastRecordingURL);
+    }
+    if (audioContext) {
+        audioContext.close();
+    }
+    cleanupAudioSources();
+});
+
+/* ================== VIDEO PLAYER EVENT LISTENERS ================== */
+recordingVideoPlayer.addEventListener('click', function() {
+    if (this.paused) {
+        this.play();
+    } else {
+        this.pause();
+    }
+});
+
+document.addEventListener('fullscreenchange', function() {
+    if (!document.fullscreenElement) {
+        videoControls.style.display = 'flex';
+    }
+});
@@ -0,0 +1,23 @@
+import os
+import subprocess
+
+# =============== PCM DECODING ===============
+# Analysis steps (track alignment, waveform peaks) work on mono float32 PCM
+# that ffmpeg decodes straight to a pipe. numpy is imported on first use so
+# importing this module stays free for the web process.
+
+
+def decode_pcm(path, rate, timeout=300):
+    """Decode the first audio stream to mono float32 at rate, or None"""
+    import numpy as np
+    cmd = ['ffmpeg', '-v', 'error', '-i', path, '-map', '0:a:0',
+           '-ac', '1', '-ar', str(rate), '-f', 'f32le', '-']
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=timeout)
+    except Exception as e:
+        print(f"⚠️ Could not decode {os.path.basename(path)}: {e}")
+        return None
+    if result.returncode != 0 or not result.stdout:
+        print(f"⚠️ Could not decode {os.path.basename(path)}")
+        return None
+    return np.frombuffer(result.stdout, dtype=np.float32)
@@ -0,0 +1,306 @@
+import os
+import json
+import time
+import db
+from settings import metadata_path, shared_links_dir
+
+# =============== SONG CATALOG STORE ===============
+# Song metadata and shared links live only in sqlite. Every write is a
+# single-row upsert in its own transaction, so changing one song costs the
+# same however big the catalog is and concurrent sessions cannot clobber
+# each other. The old song_metadata.json and shared_links/*.json files are
+# imported once by migrate_json_catalog() and never written again.
+
+METADATA_FIELDS = ("uploaded_by", "timestamp", "duration", "processed")
+
+# =============== CHANGE JOURNAL ===============
+# catalog_changes is an append-only log of catalog events (upload, metadata,
+# processed, delete, share, unshare) with a monotonic seq. Each process
+# remembers the last seq it applied, polls MAX(seq) (one index lookup) and
+# refreshes only the songs named by newer entries, so replicas stay in step
+# without TTL polling. Every JOURNAL_PRUNE_EVERY entries the writer also
+# drops entries older than the newest JOURNAL_RETENTION; a reader that fell
+# behind the retained window simply reloads everything.
+JOURNAL_RETENTION = 10000
+JOURNAL_PRUNE_EVERY = 500
+
+# (trigger name, event, table, kind expression, row alias)
+JOURNAL_TRIGGERS = [
+    ("metadata_insert_journal", "INSERT", "metadata", "'upload'", "NEW"),
+    ("metadata_update_journal", "UPDATE", "metadata",
+     "CASE WHEN NEW.processed AND NOT COALESCE(OLD.processed, 0) THEN 'processed' ELSE 'metadata' END", "NEW"),
+    ("metadata_delete_journal", "DELETE", "metadata", "'delete'", "OLD"),
+    ("shared_links_insert_journal", "INSERT", "shared_links", "'share'", "NEW"),
+    ("shared_links_update_journal", "UPDATE", "shared_links", "'share'", "NEW"),
+    ("shared_links_delete_journal", "DELETE", "shared_links", "'unshare'", "OLD"),
+]
+
+def init_catalog_db():
+    try:
+        with db.transaction() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS metadata
+                            (song_name TEXT PRIMARY KEY,
+                             uploaded_by TEXT,
+                             timestamp REAL,
+                             duration REAL,
+                             processed BOOLEAN DEFAULT 0)''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS shared_links
+                            (song_name TEXT PRIMARY KEY,
+                             shared_by TEXT,
+                             active BOOLEAN,
+                             created_at TIMESTAMP)''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS track_loudness
+                            (song_name TEXT,
+                             track TEXT,
+                             content_key TEXT,
+                             integrated REAL,
+                             lra REAL,
+                             true_peak REAL,
+                             measured_at REAL,
+                             PRIMARY KEY (song_name, track))''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS track_alignment
+                            (song_name TEXT PRIMARY KEY,
+                             content_key TEXT,
+                             offset REAL,
+                             drift REAL,
+                             confidence REAL,
+                             measured_at REAL)''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS catalog_state
+                            (key TEXT PRIMARY KEY,
+                             value TEXT)''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS catalog_changes
+                            (seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                             kind TEXT,
+                             song_name TEXT,
+                             created_at REAL)''')
+            # Every catalog write, from any process, appends to the journal
+            # inside the same transaction
+            for name, event, table, kind, row in JOURNAL_TRIGGERS:
+                conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {name}
+                                 AFTER {event} ON {table}
+                                 BEGIN
+                                     INSERT INTO catalog_changes (kind, song_name, created_at)
+                                     VALUES ({kind}, {row}.song_name,
+                                             (julianday('now') - 2440587.5) * 86400.0);
+                                 END''')
+            # Pruning rides on the writes themselves, in whichever process makes them
+            conn.execute(f'''CREATE TRIGGER IF NOT EXISTS catalog_changes_prune
+                             AFTER INSERT ON catalog_changes
+                             WHEN NEW.seq % {JOURNAL_PRUNE_EVERY} = 0
+                             BEGIN
+                                 DELETE FROM catalog_changes WHERE seq <= NEW.seq - {JOURNAL_RETENTION};
+                             END''')
+        migrate_json_catalog()
+    except Exception as e:
+        print(f"Catalog database init error: {e}")
+
+def _as_timestamp(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return time.time()
+
+def latest_change_seq():
+    """Sequence number of the newest journal entry (0 for an empty journal)"""
+    try:
+        row = db.query_one('SELECT MAX(seq) FROM catalog_changes')
+        return row[0] or 0
+    except Exception as e:
+        print(f"Catalog journal error: {e}")
+        return None
+
+def oldest_change_seq():
+    row = db.query_one('SELECT MIN(seq) FROM catalog_changes')
+    return row[0] or 0
+
+def changes_since(seq):
+    """Journal entries after seq as (seq, kind, song_name), oldest first"""
+    return db.query('SELECT seq, kind, song_name FROM catalog_changes WHERE seq > ? ORDER BY seq', (seq,))
+
+def migrate_json_catalog():
+    """Import song_metadata.json and shared_links/*.json once. Rows already in
+    sqlite win, as they did when both stores were read and merged"""
+    # Take the write lock first so two processes never migrate together
+    with db.transaction(immediate=True) as conn:
+        done = conn.execute("SELECT value FROM catalog_state WHERE key = 'json_migrated'").fetchone()
+        if done:
+            return 0
+
+        migrated = 0
+        if os.path.exists(metadata_path):
+            try:
+                with open(metadata_path, "r") as f:
+                    file_metadata = json.load(f)
+            except (OSError, ValueError):
+                file_metadata = {}
+            for song_name, info in file_metadata.items():
+                conn.execute('''INSERT OR IGNORE INTO metadata
+                                (song_name, uploaded_by, timestamp, duration, processed)
+                                VALUES (?, ?, ?, ?, ?)''',
+                             (song_name, info.get("uploaded_by", "unknown"),
+                              _as_timestamp(info.get("timestamp")),
+                              info.get("duration"), bool(info.get("processed", False))))
+                migrated += 1
+
+        if os.path.isdir(shared_links_dir):
+            for filename in os.listdir(shared_links_dir):
+                if not filename.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(shared_links_dir, filename), 'r') as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                conn.execute('''INSERT OR IGNORE INTO shared_links
+                                (song_name, shared_by, active, created_at)
+                                VALUES (?, ?, ?, ?)''',
+                             (filename[:-5], data.get("shared_by", "unknown"),
+                              bool(data.get("active", True)), time.time()))
+                migrated += 1
+
+        conn.execute("INSERT INTO catalog_state (key, value) VALUES ('json_migrated', ?)",
+                     (str(time.time()),))
+    if migrated:
+        print(f"✅ Migrated {migrated} catalog entries from JSON into sqlite")
+    return migrated
+
+# =============== SONG METADATA ===============
+def load_metadata():
+    metadata = {}
+    try:
+        results = db.query('SELECT song_name, uploaded_by, timestamp, duration, processed FROM metadata')
+        for song_name, uploaded_by, timestamp, duration, processed in results:
+            metadata[song_name] = {
+                "uploaded_by": uploaded_by,
+                "timestamp": str(timestamp),
+                "duration": duration,
+                "processed": bool(processed)
+            }
+    except Exception as e:
+        print(f"Load metadata error: {e}")
+    return metadata
+
+def load_song_metadata(song_name):
+    """One song's metadata, or None if it has none"""
+    row = db.query_one('SELECT uploaded_by, timestamp, duration, processed FROM metadata WHERE song_name = ?',
+                       (song_name,))
+    if not row:
+        return None
+    uploaded_by, timestamp, duration, processed = row
+    return {
+        "uploaded_by": uploaded_by,
+        "timestamp": str(timestamp),
+        "duration": duration,
+        "processed": bool(processed)
+    }
+
+def save_song_metadata(song_name, **fields):
+    """Upsert one song's metadata, changing only the fields that are passed"""
+    unknown = set(fields) - set(METADATA_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown metadata fields: {sorted(unknown)}")
+    row = {"uploaded_by": "unknown", "timestamp": time.time(), "duration": None, "processed": False}
+    row.update(fields)
+    assignments = ", ".join(f"{field} = excluded.{field}" for field in fields) or "song_name = song_name"
+    try:
+        db.execute(f'''INSERT INTO metadata (song_name, uploaded_by, timestamp, duration, processed)
+                       VALUES (?, ?, ?, ?, ?)
+                       ON CONFLICT(song_name) DO UPDATE SET {assignments}''',
+                   (song_name, row["uploaded_by"], _as_timestamp(row["timestamp"]),
+                    row["duration"], bool(row["processed"])))
+    except Exception as e:
+        print(f"Save metadata error: {e}")
+
+def delete_metadata(song_name):
+    try:
+        with db.transaction() as conn:
+            conn.execute('DELETE FROM metadata WHERE song_name = ?', (song_name,))
+            conn.execute('DELETE FROM track_loudness WHERE song_name = ?', (song_name,))
+            conn.execute('DELETE FROM track_alignment WHERE song_name = ?', (song_name,))
+    except Exception as e:
+        print(f"Delete metadata error: {e}")
+
+# =============== TRACK LOUDNESS ===============
+# EBU R128 measurements per source track, keyed by the content they were
+# taken from so unchanged tracks are never measured twice
+LOUDNESS_FIELDS = ("integrated", "lra", "true_peak")
+
+def load_loudness(song_name):
+    """{track: {"content_key", "integrated", "lra", "true_peak"}} for one song"""
+    loudness = {}
+    try:
+        results = db.query('''SELECT track, content_key, integrated, lra, true_peak
+                              FROM track_loudness WHERE song_name = ?''', (song_name,))
+        for track, content_key, integrated, lra, true_peak in results:
+            loudness[track] = {"content_key": content_key, "integrated": integrated,
+                               "lra": lra, "true_peak": true_peak}
+    except Exception as e:
+        print(f"Load loudness error: {e}")
+    return loudness
+
+def save_loudness(song_name, track, content_key, measurement):
+    try:
+        db.execute('''INSERT OR REPLACE INTO track_loudness
+                      (song_name, track, content_key, integrated, lra, true_peak, measured_at)
+                      VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                   (song_name, track, content_key,
+                    *(measurement[field] for field in LOUDNESS_FIELDS), time.time()))
+    except Exception as e:
+        print(f"Save loudness error: {e}")
+
+# =============== SHARED LINKS ===============
+def load_shared_links():
+    links = {}
+    try:
+        results = db.query('SELECT song_name, shared_by FROM shared_links WHERE active = 1')
+        for song_name, shared_by in results:
+            links[song_name] = {"shared_by": shared_by, "active": True}
+    except Exception as e:
+        print(f"Load shared links error: {e}")
+    return links
+
+def load_shared_link(song_name):
+    row = db.query_one('SELECT shared_by FROM shared_links WHERE song_name = ? AND active = 1', (song_name,))
+    return {"shared_by": row[0], "active": True} if row else None
+
+def save_shared_link(song_name, shared_by):
+    try:
+        db.execute('''INSERT OR REPLACE INTO shared_links
+                      (song_name, shared_by, active, created_at)
+                      VALUES (?, ?, ?, ?)''',
+                   (song_name, shared_by, True, time.time()))
+    except Exception as e:
+        print(f"Save shared link error: {e}")
+
+def delete_shared_link(song_name):
+    try:
+        db.execute('DELETE FROM shared_links WHERE song_name = ?', (song_name,))
+    except Exception as e:
+        print(f"Delete shared link error: {e}")
+
+# =============== TRACK ALIGNMENT ===============
+# Offset and drift of the accompaniment inside the original, keyed by the
+# content of both tracks: original_time = acc_time * (1 + drift) + offset.
+# A row with NULL offset records a pair that could not be aligned.
+def load_alignment(song_name):
+    try:
+        row = db.query_one('''SELECT content_key, offset, drift, confidence
+                              FROM track_alignment WHERE song_name = ?''', (song_name,))
+    except Exception as e:
+        print(f"Load alignment error: {e}")
+        return None
+    if not row:
+        return None
+    content_key, offset, drift, confidence = row
+    return {"content_key": content_key, "offset": offset, "drift": drift, "confidence": confidence}
+
+def save_alignment(song_name, content_key, result):
+    result = result or {}
+    try:
+        db.execute('''INSERT OR REPLACE INTO track_alignment
+                      (song_name, content_key, offset, drift, confidence, measured_at)
+                      VALUES (?, ?, ?, ?, ?, ?)''',
+                   (song_name, content_key, result.get("offset"), result.get("drift"),
+                    result.get("confidence"), time.time()))
+    except Exception as e:
+        print(f"Save alignment error: {e}")
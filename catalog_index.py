@@ -0,0 +1,218 @@
+import os
+import threading
+import catalog
+import song_search
+
+# =============== CATALOG INDEX ===============
+# Process-wide, always-current view of the catalog that replaces the 5-second
+# TTL caches:
+# - song names come from an in-memory set built with one listdir and then
+#   kept current by filesystem events (watchdog, in requirements.txt); a
+#   stat() of the directory also catches events the watcher missed, and
+#   takes over if the watcher cannot start
+# - metadata and shared links follow the catalog change journal: a rerun
+#   reads MAX(seq) and reloads only the songs named by newer entries, so
+#   writes from workers and other replicas show up without TTL polling
+# - the song search index is synced whenever the song set changes
+# Lookups between changes are O(1) and a change is visible on the next rerun.
+
+SONG_SUFFIX = "_original.mp3"
+
+_lock = threading.Lock()
+_songs_dir = None
+_songs = None
+_sorted_songs = ()
+_dir_stamp = None
+_observer = None
+_seq = None
+_metadata = {}
+_shared_links = {}
+
+
+def _song_name(filename):
+    if filename.endswith(SONG_SUFFIX):
+        return filename[:-len(SONG_SUFFIX)]
+    return None
+
+
+def _dir_mtime():
+    try:
+        return os.stat(_songs_dir).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _rebuild():
+    global _songs, _sorted_songs, _dir_stamp
+    _dir_stamp = _dir_mtime()
+    songs = set()
+    if os.path.isdir(_songs_dir):
+        for filename in os.listdir(_songs_dir):
+            name = _song_name(filename)
+            if name:
+                songs.add(name)
+    _songs = songs
+    _sorted_songs = tuple(sorted(songs))
+    song_search.sync(songs)
+
+
+def _apply(added=None, removed=None):
+    """Update the index for one file event"""
+    global _sorted_songs, _dir_stamp
+    with _lock:
+        if _songs is None:
+            return
+        changed = False
+        if removed and removed in _songs:
+            _songs.discard(removed)
+            changed = True
+        if added and added not in _songs and os.path.exists(os.path.join(_songs_dir, added + SONG_SUFFIX)):
+            _songs.add(added)
+            changed = True
+        if changed:
+            _sorted_songs = tuple(sorted(_songs))
+            song_search.sync(_songs)
+        _dir_stamp = _dir_mtime()
+
+
+def _start_observer():
+    """Watch the songs directory with watchdog"""
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        print("⚠️ watchdog is not installed (pip install -r requirements.txt); "
+              "catalog changes are found by directory stat only")
+        return None
+
+    class SongsHandler(FileSystemEventHandler):
+        def on_created(self, event):
+            if not event.is_directory:
+                _apply(added=_song_name(os.path.basename(event.src_path)))
+
+        def on_deleted(self, event):
+            if not event.is_directory:
+                _apply(removed=_song_name(os.path.basename(event.src_path)))
+
+        def on_moved(self, event):
+            if not event.is_directory:
+                # Uploads land via os.replace from a temp name
+                _apply(added=_song_name(os.path.basename(event.dest_path)),
+                       removed=_song_name(os.path.basename(event.src_path)))
+
+    try:
+        observer = Observer()
+        observer.schedule(SongsHandler(), _songs_dir, recursive=False)
+        observer.daemon = True
+        observer.start()
+        print(f"✅ Watching {_songs_dir} for catalog changes")
+        return observer
+    except Exception as e:
+        print(f"⚠️ Catalog watcher not started: {e}")
+        return None
+
+
+def start(songs_dir):
+    """Build the index once per process and start watching for changes"""
+    global _songs_dir, _observer
+    with _lock:
+        if _songs_dir == os.path.abspath(songs_dir) and _songs is not None:
+            return
+        _songs_dir = os.path.abspath(songs_dir)
+        _rebuild()
+    _observer = _start_observer()
+
+
+def song_names():
+    """Sorted song names, rebuilt only after a change to the songs directory"""
+    _apply_journal()
+    with _lock:
+        # Events are authoritative when watching; the stat() covers events
+        # the watcher coalesced or dropped, and a watcher that failed to start
+        if _songs is None or _dir_mtime() != _dir_stamp:
+            _rebuild()
+        return list(_sorted_songs)
+
+
+def _reload_all(seq):
+    global _seq, _metadata, _shared_links
+    metadata = catalog.load_metadata()
+    shared_links = catalog.load_shared_links()
+    with _lock:
+        _metadata = metadata
+        _shared_links = shared_links
+        _seq = seq
+
+
+def _apply_journal():
+    """Bring metadata and shared links up to the newest journal entry"""
+    global _seq, _metadata, _shared_links
+    latest = catalog.latest_change_seq()
+    if latest is None:
+        # Journal unavailable: fall back to reading everything
+        _reload_all(None)
+        return
+    with _lock:
+        seq = _seq
+    if seq == latest:
+        return
+    try:
+        if seq is None or seq > latest or catalog.oldest_change_seq() > seq + 1:
+            # First use, a reset database, or entries we needed were pruned
+            _reload_all(latest)
+            return
+        
+        metadata_songs = set()
+        link_songs = set()
+        file_songs = set()
+        for _, kind, song_name in catalog.changes_since(seq):
+            if kind in ("share", "unshare"):
+                link_songs.add(song_name)
+            else:
+                metadata_songs.add(song_name)
+            if kind in ("upload", "delete"):
+                file_songs.add(song_name)
+        
+        # Copy-on-write so readers holding the old dict are never disturbed
+        metadata = dict(_metadata)
+        for song_name in metadata_songs:
+            row = catalog.load_song_metadata(song_name)
+            if row:
+                metadata[song_name] = row
+            else:
+                metadata.pop(song_name, None)
+        shared_links = dict(_shared_links)
+        for song_name in link_songs:
+            row = catalog.load_shared_link(song_name)
+            if row:
+                shared_links[song_name] = row
+            else:
+                shared_links.pop(song_name, None)
+        
+        with _lock:
+            _metadata = metadata
+            _shared_links = shared_links
+            _seq = latest
+        for song_name in file_songs:
+            _apply(added=song_name, removed=song_name)
+    except Exception as e:
+        print(f"Catalog journal apply error: {e}")
+        _reload_all(latest)
+
+
+def metadata():
+    _apply_journal()
+    return _metadata
+
+
+def shared_links():
+    _apply_journal()
+    return _shared_links
+
+
+def invalidate():
+    """Rescan songs now; called after local uploads and deletes. Database
+    entries need no invalidation, they follow the journal"""
+    global _songs
+    with _lock:
+        _songs = None
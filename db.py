@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from settings import session_db_path
+
+# =============== SHARED SQLITE ACCESS ===============
+# A small pool of long-lived connections shared by every thread of the
+# process, instead of connect/commit/close per statement. Streamlit runs
+# scripts on short-lived threads (often a new one per rerun), so connections
+# are borrowed for one statement or one transaction() block and handed back,
+# never tied to a thread. The database runs in WAL mode so readers never
+# block the single writer, with synchronous=NORMAL so a commit is one WAL
+# append rather than two fsyncs. Writes go through transaction(); several
+# statements inside one block commit together. sqlite3 keeps a
+# per-connection prepared statement cache, so repeated helpers reuse their
+# compiled SQL.
+
+BUSY_TIMEOUT_MS = 30000
+CACHE_SIZE_KB = 16 * 1024
+STATEMENT_CACHE_SIZE = 256
+# Idle connections kept open; busier moments open (and then close) extras
+POOL_SIZE = 8
+
+_pool = []
+_pool_pid = None
+_pool_lock = threading.Lock()
+# The connection of the transaction() block this thread is inside, if any
+_current = threading.local()
+
+
+def _open(path):
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,  # autocommit reads; writes use explicit BEGIN
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,  # borrowed by one thread at a time
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def _checkout():
+    global _pool_pid
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            # Connections inherited across a fork must not be used
+            _pool.clear()
+            _pool_pid = os.getpid()
+        if _pool:
+            return _pool.pop()
+    return _open(session_db_path)
+
+
+def _checkin(conn):
+    if conn.in_transaction:
+        conn.rollback()
+    with _pool_lock:
+        if _pool_pid == os.getpid() and len(_pool) < POOL_SIZE:
+            _pool.append(conn)
+            return
+    conn.close()
+
+
+@contextmanager
+def connection():
+    """Borrow a pooled connection for the block (the enclosing transaction's
+    connection when there is one)"""
+    conn = getattr(_current, "conn", None)
+    if conn is not None:
+        yield conn
+        return
+    conn = _checkout()
+    try:
+        yield conn
+    finally:
+        _checkin(conn)
+
+
+@contextmanager
+def transaction(immediate=False):
+    """Run a block of statements atomically. BEGIN IMMEDIATE takes the write
+    lock up front (read-then-write blocks); nested blocks join the outer one"""
+    conn = getattr(_current, "conn", None)
+    if conn is not None:
+        yield conn
+        return
+    with connection() as conn:
+        _current.conn = conn
+        try:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+        finally:
+            _current.conn = None
+
+
+def execute(sql, params=()):
+    """Run one write statement in its own transaction. Returns the cursor"""
+    with transaction() as conn:
+        return conn.execute(sql, params)
+
+
+def executemany(sql, rows):
+    """Run a statement for many rows in a single transaction"""
+    with transaction() as conn:
+        return conn.executemany(sql, rows)
+
+
+def query(sql, params=()):
+    with connection() as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def query_one(sql, params=()):
+    with connection() as conn:
+        return conn.execute(sql, params).fetchone()
@@ -0,0 +1,114 @@
+import os
+import media_store
+
+# =============== LYRICS IMAGE DERIVATIVES ===============
+# Lyrics backgrounds arrive as full-resolution camera/WhatsApp JPEGs. Ingest
+# decodes each one once (JPEG draft mode decodes at reduced scale), applies
+# the EXIF orientation, drops all metadata and writes small derivatives in
+# modern formats next to the original:
+#   <song>_lyrics_thumb.*   fits 96x128, song list thumbnail and the
+#                           player's blurred loading placeholder
+#   <song>_lyrics_player.*  fits the 360x480 image area of the player
+#   <song>_lyrics_canvas.*  fits the 720x960 area of the recording canvas,
+#                           so drawCanvas copies it 1:1 instead of scaling
+# AVIF is written when Pillow has an encoder for it, WebP always. The
+# player tries them in FORMATS order and falls back to the original file.
+
+LYRICS_SOURCE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+# name: (width, height); every variant fits inside the box, never cropped
+LYRICS_VARIANTS = {
+    "thumb": (96, 128),
+    "player": (360, 480),
+    "canvas": (720, 960),
+}
+# (Pillow format, extension, save options), preferred first
+FORMATS = [
+    ("AVIF", ".avif", {"quality": 55, "speed": 6}),
+    ("WEBP", ".webp", {"quality": 80, "method": 6}),
+]
+
+
+def available_formats():
+    """FORMATS this Pillow build can encode"""
+    try:
+        from PIL import features
+    except ImportError:
+        return []
+    available = []
+    for name, ext, options in FORMATS:
+        try:
+            if features.check(name.lower()):
+                available.append((name, ext, options))
+        except (ValueError, KeyError):
+            continue
+    return available
+
+
+def derivative_path(lyrics_dir, song_name, variant, ext):
+    return os.path.join(lyrics_dir, f"{song_name}_lyrics_{variant}{ext}")
+
+
+def derivative_paths(lyrics_dir, song_name):
+    """Every derivative file a song may have, existing or not"""
+    return [derivative_path(lyrics_dir, song_name, variant, ext)
+            for variant in LYRICS_VARIANTS for _, ext, _ in FORMATS]
+
+
+def find_lyrics_source(lyrics_dir, song_name):
+    for ext in LYRICS_SOURCE_EXTENSIONS:
+        path = os.path.join(lyrics_dir, f"{song_name}_lyrics_bg{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_oriented(source_path):
+    """Decode once at the smallest scale that still covers every variant,
+    upright and in RGB"""
+    from PIL import Image, ImageOps
+    image = Image.open(source_path)
+    largest = max(LYRICS_VARIANTS.values())
+    # JPEG only: decode at 1/2, 1/4 or 1/8 scale when that is still big enough
+    # (draft sizes are pre-rotation, so allow for a sideways photo)
+    image.draft("RGB", (max(largest), max(largest)))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image
+
+
+def render_variant(image, width, height):
+    from PIL import Image
+    resized = image.copy()
+    resized.thumbnail((width, height), Image.LANCZOS)  # never upscales
+    return resized
+
+
+def write_derivatives(source_path, lyrics_dir, song_name):
+    """Write every variant in every available format. Returns {path: bytes}"""
+    formats = available_formats()
+    if not formats:
+        return {}
+    image = load_oriented(source_path)
+    written = {}
+    for variant, (width, height) in LYRICS_VARIANTS.items():
+        rendered = render_variant(image, width, height)
+        for name, ext, options in formats:
+            output_path = derivative_path(lyrics_dir, song_name, variant, ext)
+            temp_path = output_path + ".tmp"
+            # No exif/icc arguments: the derivatives carry no metadata
+            rendered.save(temp_path, name, **options)
+            os.replace(temp_path, output_path)
+            written[output_path] = os.path.getsize(output_path)
+    return written
+
+
+def derivatives_current(source_path, lyrics_dir, song_name):
+    """True when every variant exists in every available format and is newer than the source"""
+    source_mtime = media_store.changed_at(source_path)
+    for variant in LYRICS_VARIANTS:
+        for _, ext, _ in available_formats():
+            path = derivative_path(lyrics_dir, song_name, variant, ext)
+            if not os.path.exists(path) or os.path.getmtime(path) < source_mtime:
+                return False
+    return True
@@ -0,0 +1,976 @@
+import os
+import re
+import time
+import json
+import shutil
+import hashlib
+import socket
+import threading
+import subprocess
+import tempfile
+from contextlib import contextmanager
+import db
+import media_store
+import uploads
+import catalog
+import media_validation
+import waveform
+import image_derivatives
+from mp3_info import mp3_info
+from audio_decode import decode_pcm
+from settings import songs_dir, lyrics_dir, store_dir
+
+# =============== INGEST PIPELINE ===============
+# Everything that turns an upload into playable media: duration probing,
+# rendition encoding, segment packaging and the content-addressed store.
+# It has no Streamlit dependency so the background workers can import it.
+# numpy (alignment engine) is imported only by the analysis functions that
+# use it, so the web process never pays for it on a cold start.
+
+# Long songs need far more than a few seconds of ffmpeg; a timeout now fails
+# the job visibly instead of truncating the output.
+FFMPEG_TIMEOUT = int(os.getenv("FFMPEG_TIMEOUT", "900"))
+
+os.makedirs(songs_dir, exist_ok=True)
+media_store.init_store(store_dir)
+
+# =============== IMPROVED ACCURATE AUDIO DURATION FUNCTIONS ===============
+PROBE_FIELDS = ("duration", "bitrate", "sample_rate", "channels", "codec")
+AUDIO_EXTENSIONS = (".mp3", ".opus", ".wav", ".m4a", ".ogg")
+
+def probe_media(file_path):
+    """Measure a media file, reading headers instead of decoding where possible"""
+    if not os.path.exists(file_path):
+        return None
+    
+    methods_tried = []
+    lower_path = file_path.lower()
+    
+    # Method 1: MP3 frame header / Xing / VBRI parser (exact, no subprocess)
+    if lower_path.endswith('.mp3'):
+        info = mp3_info(file_path)
+        if info and info["duration"] > 0:
+            print(f"✅ {info['method']} duration for {os.path.basename(file_path)}: {info['duration']}")
+            return {field: info[field] for field in PROBE_FIELDS}
+        methods_tried.append("mp3 headers")
+    
+    # Method 2: wave module for WAV files
+    if lower_path.endswith('.wav'):
+        try:
+            import wave
+            with wave.open(file_path, 'rb') as wav_file:
+                frames = wav_file.getnframes()
+                rate = wav_file.getframerate()
+                channels = wav_file.getnchannels()
+                duration = frames / float(rate)
+                if duration > 0:
+                    print(f"✅ wave duration for {os.path.basename(file_path)}: {duration}")
+                    return {
+                        "duration": duration,
+                        "bitrate": rate * wav_file.getsampwidth() * 8 * channels,
+                        "sample_rate": rate,
+                        "channels": channels,
+                        "codec": "pcm",
+                    }
+        except Exception as e:
+            methods_tried.append(f"wave failed: {str(e)[:50]}")
+    
+    # Method 3: ffprobe for everything else (Opus, M4A, ...) or unparsable files
+    try:
+        cmd = [
+            'ffprobe', '-v', 'error', '-select_streams', 'a:0', '-show_entries',
+            'format=duration,bit_rate:stream=codec_name,sample_rate,channels',
+            '-of', 'json', file_path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+        if result.returncode == 0:
+            probe = json.loads(result.stdout)
+            fmt = probe.get("format", {})
+            stream = (probe.get("streams") or [{}])[0]
+            duration = float(fmt.get("duration", 0))
+            if duration > 0:
+                print(f"✅ ffprobe duration for {os.path.basename(file_path)}: {duration}")
+                return {
+                    "duration": duration,
+                    "bitrate": int(fmt.get("bit_rate", 0)) or None,
+                    "sample_rate": int(stream.get("sample_rate", 0)) or None,
+                    "channels": stream.get("channels"),
+                    "codec": stream.get("codec_name"),
+                }
+        methods_tried.append("ffprobe")
+    except Exception as e:
+        methods_tried.append(f"ffprobe failed: {str(e)[:50]}")
+    
+    print(f"❌ All methods failed for {os.path.basename(file_path)}: {methods_tried}")
+    return None
+
+# =============== MEDIA PROBE CACHE ===============
+# Probe results are stored per file keyed by (path, size, mtime), so a file is
+# measured once at ingest and every later lookup (dashboards, player,
+# reprocessing) is a single indexed read. Rewriting a file changes its size
+# or mtime, which invalidates the row.
+
+def load_media_probe(path, stat):
+    try:
+        row = db.query_one('''SELECT duration, bitrate, sample_rate, channels, codec FROM media_probes
+                              WHERE path = ? AND size = ? AND mtime_ns = ?''',
+                           (path, stat.st_size, stat.st_mtime_ns))
+        return dict(zip(PROBE_FIELDS, row)) if row else None
+    except Exception as e:
+        print(f"Load media probe error: {e}")
+        return None
+
+def save_media_probe(path, stat, info):
+    try:
+        db.execute('''INSERT OR REPLACE INTO media_probes
+                      (path, size, mtime_ns, duration, bitrate, sample_rate, channels, codec, probed_at)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                   (path, stat.st_size, stat.st_mtime_ns,
+                    *(info[field] for field in PROBE_FIELDS), time.time()))
+    except Exception as e:
+        print(f"Save media probe error: {e}")
+
+def get_media_info(file_path):
+    """Cached probe of a media file. Returns a dict of PROBE_FIELDS or None"""
+    path = os.path.abspath(file_path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    info = load_media_probe(path, stat)
+    if info:
+        return info
+    info = probe_media(path)
+    if info:
+        save_media_probe(path, stat, info)
+    return info
+
+def get_audio_duration(file_path):
+    """Get accurate audio duration (from the probe cache while the file is unchanged)"""
+    info = get_media_info(file_path)
+    return info["duration"] if info else None
+
+def probe_song(song_name):
+    """Fill the probe cache for a song's source tracks and renditions.
+    Returns the number of files probed"""
+    paths = []
+    for track in AUDIO_TRACKS:
+        paths.append(os.path.join(songs_dir, f"{song_name}_{track}.mp3"))
+        paths.extend(rendition_path(song_name, track, rendition) for rendition in AUDIO_RENDITIONS)
+    return sum(1 for path in paths if os.path.exists(path) and get_media_info(path))
+
+# =============== HIGH QUALITY AUDIO PROCESSING ===============
+HIGH_QUALITY_MP3_ARGS = [
+    '-c:a', 'libmp3lame',
+    '-q:a', '0',  # Highest quality (0-9, 0 is best)
+    '-ar', '48000',  # High sample rate
+    '-b:a', '320k',  # High bitrate
+    '-id3v2_version', '3',
+    '-write_xing', '0',  # Fix duration issues
+]
+
+# Delivery renditions produced at ingest. The player picks one per client from
+# codec support, the user's quality setting and measured throughput.
+# "processed" is the original 320k MP3 and keeps its _processed.mp3 name.
+AUDIO_RENDITIONS = [
+    {"name": "low", "suffix": "_low.opus", "kbps": 64, "mime": "audio/ogg; codecs=opus",
+     "args": ['-c:a', 'libopus', '-b:a', '64k', '-vbr', 'on', '-ar', '48000']},
+    {"name": "medium", "suffix": "_medium.mp3", "kbps": 128, "mime": "audio/mpeg",
+     "args": ['-c:a', 'libmp3lame', '-b:a', '128k', '-ar', '44100', '-id3v2_version', '3']},
+    {"name": "processed", "suffix": "_processed.mp3", "kbps": 320, "mime": "audio/mpeg",
+     "args": HIGH_QUALITY_MP3_ARGS},
+]
+AUDIO_TRACKS = ["original", "accompaniment"]
+
+def encode_audio(input_path, output_path, codec_args):
+    """Encode audio with ffmpeg into output_path, returns True on success"""
+    # output_path may be a hard link into the media store: write a fresh file
+    # and rename it over the old name instead of truncating the shared blob
+    temp_output = output_path + ".part" + os.path.splitext(output_path)[1]
+    try:
+        cmd = ['ffmpeg', '-i', input_path, '-vn', *codec_args,
+               '-map_metadata', '0', '-y', temp_output]
+        result = subprocess.run(cmd, capture_output=True, timeout=FFMPEG_TIMEOUT)
+        if result.returncode != 0 or not os.path.exists(temp_output):
+            print(f"⚠️ ffmpeg failed for {os.path.basename(output_path)}")
+            return False
+        os.replace(temp_output, output_path)
+        return True
+    except Exception as e:
+        print(f"⚠️ Encoding failed for {os.path.basename(output_path)}: {e}")
+        return False
+    finally:
+        if os.path.exists(temp_output):
+            os.remove(temp_output)
+
+def process_audio_for_quality(input_path, output_path):
+    """Process audio for better quality and fix duration issues"""
+    if encode_audio(input_path, output_path, HIGH_QUALITY_MP3_ARGS):
+        # Verify duration after processing
+        duration = get_audio_duration(output_path)
+        print(f"✅ Processed audio duration: {duration} seconds")
+        return True
+    
+    # Keep the song playable, but report the failure so the job can be retried
+    print(f"⚠️ Audio processing failed, using original")
+    temp_output = output_path + ".part.mp3"
+    shutil.copy2(input_path, temp_output)
+    os.replace(temp_output, output_path)
+    return False
+
+def rendition_path(song_name, track, rendition):
+    return os.path.join(songs_dir, f"{song_name}_{track}{rendition['suffix']}")
+
+# =============== SEGMENTED PACKAGING ===============
+# MP3 renditions are also split into short segments with a manifest so the
+# player can start after the first segment and fetch only what it needs when
+# seeking. Segments live next to the song: <song>_<track>_<rendition>_segments/
+SEGMENT_SECONDS = 6
+SEGMENT_MANIFEST = "manifest.json"
+
+def segments_dir_for(song_name, track, rendition):
+    return os.path.join(songs_dir, f"{song_name}_{track}_{rendition['name']}_segments")
+
+def package_audio_segments(input_path, output_dir):
+    """Split an MP3 into SEGMENT_SECONDS segments plus JSON and m3u8 manifests"""
+    temp_dir = tempfile.mkdtemp(prefix=".segments_", dir=os.path.dirname(output_dir))
+    try:
+        cmd = [
+            'ffmpeg', '-i', input_path,
+            '-map', '0:a', '-c', 'copy',
+            '-f', 'segment',
+            '-segment_time', str(SEGMENT_SECONDS),
+            '-segment_list', os.path.join(temp_dir, 'segments.csv'),
+            '-segment_list_type', 'csv',
+            # The player appends segments back to back into one SourceBuffer,
+            # so none may carry its own ID3 tag or Xing/Info frame
+            '-segment_format_options', 'id3v2_version=0:write_xing=0',
+            '-reset_timestamps', '1',
+            '-y',
+            os.path.join(temp_dir, 'seg_%05d.mp3')
+        ]
+        result = subprocess.run(cmd, capture_output=True, timeout=FFMPEG_TIMEOUT)
+        csv_path = os.path.join(temp_dir, 'segments.csv')
+        if result.returncode != 0 or not os.path.exists(csv_path):
+            print(f"⚠️ Segmenting failed for {os.path.basename(input_path)}")
+            return False
+        
+        segments = []
+        with open(csv_path, "r") as f:
+            for line in f:
+                parts = line.strip().rsplit(",", 2)
+                if len(parts) != 3:
+                    continue
+                name, start, end = parts[0], float(parts[1]), float(parts[2])
+                segments.append({
+                    "file": name,
+                    "start": round(start, 3),
+                    "duration": round(end - start, 3),
+                    "bytes": os.path.getsize(os.path.join(temp_dir, name))
+                })
+        os.remove(csv_path)
+        if not segments:
+            return False
+        
+        total = segments[-1]["start"] + segments[-1]["duration"]
+        manifest = {
+            "version": 1,
+            "mime": "audio/mpeg",
+            "target_duration": SEGMENT_SECONDS,
+            "duration": round(total, 3),
+            "segments": segments
+        }
+        with open(os.path.join(temp_dir, SEGMENT_MANIFEST), "w") as f:
+            json.dump(manifest, f)
+        
+        # HLS-style playlist for tools and native players
+        playlist = ["#EXTM3U", "#EXT-X-VERSION:3",
+                    f"#EXT-X-TARGETDURATION:{int(max(s['duration'] for s in segments)) + 1}",
+                    "#EXT-X-PLAYLIST-TYPE:VOD", "#EXT-X-MEDIA-SEQUENCE:0"]
+        for segment in segments:
+            playlist.append(f"#EXTINF:{segment['duration']:.3f},")
+            playlist.append(segment["file"])
+        playlist.append("#EXT-X-ENDLIST")
+        with open(os.path.join(temp_dir, "index.m3u8"), "w") as f:
+            f.write("\n".join(playlist) + "\n")
+        
+        # Swap the finished package in, then drop the previous one
+        old_dir = None
+        if os.path.exists(output_dir):
+            old_dir = temp_dir + ".old"
+            os.replace(output_dir, old_dir)
+        os.replace(temp_dir, output_dir)
+        if old_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+        print(f"✅ Packaged {len(segments)} segments for {os.path.basename(input_path)}")
+        return True
+    except Exception as e:
+        print(f"⚠️ Segmenting failed for {os.path.basename(input_path)}: {e}")
+        return False
+    finally:
+        if os.path.exists(temp_dir):
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+def create_audio_renditions(song_name, progress=None):
+    """Encode every delivery rendition of both tracks, returns the number created"""
+    created = 0
+    total_steps = len(AUDIO_TRACKS) * len(AUDIO_RENDITIONS)
+    step = 0
+    for track in AUDIO_TRACKS:
+        source_path = os.path.join(songs_dir, f"{song_name}_{track}.mp3")
+        if not os.path.exists(source_path):
+            continue
+        for rendition in AUDIO_RENDITIONS:
+            if progress:
+                progress(step / total_steps, f"Encoding {track} ({rendition['name']})")
+            step += 1
+            output_path = rendition_path(song_name, track, rendition)
+            if rendition["name"] == "processed":
+                ok = process_audio_for_quality(source_path, output_path)
+            else:
+                ok = encode_audio(source_path, output_path, rendition["args"])
+            if ok:
+                store_media_file(output_path, song_name, f"{track}_{rendition['name']}")
+                created += 1
+                if rendition["mime"] == "audio/mpeg":
+                    package_audio_segments(output_path, segments_dir_for(song_name, track, rendition))
+    print(f"✅ Created {created} renditions for {song_name}")
+    return created
+
+# =============== LOUDNESS ANALYSIS (EBU R128) ===============
+# Integrated loudness, loudness range and true peak of each source track are
+# measured in one ffmpeg decode pass (ebur128 filter, no output written) and
+# stored in the catalog. The player turns them into a playback gain, so
+# songs play at a consistent level without re-encoding normalized copies.
+REFERENCE_LUFS = -14.0
+MAX_GAIN_DB = 12.0
+PEAK_CEILING_DBTP = -1.0
+LOUDNESS_PATTERNS = {
+    "integrated": re.compile(r"I:\s+(-?[\d.]+|-inf) LUFS"),
+    "lra": re.compile(r"LRA:\s+(-?[\d.]+) LU"),
+    "true_peak": re.compile(r"Peak:\s+(-?[\d.]+|-inf) dBFS"),
+}
+
+def parse_ebur128_summary(output):
+    """Integrated/LRA/true-peak from the ebur128 filter's summary, or None"""
+    summary = output[output.rfind("Summary:"):] if "Summary:" in output else ""
+    measurement = {}
+    for field, pattern in LOUDNESS_PATTERNS.items():
+        match = pattern.search(summary)
+        if not match:
+            return None
+        value = float(match.group(1))
+        # Digital silence reports -inf; clamp so it stays a finite number
+        measurement[field] = max(value, -70.0) if field != "lra" else value
+    return measurement
+
+def measure_loudness(path):
+    """Measure one file's EBU R128 loudness in a single decode pass"""
+    try:
+        cmd = [
+            'ffmpeg', '-hide_banner', '-nostats', '-i', path,
+            '-map', '0:a:0',
+            '-filter:a', 'ebur128=peak=true:framelog=verbose',
+            '-f', 'null', '-'
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=FFMPEG_TIMEOUT)
+        if result.returncode != 0:
+            print(f"⚠️ Loudness analysis failed for {os.path.basename(path)}")
+            return None
+        return parse_ebur128_summary(result.stderr)
+    except Exception as e:
+        print(f"⚠️ Loudness analysis failed for {os.path.basename(path)}: {e}")
+        return None
+
+def loudness_gain(measurement, reference=REFERENCE_LUFS):
+    """Linear playback gain that brings a track to the reference loudness
+    without pushing its true peak over PEAK_CEILING_DBTP"""
+    if not measurement or measurement.get("integrated") is None:
+        return 1.0
+    gain_db = reference - measurement["integrated"]
+    gain_db = min(gain_db, PEAK_CEILING_DBTP - measurement["true_peak"])
+    gain_db = max(-MAX_GAIN_DB, min(MAX_GAIN_DB, gain_db))
+    return round(10 ** (gain_db / 20), 4)
+
+def analyse_song_loudness(song_name, force=False):
+    """Measure every source track whose content changed. Returns (measured, cached, failed)"""
+    stored = catalog.load_loudness(song_name)
+    measured = cached = failed = 0
+    for track in AUDIO_TRACKS:
+        path = os.path.join(songs_dir, f"{song_name}_{track}.mp3")
+        if not os.path.exists(path):
+            continue
+        content_key = track_content_key(song_name, track, path)
+        if not force and stored.get(track, {}).get("content_key") == content_key:
+            cached += 1
+            continue
+        measurement = measure_loudness(path)
+        if measurement:
+            catalog.save_loudness(song_name, track, content_key, measurement)
+            print(f"✅ {song_name} {track}: {measurement['integrated']:.1f} LUFS, "
+                  f"LRA {measurement['lra']:.1f} LU, peak {measurement['true_peak']:.1f} dBTP")
+            measured += 1
+        else:
+            failed += 1
+    return measured, cached, failed
+
+# =============== TRACK ALIGNMENT ===============
+# Uploaded pairs often differ in leading silence or encoder delay. The
+# alignment engine measures where the accompaniment sits inside the
+# original once per pair of track contents; the player uses the stored
+# offset and drift to start both tracks on the same musical sample.
+def align_song(song_name, force=False):
+    """Align one song's tracks unless this pair was already measured.
+    Returns "aligned", "cached", "failed" or "missing\""""
+    paths = {track: os.path.join(songs_dir, f"{song_name}_{track}.mp3") for track in AUDIO_TRACKS}
+    if not all(os.path.exists(path) for path in paths.values()):
+        return "missing"
+    content_key = ":".join(track_content_key(song_name, track, paths[track]) for track in AUDIO_TRACKS)
+    stored = catalog.load_alignment(song_name)
+    if not force and stored and stored["content_key"] == content_key:
+        return "cached"
+    import alignment
+    result = alignment.align_files(paths["original"], paths["accompaniment"])
+    # Unalignable pairs are stored too, so later jobs do not retry them
+    catalog.save_alignment(song_name, content_key, result)
+    if not result:
+        print(f"⚠️ Could not align the tracks of {song_name}")
+        return "failed"
+    print(f"✅ {song_name}: accompaniment offset {result['offset'] * 1000:.1f} ms, "
+          f"drift {result['drift'] * 1e6:.0f} ppm")
+    return "aligned"
+
+# =============== WAVEFORM PEAKS ===============
+def generate_song_peaks(song_name, force=False):
+    """Write <song>_<track>.peaks for each source track that changed since
+    its peaks were made. Returns the number of files written"""
+    written = 0
+    for track in AUDIO_TRACKS:
+        source_path = os.path.join(songs_dir, f"{song_name}_{track}.mp3")
+        if not os.path.exists(source_path):
+            continue
+        output_path = waveform.peaks_path(source_path)
+        if (not force and os.path.exists(output_path)
+                and os.path.getmtime(output_path) >= media_store.changed_at(source_path)):
+            continue
+        samples = decode_pcm(source_path, waveform.PEAK_RATE)
+        if samples is None or not len(samples):
+            continue
+        size = waveform.write_peaks(samples, output_path)
+        print(f"✅ Waveform peaks for {song_name} {track}: {size} bytes")
+        written += 1
+    return written
+
+# =============== LYRICS IMAGE DERIVATIVES ===============
+def generate_lyrics_derivatives(song_name, force=False):
+    """Write the song's lyrics image derivatives unless they are current.
+    Returns the number of files written"""
+    source_path = image_derivatives.find_lyrics_source(lyrics_dir, song_name)
+    if not source_path:
+        return 0
+    if not force and image_derivatives.derivatives_current(source_path, lyrics_dir, song_name):
+        return 0
+    try:
+        written = image_derivatives.write_derivatives(source_path, lyrics_dir, song_name)
+    except Exception as e:
+        print(f"⚠️ Image derivatives failed for {song_name}: {e}")
+        return 0
+    if written:
+        print(f"✅ Lyrics image derivatives for {song_name}: "
+              f"{os.path.getsize(source_path) // 1024} KB → "
+              + ", ".join(f"{os.path.basename(path)} {size // 1024} KB" for path, size in written.items()))
+    return len(written)
+
+# =============== INGEST DATABASE ===============
+def init_ingest_db():
+    catalog.init_catalog_db()
+    try:
+        with db.transaction() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS song_blobs
+                            (song_name TEXT,
+                             kind TEXT,
+                             blob_key TEXT,
+                             ext TEXT,
+                             PRIMARY KEY (song_name, kind))''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS jobs
+                            (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                             song_name TEXT,
+                             kind TEXT,
+                             status TEXT,
+                             progress REAL DEFAULT 0,
+                             message TEXT,
+                             attempts INTEGER DEFAULT 0,
+                             worker TEXT,
+                             created_at REAL,
+                             started_at REAL,
+                             heartbeat_at REAL,
+                             finished_at REAL)''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)')
+            conn.execute('''CREATE TABLE IF NOT EXISTS song_locks
+                            (song_name TEXT PRIMARY KEY,
+                             owner TEXT,
+                             heartbeat_at REAL)''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS media_probes
+                            (path TEXT PRIMARY KEY,
+                             size INTEGER,
+                             mtime_ns INTEGER,
+                             duration REAL,
+                             bitrate INTEGER,
+                             sample_rate INTEGER,
+                             channels INTEGER,
+                             codec TEXT,
+                             probed_at REAL)''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS processing_state
+                            (song_name TEXT PRIMARY KEY,
+                             fingerprint TEXT,
+                             pipeline_version INTEGER,
+                             processed_at REAL)''')
+    except Exception as e:
+        print(f"Ingest database init error: {e}")
+
+def save_song_blob_to_db(song_name, kind, blob_key, ext):
+    try:
+        db.execute('''INSERT OR REPLACE INTO song_blobs 
+                      (song_name, kind, blob_key, ext)
+                      VALUES (?, ?, ?, ?)''',
+                   (song_name, kind, blob_key, ext))
+    except Exception as e:
+        print(f"Save song blob error: {e}")
+
+def replace_song_blob(song_name, kind, blob_key, ext):
+    """Record a song's blob for a kind and release the blob it replaces"""
+    previous = load_song_blobs_from_db(song_name).get(kind)
+    save_song_blob_to_db(song_name, kind, blob_key, ext)
+    if previous and previous != (blob_key, ext):
+        media_store.release_blob(*previous)
+
+def load_song_blobs_from_db(song_name):
+    blobs = {}
+    try:
+        results = db.query('SELECT kind, blob_key, ext FROM song_blobs WHERE song_name = ?', (song_name,))
+        for kind, blob_key, ext in results:
+            blobs[kind] = (blob_key, ext)
+    except Exception as e:
+        print(f"Load song blobs error: {e}")
+    return blobs
+
+def delete_song_blobs_from_db(song_name):
+    try:
+        db.execute('DELETE FROM song_blobs WHERE song_name = ?', (song_name,))
+    except Exception as e:
+        print(f"Delete song blobs error: {e}")
+
+def load_processing_fingerprint(song_name):
+    try:
+        row = db.query_one('SELECT fingerprint FROM processing_state WHERE song_name = ?', (song_name,))
+        return row[0] if row else None
+    except Exception as e:
+        print(f"Load processing state error: {e}")
+        return None
+
+def save_processing_fingerprint(song_name, fingerprint):
+    try:
+        db.execute('''INSERT OR REPLACE INTO processing_state
+                      (song_name, fingerprint, pipeline_version, processed_at)
+                      VALUES (?, ?, ?, ?)''',
+                   (song_name, fingerprint, PIPELINE_VERSION, time.time()))
+    except Exception as e:
+        print(f"Save processing state error: {e}")
+
+def update_processed_metadata_in_db(song_name, duration, processed):
+    """Record processing results without touching who uploaded the song"""
+    try:
+        db.execute('''INSERT INTO metadata (song_name, uploaded_by, timestamp, duration, processed)
+                      VALUES (?, 'unknown', ?, ?, ?)
+                      ON CONFLICT(song_name) DO UPDATE SET
+                          duration = COALESCE(excluded.duration, metadata.duration),
+                          processed = excluded.processed''',
+                   (song_name, time.time(), duration, processed))
+    except Exception as e:
+        print(f"Update processed metadata error: {e}")
+
+# =============== CONTENT-ADDRESSED STORAGE ===============
+def store_completed_upload(token, dest_path, song_name, kind):
+    """Move a finished resumable upload into the media store and link it at dest_path"""
+    completed = uploads.completed_file(token)
+    if not completed:
+        return None
+    part_path, upload = completed
+    blob_key = media_store.put_temp_file(part_path, upload["ext"])
+    media_store.link_blob(blob_key, upload["ext"], dest_path)
+    replace_song_blob(song_name, kind, blob_key, upload["ext"])
+    uploads.mark_committed(token)
+    return blob_key
+
+def store_media_file(path, song_name, kind):
+    """Fold a generated file (e.g. processed audio) into the media store"""
+    try:
+        ext = os.path.splitext(path)[1].lower()
+        blob_key = media_store.adopt_file(path)
+        replace_song_blob(song_name, kind, blob_key, ext)
+        return blob_key
+    except Exception as e:
+        print(f"⚠️ Could not store {os.path.basename(path)}: {e}")
+        return None
+
+def release_song_blobs(song_name):
+    """Forget a song's blobs and delete those no other file links to"""
+    for blob_key, ext in load_song_blobs_from_db(song_name).values():
+        media_store.release_blob(blob_key, ext)
+    delete_song_blobs_from_db(song_name)
+
+def forget_song(song_name, paths=()):
+    """Drop what was recorded about a deleted song: its blobs, its processing
+    fingerprint (so uploading the same files again reprocesses them) and the
+    probes of its files"""
+    release_song_blobs(song_name)
+    try:
+        with db.transaction() as conn:
+            conn.execute('DELETE FROM processing_state WHERE song_name = ?', (song_name,))
+            conn.executemany('DELETE FROM media_probes WHERE path = ?',
+                             [(os.path.abspath(path),) for path in paths])
+    except Exception as e:
+        print(f"Forget song error: {e}")
+
+# =============== FINGERPRINT-AWARE PROCESSING ===============
+# A song is reprocessed only when the content of its source tracks or the
+# pipeline itself changed. Bump PIPELINE_VERSION whenever renditions,
+# segments or other ingest outputs change.
+PIPELINE_VERSION = 1
+
+def track_content_key(song_name, track, path):
+    """Content hash of a source track, free when the file is a store hard link"""
+    blob = load_song_blobs_from_db(song_name).get(track)
+    if blob:
+        try:
+            if os.path.samefile(path, media_store.blob_path(*blob)):
+                return blob[0]
+        except OSError:
+            pass
+    return media_store.hash_file(path)
+
+def source_fingerprint(song_name):
+    """Fingerprint of the source tracks plus pipeline version, None if a track is missing"""
+    digest = hashlib.sha256(f"pipeline:{PIPELINE_VERSION}".encode())
+    for track in AUDIO_TRACKS:
+        path = os.path.join(songs_dir, f"{song_name}_{track}.mp3")
+        if not os.path.exists(path):
+            return None
+        digest.update(f"{track}:{track_content_key(song_name, track, path)}".encode())
+    return digest.hexdigest()
+
+def process_song(song_name, force=False, progress=None):
+    """Bring one song's outputs up to date. Returns a result dict for reporting;
+    status "busy" when another worker holds the song's lock"""
+    try:
+        with song_lock(song_name):
+            return _process_song(song_name, force, progress)
+    except SongBusy as e:
+        return {"song": song_name, "status": "busy", "seconds": 0.0, "bytes": 0, "error": str(e)}
+
+def _process_song(song_name, force, progress):
+    started = time.time()
+    result = {"song": song_name, "status": "skipped", "seconds": 0.0, "bytes": 0}
+    
+    # The lyrics image is not part of the audio fingerprint; derivatives
+    # follow their own source's mtime
+    generate_lyrics_derivatives(song_name, force=force)
+    
+    fingerprint = source_fingerprint(song_name)
+    if not fingerprint:
+        result["status"] = "missing"
+        return result
+    if not force and load_processing_fingerprint(song_name) == fingerprint:
+        return result
+    
+    # Reject sources ffmpeg would choke on before spending any CPU on them
+    if progress:
+        progress(0.0, "Validating sources")
+    for track in AUDIO_TRACKS:
+        try:
+            media_validation.validate_file(os.path.join(songs_dir, f"{song_name}_{track}.mp3"))
+        except media_validation.ValidationError as e:
+            result["status"] = "invalid"
+            result["error"] = f"{track}: {e}"
+            result["seconds"] = time.time() - started
+            return result
+    
+    expected = len(AUDIO_TRACKS) * len(AUDIO_RENDITIONS)
+    created = create_audio_renditions(song_name, progress=progress)
+    
+    if progress:
+        progress(0.9, "Measuring loudness, alignment and waveform")
+    # Not fatal: the player plays unmeasured tracks at unity gain
+    analyse_song_loudness(song_name, force=force)
+    align_song(song_name, force=force)
+    generate_song_peaks(song_name, force=True)
+    
+    if progress:
+        progress(0.95, "Measuring duration")
+    # Fill the probe cache for every output so readers never probe again
+    for track in AUDIO_TRACKS:
+        get_media_info(os.path.join(songs_dir, f"{song_name}_{track}.mp3"))
+        for rendition in AUDIO_RENDITIONS:
+            get_media_info(rendition_path(song_name, track, rendition))
+    processed_acc = os.path.join(songs_dir, f"{song_name}_accompaniment_processed.mp3")
+    duration = get_audio_duration(processed_acc) or get_audio_duration(
+        os.path.join(songs_dir, f"{song_name}_accompaniment.mp3"))
+    
+    complete = created == expected
+    update_processed_metadata_in_db(song_name, duration, complete)
+    if complete:
+        save_processing_fingerprint(song_name, fingerprint)
+    
+    result["status"] = "processed" if complete else "failed"
+    result["seconds"] = time.time() - started
+    result["bytes"] = sum(
+        os.path.getsize(os.path.join(songs_dir, f"{song_name}_{track}.mp3")) for track in AUDIO_TRACKS
+    )
+    if not complete:
+        result["error"] = f"Only {created} of {expected} renditions were created"
+    return result
+
+# =============== BACKGROUND JOB QUEUE ===============
+# Jobs live in session_data.db so every web process and worker shares them.
+# Workers claim jobs atomically and a heartbeat thread keeps the claim fresh
+# while the job runs, however long a single ffmpeg call takes; jobs whose
+# worker died are put back in the queue. A per-song lock with the same
+# heartbeat keeps two workers from working on one song at once (and writing
+# the same temp files). Catalog-wide actions queue one job per song, so they
+# run on the worker pool rather than in a web process.
+JOB_STALE_SECONDS = 120
+JOB_HEARTBEAT_SECONDS = 20
+JOB_MAX_ATTEMPTS = 3
+
+
+class SongBusy(Exception):
+    """Another worker is processing this song"""
+
+
+@contextmanager
+def heartbeat(beat, interval=JOB_HEARTBEAT_SECONDS):
+    """Call beat() every interval seconds on a background thread while the block runs"""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                beat()
+            except Exception as e:
+                print(f"Heartbeat error: {e}")
+
+    thread = threading.Thread(target=run, name="ingest-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+def acquire_song_lock(song_name, owner):
+    """Take the song's lock unless a live owner holds it. Returns True if taken"""
+    with db.transaction(immediate=True) as conn:
+        now = time.time()
+        row = conn.execute('SELECT owner, heartbeat_at FROM song_locks WHERE song_name = ?',
+                           (song_name,)).fetchone()
+        if row and row[0] != owner and row[1] >= now - JOB_STALE_SECONDS:
+            return False
+        conn.execute('INSERT OR REPLACE INTO song_locks (song_name, owner, heartbeat_at) VALUES (?, ?, ?)',
+                     (song_name, owner, now))
+        return True
+
+def refresh_song_lock(song_name, owner):
+    db.execute('UPDATE song_locks SET heartbeat_at = ? WHERE song_name = ? AND owner = ?',
+               (time.time(), song_name, owner))
+
+def release_song_lock(song_name, owner):
+    try:
+        db.execute('DELETE FROM song_locks WHERE song_name = ? AND owner = ?', (song_name, owner))
+    except Exception as e:
+        print(f"Release song lock error: {e}")
+
+@contextmanager
+def song_lock(song_name):
+    """Hold the song's lock for the block, raises SongBusy if someone else has it"""
+    owner = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    if not acquire_song_lock(song_name, owner):
+        raise SongBusy(f"{song_name} is already being processed")
+    try:
+        with heartbeat(lambda: refresh_song_lock(song_name, owner)):
+            yield
+    finally:
+        release_song_lock(song_name, owner)
+
+def enqueue_job(song_name, kind="ingest"):
+    """Queue a job unless the same one is already waiting. Returns the job id"""
+    try:
+        with db.transaction(immediate=True) as conn:
+            existing = conn.execute("SELECT id FROM jobs WHERE song_name = ? AND kind = ? AND status = 'queued'",
+                                    (song_name, kind)).fetchone()
+            if existing:
+                return existing[0]
+            cursor = conn.execute('''INSERT INTO jobs (song_name, kind, status, progress, message, created_at)
+                                     VALUES (?, ?, 'queued', 0, 'Waiting for a worker', ?)''',
+                                  (song_name, kind, time.time()))
+            return cursor.lastrowid
+    except Exception as e:
+        print(f"Enqueue job error: {e}")
+        return None
+
+def enqueue_jobs(song_names, kind):
+    """Queue one job of a kind per song in a single transaction. Returns the number queued"""
+    try:
+        with db.transaction(immediate=True):
+            return sum(1 for song_name in song_names if enqueue_job(song_name, kind))
+    except Exception as e:
+        print(f"Enqueue jobs error: {e}")
+        return 0
+
+def claim_next_job(worker_id):
+    """Atomically take the oldest queued job, returns (id, song_name, kind) or None"""
+    try:
+        with db.transaction(immediate=True) as conn:
+            now = time.time()
+            # Requeue jobs whose worker stopped heartbeating
+            conn.execute('''UPDATE jobs SET status = 'queued', worker = NULL,
+                                message = 'Requeued after worker loss'
+                            WHERE status = 'running' AND heartbeat_at < ? AND attempts < ?''',
+                         (now - JOB_STALE_SECONDS, JOB_MAX_ATTEMPTS))
+            conn.execute('''UPDATE jobs SET status = 'failed', finished_at = ?,
+                                message = 'Worker lost too many times'
+                            WHERE status = 'running' AND heartbeat_at < ?''',
+                         (now, now - JOB_STALE_SECONDS))
+            row = conn.execute("SELECT id, song_name, kind FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row:
+                conn.execute('''UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1,
+                                    progress = 0, message = 'Starting', started_at = ?, heartbeat_at = ?
+                                WHERE id = ?''',
+                             (worker_id, now, now, row[0]))
+            return row
+    except Exception as e:
+        print(f"Claim job error: {e}")
+        return None
+
+def update_job(job_id, status=None, progress=None, message=None):
+    try:
+        now = time.time()
+        finished_at = now if status in ("done", "failed") else None
+        db.execute('''UPDATE jobs SET status = COALESCE(?, status),
+                          progress = COALESCE(?, progress),
+                          message = COALESCE(?, message),
+                          heartbeat_at = ?,
+                          finished_at = COALESCE(?, finished_at)
+                      WHERE id = ?''',
+                   (status, progress, message, now, finished_at, job_id))
+    except Exception as e:
+        print(f"Update job error: {e}")
+
+def touch_job(job_id, worker_id):
+    """Refresh the heartbeat of a job this worker still owns"""
+    db.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running' AND worker = ?",
+               (time.time(), job_id, worker_id))
+
+def requeue_job(job_id, message):
+    """Give a running job back to the queue without counting it as failed"""
+    try:
+        # Not a real attempt: the job never started work
+        db.execute('''UPDATE jobs SET status = 'queued', worker = NULL, message = ?,
+                          attempts = attempts - 1
+                      WHERE id = ? AND status = ?''', (message, job_id, "running"))
+    except Exception as e:
+        print(f"Requeue job error: {e}")
+
+def retry_job(job_id):
+    """Put a failed job back in the queue"""
+    try:
+        db.execute('''UPDATE jobs SET status = 'queued', progress = 0, attempts = 0,
+                          message = 'Retry requested', worker = NULL, finished_at = NULL
+                      WHERE id = ? AND status = ?''', (job_id, "failed"))
+    except Exception as e:
+        print(f"Retry job error: {e}")
+
+def job_counts():
+    """{status: number of jobs}"""
+    try:
+        return dict(db.query('SELECT status, COUNT(*) FROM jobs GROUP BY status'))
+    except Exception as e:
+        print(f"Count jobs error: {e}")
+        return {}
+
+def list_jobs(limit=50):
+    jobs = []
+    try:
+        rows = db.query('''SELECT id, song_name, kind, status, progress, message, attempts, created_at, finished_at
+                           FROM jobs ORDER BY id DESC LIMIT ?''', (limit,))
+        for row in rows:
+            jobs.append(dict(zip(
+                ["id", "song_name", "kind", "status", "progress", "message", "attempts", "created_at", "finished_at"],
+                row
+            )))
+    except Exception as e:
+        print(f"List jobs error: {e}")
+    return jobs
+
+def run_ingest_job(job_id, song_name, force=False):
+    """Encode renditions and segments, measure duration and update metadata"""
+    def progress(fraction, message):
+        update_job(job_id, progress=round(fraction * 0.95, 3), message=message)
+    
+    result = process_song(song_name, force=force, progress=progress)
+    if result["status"] == "busy":
+        raise SongBusy(result["error"])
+    if result["status"] in ("failed", "missing", "invalid"):
+        raise RuntimeError(result.get("error", "Source files are missing"))
+
+def run_reprocess_job(job_id, song_name):
+    """Rebuild every output even if the sources did not change"""
+    run_ingest_job(job_id, song_name, force=True)
+
+def song_job(fn):
+    """Job handler calling fn(song_name) while holding the song's lock"""
+    def run(job_id, song_name):
+        with song_lock(song_name):
+            fn(song_name)
+    return run
+
+JOB_HANDLERS = {
+    "ingest": run_ingest_job,
+    "reprocess": run_reprocess_job,
+    "probe": song_job(probe_song),
+    "loudness": song_job(analyse_song_loudness),
+    "alignment": song_job(align_song),
+    "waveform": song_job(generate_song_peaks),
+    "images": song_job(generate_lyrics_derivatives),
+}
+
+def run_worker(poll_interval=2.0, once=False):
+    """Process queued jobs forever (or until the queue is empty when once=True)"""
+    init_ingest_db()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"👷 Ingest worker {worker_id} started")
+    while True:
+        job = claim_next_job(worker_id)
+        if not job:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+        
+        job_id, song_name, kind = job
+        handler = JOB_HANDLERS.get(kind)
+        started = time.time()
+        try:
+            if not handler:
+                raise RuntimeError(f"Unknown job kind: {kind}")
+            with heartbeat(lambda: touch_job(job_id, worker_id)):
+                handler(job_id, song_name)
+            update_job(job_id, status="done", progress=1.0,
+                       message=f"Finished in {time.time() - started:.1f}s")
+            print(f"✅ Job {job_id} ({kind}) done for {song_name}")
+        except SongBusy as e:
+            # Another job holds the song; pick this one up again once it is done
+            requeue_job(job_id, f"Waiting: {e}")
+            time.sleep(poll_interval)
+        except Exception as e:
+            update_job(job_id, status="failed", message=str(e)[:200])
+            print(f"❌ Job {job_id} ({kind}) failed for {song_name}: {e}")
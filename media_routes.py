@@ -0,0 +1,19 @@
+import assets
+import media_server
+import media_store
+import uploads
+from settings import songs_dir, lyrics_dir, store_dir
+
+# =============== MEDIA ROUTES ===============
+# What the media server exposes, registered by app.py on every run and by
+# serve.py at import.
+
+
+def register():
+    # Song media only reaches viewers the player page let in (signed URLs)
+    media_server.register_route("songs", songs_dir, signed=True)
+    media_server.register_route("lyrics_images", lyrics_dir, signed=True)
+    # Only finished blobs: upload parts and temp files in the store stay private
+    media_server.register_route("blobs", store_dir, allow=media_store.is_blob_relpath, signed=True)
+    media_server.register_route("assets", assets.STATIC_DIR)
+    media_server.register_upload_handler(uploads)
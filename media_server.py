@@ -0,0 +1,431 @@
+import os
+import re
+import hmac
+import time
+import hashlib
+import secrets
+import mimetypes
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import quote, unquote, urlparse, parse_qs
+
+# =============== MEDIA STREAMING SERVER ===============
+# Serves media/songs and media/lyrics_images over plain HTTP so the player
+# can reference URLs instead of inlining base64. Supports byte ranges
+# (audio starts before the download finishes), conditional GET and
+# long-lived caching for versioned URLs (?v=...). /uploads/<token> accepts
+# resumable chunked uploads when an upload handler is registered.
+# The same handlers run in two places: on the app's own server under
+# MOUNT_PATH (asgi_routes, mounted by serve.py, so a platform that exposes a
+# single port needs nothing else) and as a standalone threaded server on a
+# second port (start_media_server, for `streamlit run app.py`).
+# Song files, lyrics images and blobs are only served to signed URLs: the
+# app signs a URL (sign_url) when it renders a page the viewer may see, so
+# a guessed /media/songs/<song>_original.mp3 is refused.
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "public, max-age=0, must-revalidate"
+# Streamlit reserves /media/ on its own server, so the mounted routes live below this
+MOUNT_PATH = "/api"
+
+CORS_HEADERS = [
+    ("Access-Control-Allow-Origin", "*"),
+    ("Access-Control-Expose-Headers",
+     "Content-Length, Content-Range, Accept-Ranges, ETag, Upload-Offset, Upload-Length"),
+]
+PREFLIGHT_HEADERS = [
+    ("Access-Control-Allow-Methods", "GET, HEAD, PATCH, OPTIONS"),
+    ("Access-Control-Allow-Headers",
+     "Range, If-None-Match, If-Modified-Since, If-Range, "
+     "Content-Type, Upload-Offset, Upload-Length, Upload-Name"),
+    ("Access-Control-Max-Age", "86400"),
+]
+
+# A signature stays valid for 1-2 of these windows; URLs issued within one
+# window are identical, so browsers keep caching them. Several web
+# processes behind one address must share MEDIA_URL_SECRET.
+SIGNED_URL_TTL = 6 * 3600
+_url_secret = os.getenv("MEDIA_URL_SECRET", "").encode() or secrets.token_bytes(32)
+
+mimetypes.add_type("audio/mpeg", ".mp3")
+mimetypes.add_type("audio/ogg", ".opus")
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("image/avif", ".avif")
+
+_routes = {}
+_route_filters = {}
+_signed_routes = set()
+_upload_handler = None
+_mounted = False
+_range_re = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def register_route(prefix, directory, allow=None, signed=False):
+    """Expose a directory under /media/<prefix>/. allow(relpath) -> bool, if
+    given, limits the route to the files it accepts ("/"-separated paths);
+    a signed route only serves URLs carrying a sign_url() query"""
+    _routes[prefix] = os.path.abspath(directory)
+    if allow:
+        _route_filters[prefix] = allow
+    else:
+        _route_filters.pop(prefix, None)
+    if signed:
+        _signed_routes.add(prefix)
+    else:
+        _signed_routes.discard(prefix)
+
+
+def _signature(scope, expires):
+    message = f"{unquote(scope)}\n{expires}".encode()
+    return hmac.new(_url_secret, message, hashlib.sha256).hexdigest()[:32]
+
+
+def sign_url(url_path, scope=None, now=None):
+    """Query parameters granting access to url_path, or to every file below
+    scope when scope is a directory path ending in "/" """
+    now = time.time() if now is None else now
+    expires = (int(now) // SIGNED_URL_TTL + 2) * SIGNED_URL_TTL
+    return f"exp={expires}&sig={_signature(scope or url_path, expires)}"
+
+
+def signature_valid(url_path, query, now=None):
+    params = parse_qs(query)
+    try:
+        expires = int(params["exp"][0])
+        signature = params["sig"][0]
+    except (KeyError, ValueError):
+        return False
+    if expires < (time.time() if now is None else now):
+        return False
+    # The file itself or a directory above it inside its route
+    parts = url_path.split("/")
+    scopes = [url_path] + ["/".join(parts[:i]) + "/" for i in range(4, len(parts))]
+    return any(hmac.compare_digest(signature, _signature(scope, expires)) for scope in scopes)
+
+
+def authorized(url_path, query):
+    parts = url_path.lstrip("/").split("/", 2)
+    if len(parts) == 3 and parts[1] in _signed_routes:
+        return signature_valid(url_path, query)
+    return True
+
+
+def register_upload_handler(handler):
+    """handler.status(token) -> (received, size) and
+    handler.append(token, headers, rfile) -> received; both raise errors
+    carrying an HTTP .status"""
+    global _upload_handler
+    _upload_handler = handler
+
+
+def upload_token(url_path):
+    parts = url_path.strip("/").split("/")
+    if len(parts) == 2 and parts[0] == "uploads" and parts[1]:
+        return parts[1]
+    return None
+
+
+def resolve_path(url_path):
+    """Map /media/<prefix>/<name> to a file inside a registered directory"""
+    parts = url_path.lstrip("/").split("/", 2)
+    if len(parts) != 3 or parts[0] != "media" or parts[1] not in _routes:
+        return None
+    root = _routes[parts[1]]
+    relpath = unquote(parts[2])
+    allow = _route_filters.get(parts[1])
+    if allow and not allow(relpath):
+        return None
+    full_path = os.path.abspath(os.path.join(root, relpath))
+    # Never serve anything outside the registered directory
+    if os.path.commonpath([root, full_path]) != root or not os.path.isfile(full_path):
+        return None
+    return full_path
+
+
+def file_etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def media_version(path):
+    """Short version token for cache-busting URLs (changes when the file changes)"""
+    try:
+        stat = os.stat(path)
+        return f"{stat.st_mtime_ns:x}{stat.st_size:x}"
+    except OSError:
+        return ""
+
+
+def parse_range(header, size):
+    """Parse a single 'bytes=' range. Returns (start, end), None for no range, or False if unsatisfiable"""
+    if not header:
+        return None
+    match = _range_re.match(header.strip())
+    if not match:
+        # Multi-range or malformed: serve the full entity
+        return None
+    start_s, end_s = match.groups()
+    if start_s == "" and end_s == "":
+        return None
+    if start_s == "":
+        suffix = int(end_s)
+        if suffix == 0:
+            return False
+        return max(size - suffix, 0), size - 1
+    start = int(start_s)
+    end = int(end_s) if end_s else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def not_modified(headers, etag, last_modified):
+    inm = headers.get("If-None-Match")
+    if inm:
+        return etag in [t.strip() for t in inm.split(",")] or inm.strip() == "*"
+    ims = headers.get("If-Modified-Since")
+    if ims:
+        try:
+            return int(last_modified) <= int(parsedate_to_datetime(ims).timestamp())
+        except Exception:
+            return False
+    return False
+
+
+def file_response(url_path, query, headers):
+    """Answer a GET/HEAD of a media URL: (status, headers, path, start, length).
+    path is None when there is no body to send"""
+    if not authorized(url_path, query):
+        return 403, [("Content-Length", "0"), ("Cache-Control", "no-store")], None, 0, 0
+    full_path = resolve_path(url_path)
+    if not full_path:
+        return 404, [("Content-Length", "0")], None, 0, 0
+
+    stat = os.stat(full_path)
+    size = stat.st_size
+    etag = file_etag(stat)
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    versioned = "v" in parse_qs(query)
+    cache_control = ("Cache-Control", IMMUTABLE_CACHE if versioned else REVALIDATE_CACHE)
+    content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+
+    if not_modified(headers, etag, stat.st_mtime):
+        return 304, [("ETag", etag), cache_control], None, 0, 0
+
+    byte_range = parse_range(headers.get("Range"), size)
+    if_range = headers.get("If-Range")
+    if byte_range and if_range and if_range.strip() not in (etag, last_modified):
+        byte_range = None
+
+    if byte_range is False:
+        return 416, [("Content-Range", f"bytes */{size}"), ("Content-Length", "0")], None, 0, 0
+
+    if byte_range:
+        start, end = byte_range
+        status = 206
+        response_headers = [("Content-Range", f"bytes {start}-{end}/{size}")]
+    else:
+        start, end = 0, size - 1
+        status = 200
+        response_headers = []
+
+    length = end - start + 1 if size else 0
+    response_headers += [
+        ("Content-Type", content_type),
+        ("Content-Length", str(length)),
+        ("Accept-Ranges", "bytes"),
+        ("ETag", etag),
+        ("Last-Modified", last_modified),
+        cache_control,
+    ]
+    return status, response_headers, full_path if length else None, start, length
+
+
+def read_file(path, start, length):
+    """The bytes of a range, CHUNK_SIZE at a time"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            yield chunk
+            remaining -= len(chunk)
+
+
+def upload_status_response(token):
+    """Answer a HEAD of /uploads/<token>: (status, headers, body)"""
+    try:
+        received, size = _upload_handler.status(token)
+    except Exception as e:
+        return getattr(e, "status", 500), [("Content-Length", "0")], b""
+    headers = [("Upload-Offset", str(received))]
+    if size is not None:
+        headers.append(("Upload-Length", str(size)))
+    headers += [("Cache-Control", "no-store"), ("Content-Length", "0")]
+    return 200, headers, b""
+
+
+def upload_append_response(token, headers, stream):
+    """Answer a PATCH of /uploads/<token>: (status, headers, body)"""
+    try:
+        received = _upload_handler.append(token, headers, stream)
+    except Exception as e:
+        message = str(e).encode()
+        return getattr(e, "status", 500), [
+            ("Content-Type", "text/plain; charset=utf-8"),
+            ("Content-Length", str(len(message))),
+            ("Cache-Control", "no-store"),
+        ], message
+    return 204, [("Upload-Offset", str(received)), ("Cache-Control", "no-store")], b""
+
+
+class MediaRequestHandler(BaseHTTPRequestHandler):
+    server_version = "SingAlongMedia/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def end_headers(self):
+        for name, value in CORS_HEADERS:
+            self.send_header(name, value)
+        super().end_headers()
+
+    def respond(self, status, headers, body=b""):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def do_OPTIONS(self):
+        self.respond(204, PREFLIGHT_HEADERS + [("Content-Length", "0")])
+
+    def do_HEAD(self):
+        token = upload_token(urlparse(self.path).path)
+        if token and _upload_handler:
+            self.respond(*upload_status_response(token))
+            return
+        self.serve(send_body=False)
+
+    def do_PATCH(self):
+        token = upload_token(urlparse(self.path).path)
+        if not token or not _upload_handler:
+            self.close_connection = True
+            self.respond(404, [("Content-Length", "0")])
+            return
+        status, headers, body = upload_append_response(token, self.headers, self.rfile)
+        if status != 204:
+            # The body may be partly unread, so the connection cannot be reused
+            self.close_connection = True
+        self.respond(status, headers, body)
+
+    def do_GET(self):
+        self.serve(send_body=True)
+
+    def serve(self, send_body):
+        parsed = urlparse(self.path)
+        status, headers, path, start, length = file_response(parsed.path, parsed.query, self.headers)
+        self.respond(status, headers)
+        if not send_body or path is None:
+            return
+        try:
+            for chunk in read_file(path, start, length):
+                self.wfile.write(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            # Browsers routinely abort range requests while seeking
+            pass
+
+
+def start_media_server(host, port):
+    """Start the media server in a daemon thread, returns the server or None if the port is taken"""
+    try:
+        server = ThreadingHTTPServer((host, port), MediaRequestHandler)
+    except OSError as e:
+        print(f"⚠️ Media server not started on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="media-server", daemon=True)
+    thread.start()
+    print(f"✅ Media server listening on {host}:{port}")
+    return server
+
+
+def is_mounted():
+    """True once asgi_routes() has been mounted on the app's own server"""
+    return _mounted
+
+
+class _BlockingBody:
+    """read(n) over an ASGI request body, for upload handlers running in a worker thread"""
+
+    def __init__(self, request):
+        self._chunks = request.stream()
+        self._pending = b""
+
+    async def _next_chunk(self):
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    def read(self, size):
+        import anyio.from_thread
+        while len(self._pending) < size:
+            chunk = anyio.from_thread.run(self._next_chunk)
+            if chunk is None:
+                break
+            self._pending += chunk
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+
+def asgi_routes(prefix=MOUNT_PATH):
+    """Starlette routes serving /media/ and /uploads/ under prefix. File reads
+    and upload appends block, so they run in worker threads"""
+    global _mounted
+    from starlette.concurrency import run_in_threadpool
+    from starlette.responses import Response, StreamingResponse
+    from starlette.routing import Route
+
+    def url_path(request):
+        # resolve_path unquotes, so route on the path as the client sent it
+        raw = request.scope.get("raw_path")
+        path = raw.decode("latin-1") if raw else quote(request.url.path)
+        return path[len(prefix):]
+
+    def response(status, headers, body=b""):
+        return Response(body, status_code=status, headers=dict(headers + CORS_HEADERS))
+
+    async def media(request):
+        if request.method == "OPTIONS":
+            return response(204, PREFLIGHT_HEADERS)
+        status, headers, path, start, length = await run_in_threadpool(
+            file_response, url_path(request), request.url.query, request.headers
+        )
+        if request.method == "HEAD" or path is None:
+            return response(status, headers)
+        return StreamingResponse(read_file(path, start, length), status_code=status,
+                                 headers=dict(headers + CORS_HEADERS))
+
+    async def upload(request):
+        token = request.path_params["token"]
+        if request.method == "OPTIONS":
+            return response(204, PREFLIGHT_HEADERS)
+        if not _upload_handler:
+            return response(404, [])
+        if request.method == "HEAD":
+            return response(*await run_in_threadpool(upload_status_response, token))
+        return response(*await run_in_threadpool(
+            upload_append_response, token, request.headers, _BlockingBody(request)
+        ))
+
+    _mounted = True
+    return [
+        Route(prefix + "/media/{path:path}", media, methods=["GET", "HEAD", "OPTIONS"]),
+        Route(prefix + "/uploads/{token}", upload, methods=["HEAD", "PATCH", "OPTIONS"]),
+    ]
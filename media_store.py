@@ -0,0 +1,173 @@
+import os
+import re
+import time
+import hashlib
+import shutil
+
+# =============== CONTENT-ADDRESSED MEDIA STORE ===============
+# Blobs live under <root>/<aa>/<bb>/<sha256><ext>. Song files in media/songs
+# and media/lyrics_images are hard links to blobs, so identical uploads share
+# one copy on disk and the existing name-based lookups keep working. The link
+# count doubles as a reference count for garbage collection.
+
+CHUNK_SIZE = 1024 * 1024
+# A blob stored moments ago may not be linked to its song yet
+ORPHAN_GRACE_SECONDS = 3600
+_blob_relpath_re = re.compile(r"^([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})\.[a-z0-9]{1,5}$")
+# link_blob's temp name; older versions could leave one behind
+_temp_link_re = re.compile(r"^\.[0-9a-f]{64}\.\d+\.tmp$")
+
+_store_root = None
+
+
+def init_store(root):
+    global _store_root
+    _store_root = os.path.abspath(root)
+    os.makedirs(_store_root, exist_ok=True)
+    return _store_root
+
+
+def store_root():
+    return _store_root
+
+
+def blob_relpath(key, ext):
+    return os.path.join(key[:2], key[2:4], f"{key}{ext.lower()}")
+
+
+def is_blob_relpath(relpath):
+    """True for "aa/bb/<sha256><ext>" (a finished blob), False for anything
+    else in the store such as upload parts or temp files"""
+    return bool(_blob_relpath_re.match(relpath))
+
+
+def blob_path(key, ext):
+    return os.path.join(_store_root, blob_relpath(key, ext))
+
+
+def _commit_blob(temp_path, key, ext):
+    """Move a fully written temp file into place, or drop it if the blob exists"""
+    final_path = blob_path(key, ext)
+    if os.path.exists(final_path):
+        os.remove(temp_path)
+        return final_path
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.chmod(temp_path, 0o444)
+    os.replace(temp_path, final_path)
+    return final_path
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def put_temp_file(path, ext):
+    """Move a finished file from inside the store (e.g. an upload part) into
+    place without copying it. Returns the blob key"""
+    key = hash_file(path)
+    _commit_blob(path, key, ext)
+    return key
+
+
+def link_blob(key, ext, dest_path):
+    """Atomically point dest_path at a blob (hard link, falling back to a copy)"""
+    source = blob_path(key, ext)
+    if os.path.exists(dest_path) and os.path.samefile(source, dest_path):
+        # Renaming a link over another link to the same inode is a no-op
+        # that would leave the temp link behind
+        return dest_path
+    dest_dir = os.path.dirname(dest_path)
+    temp_path = os.path.join(dest_dir, f".{key}.{os.getpid()}.tmp")
+    if os.path.lexists(temp_path):
+        os.remove(temp_path)
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        # Different filesystem: a private copy still keeps the store consistent
+        shutil.copy2(source, temp_path)
+    # Replacing the name never touches the old inode, so other links stay intact
+    os.replace(temp_path, dest_path)
+    return dest_path
+
+
+def adopt_file(path, key=None):
+    """Move an existing file into the store and replace it with a link. Returns the blob key"""
+    ext = os.path.splitext(path)[1]
+    key = key or hash_file(path)
+    final_path = blob_path(key, ext)
+    if not os.path.exists(final_path):
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        try:
+            os.link(path, final_path)
+        except OSError:
+            shutil.copy2(path, final_path)
+        os.chmod(final_path, 0o444)
+    link_blob(key, ext, path)
+    return key
+
+
+def changed_at(path):
+    """When the file behind path last changed, for comparing derived files
+    against their source. ctime too: relinking a name to an older stored blob
+    changes only that"""
+    stat = os.stat(path)
+    return max(stat.st_mtime, stat.st_ctime)
+
+
+def release_blob(key, ext):
+    """Delete a blob once nothing links to it any more. Returns True if removed"""
+    path = blob_path(key, ext)
+    try:
+        if os.stat(path).st_nlink <= 1:
+            os.remove(path)
+            return True
+    except OSError:
+        pass
+    return False
+
+
+def dedupe_directory(directory):
+    """Fold every file in a directory into the store. Returns (files, bytes_saved)"""
+    files = 0
+    saved = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if _temp_link_re.match(name) and os.stat(path).st_ctime < time.time() - ORPHAN_GRACE_SECONDS:
+            # A leftover link keeps its blob alive; sweep_orphans can then reclaim it
+            os.remove(path)
+            continue
+        if not os.path.isfile(path) or name.startswith("."):
+            continue
+        ext = os.path.splitext(name)[1]
+        size = os.path.getsize(path)
+        key = hash_file(path)
+        already_stored = os.path.exists(blob_path(key, ext))
+        if already_stored and os.path.samefile(path, blob_path(key, ext)):
+            continue
+        adopt_file(path, key)
+        files += 1
+        if already_stored:
+            saved += size
+    return files, saved
+
+
+def sweep_orphans(now=None):
+    """Delete blobs nothing links to any more (a song file replaced outside
+    the store's bookkeeping). Returns (blobs, bytes_freed)"""
+    now = now or time.time()
+    removed = freed = 0
+    for dirpath, _, names in os.walk(_store_root):
+        for name in names:
+            path = os.path.join(dirpath, name)
+            if not is_blob_relpath(os.path.relpath(path, _store_root).replace(os.sep, "/")):
+                continue
+            stat = os.stat(path)
+            if stat.st_nlink <= 1 and stat.st_ctime < now - ORPHAN_GRACE_SECONDS:
+                os.remove(path)
+                removed += 1
+                freed += stat.st_size
+    return removed, freed
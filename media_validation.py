@@ -0,0 +1,288 @@
+import os
+import struct
+from mp3_info import parse_frame_header, id3v2_size, find_first_frame, parse_xing, parse_vbri
+
+# =============== STREAMING MEDIA VALIDATION ===============
+# Uploads are checked chunk by chunk as they arrive, before anything touches
+# ffmpeg: MP3s must start with confirmed MPEG audio frames in the accepted
+# codec parameters and keep frame sync to the end, their duration must fall
+# inside the allowed bounds, and images must be real JPEG/PNG files of a
+# sane size that decode. A validator sees every byte exactly once, so a bad
+# upload is rejected within the first chunk (or at the last byte for a
+# truncated file) at no extra I/O. validate_file() runs the same checks over
+# a file already on disk, e.g. before the ingest worker encodes it.
+
+MIN_SONG_SECONDS = float(os.getenv("MIN_SONG_SECONDS", "5"))
+MAX_SONG_SECONDS = float(os.getenv("MAX_SONG_SECONDS", "1800"))
+MIN_SAMPLE_RATE = 16000
+MIN_BITRATE = 32000
+# Contiguous bytes without a valid frame before the stream counts as corrupt
+# (trailing ID3v1/APE tags and the odd damaged frame stay well below this)
+MAX_JUNK_BYTES = 64 * 1024
+MAX_JUNK_RATIO = 0.02
+# A Xing/Info/VBRI tag states the frame count; a file with fewer than this
+# share of them present was cut short
+MIN_TAG_FRAME_SHARE = 0.9
+# How much of the start of a file may precede the first frame / image size
+HEADER_WINDOW = 64 * 1024
+IMAGE_HEADER_WINDOW = 1024 * 1024
+MIN_IMAGE_SIDE = 16
+MAX_IMAGE_SIDE = 8192
+MAX_IMAGE_PIXELS = 40 * 1000 * 1000
+
+
+class ValidationError(Exception):
+    """The media is not acceptable; the message is shown to the uploader"""
+
+
+class Mp3Validator:
+    """Incremental MPEG audio check: first frame, codec parameters, frame sync, duration"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0         # file offset of buffer[0]
+        self.skip = None          # ID3 tag bytes still to skip
+        self.audio_start = None   # file offset of the first frame
+        self.header = None
+        self.tag_frames = None    # frame count from a Xing/Info/VBRI tag
+        self.tag_trim = 0
+        self.frames = 0
+        self.samples = 0
+        self.junk = 0
+        self.junk_run = 0
+
+    def feed(self, data):
+        self.buffer += data
+        if self.audio_start is None:
+            self._find_start(final=False)
+        if self.audio_start is not None:
+            self._walk(final=False)
+
+    def _find_start(self, final):
+        if self.skip is None:
+            if len(self.buffer) < 10 and not final:
+                return
+            self.skip = id3v2_size(bytes(self.buffer[:10]))
+        if self.skip:
+            # The ID3 tag (often album art) is skipped, never buffered
+            dropped = min(self.skip, len(self.buffer))
+            del self.buffer[:dropped]
+            self.skip -= dropped
+            self.position += dropped
+            if self.skip:
+                if final:
+                    raise ValidationError("Truncated MP3: the file ends inside its ID3 tag")
+                return
+        if len(self.buffer) < HEADER_WINDOW and not final:
+            return
+        frame_offset, header = find_first_frame(bytes(self.buffer[:HEADER_WINDOW]), 0)
+        if header is None:
+            raise ValidationError("Not an MP3 file: no MPEG audio frames found")
+        if header["layer"] != 3:
+            raise ValidationError(f"MPEG layer {header['layer']} audio is not MP3")
+        if header["sample_rate"] < MIN_SAMPLE_RATE:
+            raise ValidationError(f"Sample rate {header['sample_rate']} Hz is too low")
+        if header["bitrate"] < MIN_BITRATE:
+            raise ValidationError(f"Bitrate {header['bitrate'] // 1000} kbps is too low")
+
+        self.header = header
+        first_frame = bytes(self.buffer[frame_offset:frame_offset + header["length"]])
+        tag = parse_xing(first_frame, 0, header) or parse_vbri(first_frame, 0)
+        if tag:
+            self.tag_frames = tag["frames"]
+            self.tag_trim = tag["delay"] + tag["padding"]
+        del self.buffer[:frame_offset]
+        self.position += frame_offset
+        self.audio_start = self.position
+
+    def _walk(self, final):
+        data = self.buffer
+        offset = 0
+        end = len(data) - 4
+        sample_rate = self.header["sample_rate"]
+        while offset <= end:
+            header = parse_frame_header(data, offset)
+            if header and header["sample_rate"] == sample_rate and header["layer"] == 3:
+                if offset + header["length"] > len(data) and not final:
+                    break  # frame continues in the next chunk
+                self.frames += 1
+                self.samples += header["samples"]
+                self.junk_run = 0
+                offset += header["length"]
+                continue
+            # Lost sync: skip to the next candidate header
+            next_sync = data.find(b"\xff", offset + 1, end + 1)
+            skipped = (next_sync if next_sync >= 0 else end + 1) - offset
+            self.junk += skipped
+            self.junk_run += skipped
+            if self.junk_run > MAX_JUNK_BYTES:
+                raise ValidationError(
+                    f"Corrupt MP3: lost frame sync at byte {self.position + offset}")
+            if next_sync < 0:
+                offset = end + 1
+                break
+            offset = next_sync
+        del data[:offset]
+        self.position += offset
+
+    def finish(self):
+        if self.audio_start is None:
+            self._find_start(final=True)
+        self._walk(final=True)
+        if not self.frames:
+            raise ValidationError("Not an MP3 file: no MPEG audio frames found")
+        audio_bytes = self.position - self.audio_start
+        if audio_bytes and self.junk / audio_bytes > MAX_JUNK_RATIO:
+            raise ValidationError("Corrupt MP3: too many damaged frames")
+
+        if self.tag_frames and self.frames < self.tag_frames * MIN_TAG_FRAME_SHARE:
+            raise ValidationError(
+                f"Truncated MP3: {self.frames} of {self.tag_frames} audio frames are present")
+        if self.tag_frames and abs(self.tag_frames - self.frames) <= max(2, self.frames // 100):
+            samples = self.tag_frames * self.header["samples"] - self.tag_trim
+        else:
+            # No tag, or a stale tag that counts fewer frames than are present
+            samples = self.samples
+        duration = max(samples, 0) / self.header["sample_rate"]
+        if duration < MIN_SONG_SECONDS:
+            raise ValidationError(f"Audio is only {duration:.1f} s long")
+        if duration > MAX_SONG_SECONDS:
+            raise ValidationError(
+                f"Audio is {duration / 60:.0f} min long, the limit is {MAX_SONG_SECONDS / 60:.0f} min")
+        return {
+            "codec": "mp3",
+            "duration": duration,
+            "sample_rate": self.header["sample_rate"],
+            "channels": self.header["channels"],
+            "frames": self.frames,
+        }
+
+
+class ImageValidator:
+    """Incremental JPEG/PNG check: signature, dimensions, decodability"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.head = bytearray()
+        self.tail = b""
+        self.format = None
+        self.size = None
+
+    def feed(self, data):
+        if self.size is None:
+            self.head += data[:IMAGE_HEADER_WINDOW]
+            self._parse_head(final=False)
+        self.tail = (self.tail + bytes(data[-64:]))[-64:]
+
+    def _parse_head(self, final):
+        head = bytes(self.head)
+        if self.format is None and len(head) >= 8:
+            if head.startswith(b"\x89PNG\r\n\x1a\n"):
+                self.format = "png"
+            elif head.startswith(b"\xff\xd8\xff"):
+                self.format = "jpeg"
+            else:
+                raise ValidationError("Not a JPEG or PNG image")
+        if self.format == "png" and len(head) >= 24:
+            if head[12:16] != b"IHDR":
+                raise ValidationError("Corrupt PNG: missing IHDR header")
+            self._check_size(*struct.unpack(">II", head[16:24]))
+        elif self.format == "jpeg":
+            size = jpeg_dimensions(head)
+            if size:
+                self._check_size(*size)
+        if self.size is None and (final or len(head) >= IMAGE_HEADER_WINDOW):
+            raise ValidationError("Image dimensions not found")
+
+    def _check_size(self, width, height):
+        if min(width, height) < MIN_IMAGE_SIDE or max(width, height) > MAX_IMAGE_SIDE:
+            raise ValidationError(f"Image is {width}x{height}, sides must be {MIN_IMAGE_SIDE}-{MAX_IMAGE_SIDE} px")
+        if width * height > MAX_IMAGE_PIXELS:
+            raise ValidationError(f"Image is {width}x{height}, too many pixels")
+        self.size = (width, height)
+        self.head = bytearray()
+
+    def finish(self):
+        if self.size is None:
+            self._parse_head(final=True)
+        # Cameras often append data after the end marker and decoders ignore
+        # it, so a missing trailer is only reported; decoding is the real check
+        tail = self.tail.rstrip(b"\x00")
+        trailer = b"IEND\xaeB`\x82" if self.format == "png" else b"\xff\xd9"
+        if not tail.endswith(trailer):
+            print(f"⚠️ {self.format.upper()} image has data after its end marker, or is truncated")
+        if self.path:
+            decode_image(self.path)
+        return {"format": self.format, "width": self.size[0], "height": self.size[1]}
+
+
+def jpeg_dimensions(data):
+    """(width, height) from the first SOF marker, or None if it is not in data yet"""
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            raise ValidationError("Corrupt JPEG: bad marker")
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            offset += 1  # fill byte
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+        segment_length = struct.unpack(">H", data[offset + 2:offset + 4])[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if offset + 9 > len(data):
+                return None
+            height, width = struct.unpack(">HH", data[offset + 5:offset + 9])
+            return width, height
+        if marker in (0xD9, 0xDA):
+            raise ValidationError("Corrupt JPEG: no frame header")
+        offset += 2 + segment_length
+    return None
+
+
+def decode_image(path):
+    """Fully decode the image with Pillow so a damaged body is caught too"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return
+    try:
+        with Image.open(path) as img:
+            img.load()
+    except Exception as e:
+        raise ValidationError(f"Image cannot be decoded: {e}")
+
+
+VALIDATORS = {
+    ".mp3": Mp3Validator,
+    ".jpg": ImageValidator,
+    ".jpeg": ImageValidator,
+    ".png": ImageValidator,
+}
+
+
+def validator_for(ext, path=None):
+    """A fresh streaming validator for files with this extension, or None"""
+    cls = VALIDATORS.get(ext.lower())
+    if cls is ImageValidator:
+        return cls(path)
+    return cls() if cls else None
+
+
+def validate_file(path, chunk_size=HEADER_WINDOW):
+    """Run the streaming checks over a file on disk. Returns the info dict,
+    raises ValidationError"""
+    validator = validator_for(os.path.splitext(path)[1], path)
+    if validator is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                validator.feed(chunk)
+    except OSError as e:
+        raise ValidationError(f"Cannot read {os.path.basename(path)}: {e}")
+    return validator.finish()
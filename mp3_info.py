@@ -0,0 +1,233 @@
+import os
+import struct
+
+# =============== PURE-PYTHON MP3 HEADER PARSER ===============
+# Reads only the ID3 tag size, the first frame header and the Xing/Info or
+# VBRI tag to get an exact duration without ffprobe or decoding. Files without
+# a tag are measured by walking frame headers (no decoding either).
+
+# Bitrates in kbps keyed by (MPEG version group, layer); version group 1 is
+# MPEG-1, 2 is MPEG-2 and MPEG-2.5
+BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# Sample rates keyed by the 2-bit version field: 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+SAMPLE_RATES = {
+    3: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    0: [11025, 12000, 8000],
+}
+
+HEADER_PROBE_BYTES = 64 * 1024
+RESYNC_WINDOW = 4096
+
+
+def parse_frame_header(data, offset=0):
+    """Decode a 4-byte MPEG audio frame header, returns a dict or None"""
+    if offset + 4 > len(data):
+        return None
+    b0, b1, b2, b3 = data[offset], data[offset + 1], data[offset + 2], data[offset + 3]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version_bits = (b1 >> 3) & 0x03
+    layer_bits = (b1 >> 1) & 0x03
+    bitrate_index = (b2 >> 4) & 0x0F
+    sample_rate_index = (b2 >> 2) & 0x03
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        # Reserved values, or free-format bitrate which cannot be sized
+        return None
+
+    layer = 4 - layer_bits
+    version_group = 1 if version_bits == 3 else 2
+    bitrate = BITRATES[(version_group, layer)][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version_bits][sample_rate_index]
+    padding = (b2 >> 1) & 0x01
+    channel_mode = (b3 >> 6) & 0x03
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 2 or version_group == 1:
+        samples = 1152
+        length = 144 * bitrate // sample_rate + padding
+    else:
+        samples = 576
+        length = 72 * bitrate // sample_rate + padding
+
+    return {
+        "version": version_group if version_bits != 0 else 2.5,
+        "layer": layer,
+        "bitrate": bitrate,
+        "sample_rate": sample_rate,
+        "channels": 1 if channel_mode == 3 else 2,
+        "samples": samples,
+        "length": length,
+    }
+
+
+def id3v2_size(data):
+    """Total size of a leading ID3v2 tag (0 if there is none)"""
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def find_first_frame(data, start):
+    """Offset of the first frame header confirmed by the header that follows it"""
+    offset = start
+    end = len(data) - 4
+    while offset < end:
+        offset = data.find(b"\xff", offset, end)
+        if offset < 0:
+            return None, None
+        header = parse_frame_header(data, offset)
+        if header:
+            next_offset = offset + header["length"]
+            following = parse_frame_header(data, next_offset)
+            # A lone false sync is common inside album art and padding
+            if next_offset >= end or (following and following["sample_rate"] == header["sample_rate"]):
+                return offset, header
+        offset += 1
+    return None, None
+
+
+def xing_offset(header):
+    """Where the Xing/Info tag sits after the header (depends on side info size)"""
+    if header["version"] == 1:
+        side_info = 17 if header["channels"] == 1 else 32
+    else:
+        side_info = 9 if header["channels"] == 1 else 17
+    return 4 + side_info
+
+
+def parse_xing(data, frame_offset, header):
+    """Frame count and encoder delay/padding from a Xing/Info (+LAME) tag"""
+    offset = frame_offset + xing_offset(header)
+    tag = data[offset:offset + 4]
+    if tag not in (b"Xing", b"Info"):
+        return None
+    flags = struct.unpack(">I", data[offset + 4:offset + 8])[0]
+    position = offset + 8
+    frames = None
+    audio_bytes = None
+    if flags & 0x1:
+        frames = struct.unpack(">I", data[position:position + 4])[0]
+        position += 4
+    if flags & 0x2:
+        audio_bytes = struct.unpack(">I", data[position:position + 4])[0]
+        position += 4
+    if flags & 0x4:
+        position += 100
+    if flags & 0x8:
+        position += 4
+
+    delay = padding = 0
+    lame = data[position:position + 36]
+    if len(lame) == 36 and lame[:4] in (b"LAME", b"Lavc", b"Lavf"):
+        # 12-bit encoder delay and padding at byte 21 of the LAME extension
+        delay = (lame[21] << 4) | (lame[22] >> 4)
+        padding = ((lame[22] & 0x0F) << 8) | lame[23]
+
+    if not frames:
+        return None
+    return {"frames": frames, "bytes": audio_bytes, "delay": delay, "padding": padding,
+            "vbr": tag == b"Xing"}
+
+
+def parse_vbri(data, frame_offset):
+    """Frame count from a Fraunhofer VBRI tag (always 32 bytes after the header)"""
+    offset = frame_offset + 36
+    if data[offset:offset + 4] != b"VBRI":
+        return None
+    audio_bytes, frames = struct.unpack(">II", data[offset + 10:offset + 18])
+    if not frames:
+        return None
+    return {"frames": frames, "bytes": audio_bytes, "delay": 0, "padding": 0, "vbr": True}
+
+
+def scan_frames(f, start, audio_end):
+    """Walk frame headers from start to audio_end, seeking from one header to
+    the next so only the 4 header bytes of each frame are read.
+    Returns (frames, samples, bytes, vbr)"""
+    frames = samples = audio_bytes = 0
+    bitrates = set()
+    offset = start
+    while offset + 4 <= audio_end:
+        f.seek(offset)
+        header = parse_frame_header(f.read(4))
+        if not header:
+            # Lost sync (junk or a truncated frame): resynchronise on the next 0xFF
+            f.seek(offset + 1)
+            window = f.read(min(RESYNC_WINDOW, audio_end - offset - 1))
+            next_sync = window.find(b"\xff")
+            if not window:
+                break
+            offset += 1 + (next_sync if next_sync >= 0 else len(window))
+            continue
+        frames += 1
+        bitrates.add(header["bitrate"])
+        samples += header["samples"]
+        audio_bytes += header["length"]
+        offset += header["length"]
+    return frames, samples, audio_bytes, len(bitrates) > 1
+
+
+def mp3_info(path):
+    """Duration and stream parameters of an MP3 file without decoding it, or None"""
+    try:
+        file_size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            head = f.read(10)
+            tag_size = id3v2_size(head)
+            f.seek(tag_size)
+            data = f.read(HEADER_PROBE_BYTES)
+            frame_offset, header = find_first_frame(data, 0)
+            if header is None:
+                return None
+
+            audio_start = tag_size + frame_offset
+            audio_end = file_size
+            f.seek(max(file_size - 128, 0))
+            if f.read(3) == b"TAG":
+                audio_end -= 128
+
+            tag = parse_xing(data, frame_offset, header)
+            method = "xing"
+            if not tag:
+                tag = parse_vbri(data, frame_offset)
+                method = "vbri"
+            if tag:
+                samples = tag["frames"] * header["samples"] - tag["delay"] - tag["padding"]
+                duration = max(samples, 0) / header["sample_rate"]
+                audio_bytes = tag["bytes"] or (audio_end - audio_start)
+                vbr = tag["vbr"]
+            else:
+                frames, samples, audio_bytes, vbr = scan_frames(f, audio_start, audio_end)
+                if not frames:
+                    return None
+                duration = samples / header["sample_rate"]
+                method = "scan"
+
+        bitrate = int(audio_bytes * 8 / duration) if duration > 0 else header["bitrate"]
+        return {
+            "codec": "mp3",
+            "duration": duration,
+            "bitrate": bitrate,
+            "sample_rate": header["sample_rate"],
+            "channels": header["channels"],
+            "vbr": vbr,
+            "method": method,
+        }
+    except (OSError, struct.error, ValueError, IndexError) as e:
+        print(f"⚠️ MP3 header parse failed for {os.path.basename(path)}: {e}")
+        return None
+
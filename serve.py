@@ -0,0 +1,18 @@
+import streamlit as st
+import media_routes
+import media_server
+import media_store
+import uploads
+from settings import store_dir
+
+# =============== SINGLE-PORT ENTRY POINT ===============
+# `streamlit run serve.py` runs app.py with the media and upload routes
+# mounted on Streamlit's own server under media_server.MOUNT_PATH, so songs,
+# images and uploads share the page's origin and port ($PORT on Render).
+# The routes and the upload table are set up here, before any page has run,
+# so a resumed upload or a cached player answers straight after a restart.
+
+media_store.init_store(store_dir)
+uploads.init_upload_db()
+media_routes.register()
+app = st.App("app.py", routes=media_server.asgi_routes())
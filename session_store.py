@@ -0,0 +1,133 @@
+import os
+import time
+import atexit
+import threading
+import db
+
+# =============== COALESCED SESSION PERSISTENCE ===============
+# Reruns call save() constantly; only a change to one of SESSION_FIELDS (or
+# an idle heartbeat so last_active stays fresh) queues a write. A background
+# thread flushes queued rows in one transaction every FLUSH_INTERVAL seconds
+# and periodically deletes idle sessions, so the rerun itself never waits on
+# the disk and the table only holds recently active sessions.
+
+SESSION_FIELDS = ("user", "role", "page", "selected_song")
+FLUSH_INTERVAL = 2.0
+TOUCH_INTERVAL = 300
+PRUNE_INTERVAL = 3600
+SESSION_TTL = int(os.getenv("SESSION_TTL_DAYS", "30")) * 86400
+GUEST_SESSION_TTL = int(os.getenv("GUEST_SESSION_TTL_HOURS", "24")) * 3600
+
+_lock = threading.Lock()
+_pending = {}
+_written = {}
+_wake = threading.Event()
+_thread = None
+_last_prune = 0.0
+
+
+def init_session_store():
+    with db.transaction() as conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS sessions
+                        (session_id TEXT PRIMARY KEY,
+                         user TEXT,
+                         role TEXT,
+                         page TEXT,
+                         selected_song TEXT,
+                         last_active TIMESTAMP)''')
+        # Older rows stored datetime text, which never compares below a number
+        conn.execute('''UPDATE sessions SET last_active = CAST(strftime('%s', last_active) AS REAL)
+                        WHERE typeof(last_active) = 'text' ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_last_active ON sessions (last_active)')
+
+
+def save(session_id, values):
+    """Queue a write if the session changed or its last write is getting old"""
+    row = tuple(values.get(field) for field in SESSION_FIELDS)
+    now = time.time()
+    with _lock:
+        previous = _written.get(session_id)
+        if previous and previous[0] == row and now - previous[1] < TOUCH_INTERVAL:
+            return False
+        _written[session_id] = (row, now)
+        _pending[session_id] = (row, now)
+    return True
+
+
+def load(session_id):
+    """Session fields as a dict, including writes that are still queued"""
+    with _lock:
+        queued = _pending.get(session_id)
+    if queued:
+        return dict(zip(SESSION_FIELDS, queued[0]))
+    row = db.query_one('SELECT user, role, page, selected_song FROM sessions WHERE session_id = ?',
+                       (session_id,))
+    if not row:
+        return None
+    with _lock:
+        # Seed the change detector so an unchanged first save() is skipped
+        _written.setdefault(session_id, (row, time.time()))
+    return dict(zip(SESSION_FIELDS, row))
+
+
+def flush():
+    """Write every queued session in one transaction. Returns the row count"""
+    with _lock:
+        batch = list(_pending.items())
+        _pending.clear()
+    if not batch:
+        return 0
+    try:
+        db.executemany('''INSERT OR REPLACE INTO sessions
+                          (session_id, user, role, page, selected_song, last_active)
+                          VALUES (?, ?, ?, ?, ?, ?)''',
+                       [(session_id, *row, last_active) for session_id, (row, last_active) in batch])
+    except Exception as e:
+        print(f"Flush sessions error: {e}")
+        with _lock:
+            # Keep the rows for the next flush unless newer values arrived
+            for session_id, entry in batch:
+                _pending.setdefault(session_id, entry)
+        return 0
+    return len(batch)
+
+
+def prune(now=None):
+    """Delete idle sessions; guests expire sooner than signed-in users"""
+    now = now or time.time()
+    try:
+        cursor = db.execute('''DELETE FROM sessions
+                               WHERE last_active < ?
+                                  OR (last_active < ? AND (role IS NULL OR role = 'guest'))''',
+                            (now - SESSION_TTL, now - GUEST_SESSION_TTL))
+        removed = cursor.rowcount
+    except Exception as e:
+        print(f"Prune sessions error: {e}")
+        return 0
+    with _lock:
+        for session_id in [sid for sid, (_, seen) in _written.items() if seen < now - GUEST_SESSION_TTL]:
+            del _written[session_id]
+    return removed
+
+
+def _run():
+    global _last_prune
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        flush()
+        if time.time() - _last_prune > PRUNE_INTERVAL:
+            _last_prune = time.time()
+            prune()
+
+
+def start_session_writer():
+    """Start the background flusher once per process"""
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return _thread
+        _thread = threading.Thread(target=_run, name="session-writer", daemon=True)
+        _thread.start()
+    atexit.register(flush)
+    return _thread
@@ -0,0 +1,12 @@
+import os
+
+# Base directories, shared by the Streamlit app and the ingest workers
+base_dir = os.getcwd()
+media_dir = os.path.join(base_dir, "media")
+songs_dir = os.path.join(media_dir, "songs")
+lyrics_dir = os.path.join(media_dir, "lyrics_images")
+logo_dir = os.path.join(media_dir, "logo")
+shared_links_dir = os.path.join(media_dir, "shared_links")
+store_dir = os.path.join(media_dir, "store")
+metadata_path = os.path.join(media_dir, "song_metadata.json")
+session_db_path = os.path.join(base_dir, "session_data.db")
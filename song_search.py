@@ -0,0 +1,186 @@
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+# =============== SONG SEARCH INDEX ===============
+# In-memory trigram index over song names. Names and queries go through the
+# same normalisation: Telugu script is transliterated to Latin, and spellings
+# are folded phonetically (aspirates, doubled letters, long vowels), so
+# "dammunte" finds "దమ్ముంటే" and "Dammunte"; letters of any other script
+# are kept (casefolded), so those titles match too. Words are padded before
+# trigramming so one- and two-letter queries still match word prefixes.
+# A query only touches the posting lists of its own trigrams, so latency
+# depends on the query, not on the size of the catalog. Trigram overlap
+# gives typo tolerance and the ranking.
+
+MIN_RECALL = 0.5  # share of the query's trigrams a name must contain
+
+# ---- Telugu → Latin (ITRANS-like, ASCII only) ----
+TELUGU_VOWELS = {
+    "అ": "a", "ఆ": "aa", "ఇ": "i", "ఈ": "ii", "ఉ": "u", "ఊ": "uu", "ఋ": "ru", "ౠ": "ruu",
+    "ఎ": "e", "ఏ": "ee", "ఐ": "ai", "ఒ": "o", "ఓ": "oo", "ఔ": "au",
+}
+TELUGU_VOWEL_SIGNS = {
+    "ా": "aa", "ి": "i", "ీ": "ii", "ు": "u", "ూ": "uu", "ృ": "ru", "ౄ": "ruu",
+    "ె": "e", "ే": "ee", "ై": "ai", "ొ": "o", "ో": "oo", "ౌ": "au",
+}
+TELUGU_CONSONANTS = {
+    "క": "k", "ఖ": "kh", "గ": "g", "ఘ": "gh", "ఙ": "ng",
+    "చ": "ch", "ఛ": "chh", "జ": "j", "ఝ": "jh", "ఞ": "ny",
+    "ట": "t", "ఠ": "th", "డ": "d", "ఢ": "dh", "ణ": "n",
+    "త": "t", "థ": "th", "ద": "d", "ధ": "dh", "న": "n",
+    "ప": "p", "ఫ": "ph", "బ": "b", "భ": "bh", "మ": "m",
+    "య": "y", "ర": "r", "ఱ": "r", "ల": "l", "ళ": "l", "వ": "v",
+    "శ": "sh", "ష": "sh", "స": "s", "హ": "h",
+}
+TELUGU_LABIALS = set("పఫబభమ")
+VIRAMA = "్"
+ANUSVARA = "ం"
+OTHER_SIGNS = {"ః": "h", "ఁ": "n"}
+
+
+def transliterate_telugu(text):
+    out = []
+    length = len(text)
+    for i, ch in enumerate(text):
+        following = text[i + 1] if i + 1 < length else ""
+        if ch in TELUGU_CONSONANTS:
+            out.append(TELUGU_CONSONANTS[ch])
+            # Inherent 'a' unless a vowel sign or virama follows
+            if following not in TELUGU_VOWEL_SIGNS and following != VIRAMA:
+                out.append("a")
+        elif ch in TELUGU_VOWEL_SIGNS:
+            out.append(TELUGU_VOWEL_SIGNS[ch])
+        elif ch in TELUGU_VOWELS:
+            out.append(TELUGU_VOWELS[ch])
+        elif ch == ANUSVARA:
+            # Pronounced as the nasal of the following consonant
+            if following in TELUGU_CONSONANTS and following not in TELUGU_LABIALS:
+                out.append("n")
+            else:
+                out.append("m")
+        elif ch in OTHER_SIGNS:
+            out.append(OTHER_SIGNS[ch])
+        elif ch == VIRAMA:
+            continue
+        elif "౦" <= ch <= "౯":
+            out.append(str(ord(ch) - 0x0C66))
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+# ---- Phonetic folding of romanised spellings ----
+FOLD_RULES = [
+    (re.compile(r"c(?!h)"), "k"),
+    (re.compile(r"chh|ch"), "c"),
+    (re.compile(r"([kgjtdpb])h"), r"\1"),
+    (re.compile(r"sh"), "s"),
+    (re.compile(r"ph|f"), "p"),
+    (re.compile(r"w"), "v"),
+    (re.compile(r"z"), "j"),
+    (re.compile(r"q"), "k"),
+    (re.compile(r"x"), "ks"),
+    (re.compile(r"(.)\1+"), r"\1"),  # doubled consonants and long vowels
+]
+
+
+def normalize(text):
+    """Casefold, transliterate and phonetically fold into space-separated words.
+    Letters of other scripts are kept as they are, so any title stays searchable"""
+    text = unicodedata.normalize("NFC", text or "").casefold()
+    text = transliterate_telugu(text)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[\W_]+", " ", text)
+    for pattern, replacement in FOLD_RULES:
+        text = pattern.sub(replacement, text)
+    return text.strip()
+
+
+def trigrams(normalized):
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+# ---- Index ----
+_lock = threading.Lock()
+_postings = defaultdict(set)
+_entries = {}
+
+
+def _add(name):
+    normalized = normalize(name)
+    grams = trigrams(normalized)
+    _entries[name] = (normalized, grams)
+    for gram in grams:
+        _postings[gram].add(name)
+
+
+def _remove(name):
+    normalized, grams = _entries.pop(name)
+    for gram in grams:
+        posting = _postings.get(gram)
+        if posting is not None:
+            posting.discard(name)
+            if not posting:
+                del _postings[gram]
+
+
+def sync(song_names):
+    """Bring the index in line with the current song list (only the difference is indexed)"""
+    wanted = set(song_names)
+    with _lock:
+        current = set(_entries)
+        for name in current - wanted:
+            _remove(name)
+        for name in wanted - current:
+            _add(name)
+
+
+def search(query, song_names, limit=None):
+    """Ranked names from song_names matching query (all of them, unchanged, for an empty query).
+    Every match is returned unless a limit is given; the lists paginate them"""
+    if not query or not query.strip():
+        return list(song_names)
+    allowed = song_names if isinstance(song_names, (set, frozenset)) else set(song_names)
+    with _lock:
+        # catalog_index keeps the index in sync; this only catches stragglers
+        missing = allowed.difference(_entries)
+        for name in missing:
+            _add(name)
+
+    normalized_query = normalize(query)
+    query_grams = trigrams(normalized_query)
+    if not query_grams:
+        return []
+    min_shared = max(1, int(len(query_grams) * MIN_RECALL + 0.999))
+
+    with _lock:
+        hits = defaultdict(int)
+        for gram in query_grams:
+            for name in _postings.get(gram, ()):
+                hits[name] += 1
+        candidates = [(name, shared, _entries[name]) for name, shared in hits.items()
+                      if shared >= min_shared and name in allowed]
+
+    query_words = normalized_query.split()
+    ranked = []
+    for name, shared, (normalized, grams) in candidates:
+        recall = shared / len(query_grams)
+        # Dice similarity, with bonuses for substring and word-prefix hits
+        score = 2 * shared / (len(query_grams) + len(grams)) + recall
+        if normalized_query in normalized:
+            score += 1.0
+        words = normalized.split()
+        if all(any(word.startswith(q) for word in words) for q in query_words):
+            score += 0.5
+        ranked.append((-score, name.lower(), name))
+
+    ranked.sort()
+    return [name for _, _, name in ranked[:limit]]
@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+import builtins
+import threading
+import db
+
+# =============== STARTUP PROFILER ===============
+# Render instances cold-start often, and the first visitor (often a guest on
+# a share link) waits for every import. app.py imports this module before
+# anything else and calls:
+#   begin_run()          at the top of every script run
+#   imports_done()       after its imports; the first call in a process is
+#                        the cold import time
+#   page_rendered(page)  at the end of a run; the first render of each page
+#                        in a process is printed and kept in startup_timings
+# With STARTUP_PROFILE=1 every module imported before imports_done() is
+# timed too (cumulative, like python -X importtime) and the slowest printed.
+
+PROFILE_IMPORTS = os.getenv("STARTUP_PROFILE", "0") == "1"
+SLOWEST_IMPORTS = 15
+KEEP_TIMINGS = 500
+
+_loaded_at = time.perf_counter()
+_lock = threading.Lock()
+_local = threading.local()
+_import_ms = None
+_rendered_pages = set()
+_module_times = {}
+_original_import = None
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    started = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _module_times.setdefault(name, (time.perf_counter() - started) * 1000)
+
+
+if PROFILE_IMPORTS:
+    _original_import = builtins.__import__
+    builtins.__import__ = _timed_import
+
+
+def init_profile_db():
+    db.execute('''CREATE TABLE IF NOT EXISTS startup_timings
+                  (recorded_at REAL,
+                   pid INTEGER,
+                   page TEXT,
+                   cold INTEGER,
+                   import_ms REAL,
+                   render_ms REAL)''')
+
+
+def begin_run():
+    _local.started = time.perf_counter()
+    _local.imported = None
+    _local.cold = False
+
+
+def imports_done():
+    """Mark the end of app.py's imports for this run"""
+    global _import_ms
+    now = time.perf_counter()
+    _local.imported = now
+    if _import_ms is not None:
+        return
+    with _lock:
+        if _import_ms is not None:
+            return
+        _import_ms = (now - _loaded_at) * 1000
+        _local.cold = True
+        print(f"⏱️ Cold start imports: {_import_ms:.0f} ms")
+        if PROFILE_IMPORTS:
+            builtins.__import__ = _original_import
+            slowest = sorted(_module_times.items(), key=lambda item: item[1], reverse=True)
+            for name, ms in slowest[:SLOWEST_IMPORTS]:
+                print(f"   {ms:8.1f} ms  {name}")
+
+
+def page_rendered(page):
+    """Record the first complete render of page in this process"""
+    started = getattr(_local, "started", None)
+    if started is None:
+        return
+    now = time.perf_counter()
+    imported = _local.imported or started
+    cold = _local.cold
+    _local.started = None
+    with _lock:
+        if page in _rendered_pages:
+            return
+        _rendered_pages.add(page)
+
+    import_ms = (imported - started) * 1000
+    if cold:
+        # The cold run started when this module was imported
+        import_ms = _import_ms
+    render_ms = (now - imported) * 1000
+    print(f"⏱️ First render of {page}: {render_ms:.0f} ms"
+          f" (imports {import_ms:.0f} ms{', cold start' if cold else ''})")
+    try:
+        with db.transaction() as conn:
+            conn.execute('INSERT INTO startup_timings VALUES (?, ?, ?, ?, ?, ?)',
+                         (time.time(), os.getpid(), page, int(cold), import_ms, render_ms))
+            conn.execute('''DELETE FROM startup_timings WHERE rowid <=
+                            (SELECT MAX(rowid) FROM startup_timings) - ?''', (KEEP_TIMINGS,))
+    except Exception as e:
+        print(f"⚠️ Could not save startup timing: {e}")
+
+
+def process_import_ms():
+    """Cold import time of this process, or None before the first run"""
+    return _import_ms
+
+
+def recent_timings(limit=50):
+    """Latest first renders, newest first, as dicts"""
+    rows = db.query('''SELECT recorded_at, pid, page, cold, import_ms, render_ms
+                       FROM startup_timings ORDER BY rowid DESC LIMIT ?''', (limit,))
+    return [
+        {"recorded_at": recorded_at, "pid": pid, "page": page, "cold": bool(cold),
+         "import_ms": import_ms, "render_ms": render_ms}
+        for recorded_at, pid, page, cold, import_ms, render_ms in rows
+    ]
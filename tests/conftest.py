@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# settings.py derives every path (media/, session_data.db) from the working
+# directory when it is first imported, so the tests run in an empty one
+os.chdir(tempfile.mkdtemp(prefix="singalong-tests-"))
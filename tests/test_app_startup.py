@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from conftest import ROOT
+
+testing = pytest.importorskip("streamlit.testing.v1")
+
+import db
+import session_store
+from settings import session_db_path
+
+
+def test_first_run_creates_tables_and_starts_session_writer(monkeypatch):
+    # Neither MEDIA_BASE_URL nor serve.py's mounted routes: the app still runs
+    monkeypatch.delenv("MEDIA_BASE_URL", raising=False)
+    monkeypatch.setenv("MEDIA_PORT", "0")
+    monkeypatch.setenv("INGEST_WORKERS", "0")
+    assert not os.path.exists(session_db_path)
+
+    app = testing.AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=30).run()
+
+    assert not app.exception
+    assert not app.error
+    tables = {name for (name,) in db.query("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table in ("sessions", "uploads", "startup_timings", "metadata", "shared_links",
+                  "song_blobs", "jobs", "song_locks"):
+        assert table in tables
+    assert session_store._thread is not None and session_store._thread.is_alive()
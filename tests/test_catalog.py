@@ -0,0 +1,14 @@
+import catalog
+import db
+
+
+def test_catalog_writes_prune_the_journal_as_they_go():
+    catalog.init_catalog_db()
+    writes = catalog.JOURNAL_RETENTION + 2 * catalog.JOURNAL_PRUNE_EVERY
+    db.executemany("INSERT OR REPLACE INTO metadata (song_name, processed) VALUES (?, 0)",
+                   [(f"song {i % 50}",) for i in range(writes)])
+
+    latest = catalog.latest_change_seq()
+    assert latest >= writes
+    retained = latest - catalog.oldest_change_seq() + 1
+    assert catalog.JOURNAL_RETENTION <= retained < catalog.JOURNAL_RETENTION + catalog.JOURNAL_PRUNE_EVERY
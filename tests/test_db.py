@@ -0,0 +1,35 @@
+import threading
+
+import db
+
+
+def test_short_lived_threads_reuse_pooled_connections(monkeypatch):
+    db.query("SELECT 1")
+    opened = []
+    real_open = db._open
+    monkeypatch.setattr(db, "_open", lambda path: opened.append(path) or real_open(path))
+
+    # Streamlit runs each rerun's script on a fresh thread
+    for _ in range(20):
+        thread = threading.Thread(target=db.query, args=("SELECT 1",))
+        thread.start()
+        thread.join()
+
+    assert opened == []
+
+
+def test_other_threads_do_not_join_an_open_transaction():
+    db.execute("CREATE TABLE IF NOT EXISTS pool_check (value INTEGER)")
+    seen = []
+
+    def read():
+        seen.append(db.query("SELECT COUNT(*) FROM pool_check")[0][0])
+
+    with db.transaction() as conn:
+        conn.execute("INSERT INTO pool_check (value) VALUES (1)")
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+
+    assert seen == [0]
+    assert db.query("SELECT COUNT(*) FROM pool_check")[0][0] == 1
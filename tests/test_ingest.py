@@ -0,0 +1,37 @@
+import os
+
+import db
+import ingest
+import media_store
+from settings import store_dir
+
+
+def test_forget_song_drops_fingerprint_probes_and_blobs(tmp_path):
+    ingest.init_ingest_db()
+    media_store.init_store(store_dir)
+    source = tmp_path / "song_original.mp3"
+    source.write_bytes(b"not really audio")
+    blob_key = ingest.store_media_file(str(source), "song", "original")
+    ingest.save_processing_fingerprint("song", "abc")
+    ingest.save_media_probe(str(source), os.stat(source), dict.fromkeys(ingest.PROBE_FIELDS))
+    os.remove(source)
+
+    ingest.forget_song("song", [str(source)])
+
+    assert ingest.load_processing_fingerprint("song") is None
+    assert ingest.load_song_blobs_from_db("song") == {}
+    assert db.query("SELECT path FROM media_probes") == []
+    assert not os.path.exists(media_store.blob_path(blob_key, ".mp3"))
+
+
+def test_catalog_actions_queue_one_job_per_song_for_the_workers():
+    ingest.init_ingest_db()
+
+    assert ingest.enqueue_jobs(["first", "second"], "probe") == 2
+    ingest.run_worker(once=True)
+
+    jobs = [job for job in ingest.list_jobs() if job["kind"] == "probe"]
+    assert sorted(job["song_name"] for job in jobs) == ["first", "second"]
+    assert {job["status"] for job in jobs} == {"done"}
+    assert set(ingest.JOB_HANDLERS) >= {"ingest", "reprocess", "probe", "loudness",
+                                         "alignment", "waveform", "images"}
@@ -0,0 +1,52 @@
+import media_server
+
+
+def test_signed_routes_refuse_unsigned_and_forged_urls(tmp_path):
+    (tmp_path / "song_original.mp3").write_bytes(b"ID3" + b"\0" * 100)
+    media_server.register_route("songs", str(tmp_path), signed=True)
+    url = "/media/songs/song_original.mp3"
+
+    assert media_server.file_response(url, "v=1", {})[0] == 403
+    forged = media_server.sign_url("/media/songs/other_original.mp3")
+    assert media_server.file_response(url, f"v=1&{forged}", {})[0] == 403
+    assert media_server.file_response(url, f"v=1&{media_server.sign_url(url)}", {})[0] == 200
+
+
+def test_signature_expires_and_directory_scope_covers_only_its_files():
+    package = "/media/songs/song_original_64k_segments/"
+    query = media_server.sign_url(package + "manifest.json", scope=package, now=0)
+
+    assert media_server.signature_valid(package + "seg_00003.mp3", query, now=0)
+    assert not media_server.signature_valid("/media/songs/other_segments/seg_00003.mp3", query, now=0)
+    assert not media_server.signature_valid(package + "seg_00003.mp3", query,
+                                            now=3 * media_server.SIGNED_URL_TTL)
+
+
+def test_parse_range():
+    assert media_server.parse_range("bytes=0-99", 1000) == (0, 99)
+    assert media_server.parse_range("bytes=500-", 1000) == (500, 999)
+    assert media_server.parse_range("bytes=900-5000", 1000) == (900, 999)
+    assert media_server.parse_range("bytes=-100", 1000) == (900, 999)
+    assert media_server.parse_range("bytes=-5000", 1000) == (0, 999)
+    # Unsatisfiable
+    assert media_server.parse_range("bytes=1000-", 1000) is False
+    assert media_server.parse_range("bytes=-0", 1000) is False
+    assert media_server.parse_range("bytes=50-10", 1000) is False
+    # Absent, multi-range or malformed: the whole file
+    assert media_server.parse_range(None, 1000) is None
+    assert media_server.parse_range("bytes=0-1,5-9", 1000) is None
+    assert media_server.parse_range("items=0-1", 1000) is None
+
+
+def test_range_request_is_partial_content(tmp_path):
+    (tmp_path / "song_original.mp3").write_bytes(bytes(range(256)) * 4)
+    media_server.register_route("songs", str(tmp_path), signed=True)
+    url = "/media/songs/song_original.mp3"
+    query = media_server.sign_url(url)
+
+    status, headers, _, start, length = media_server.file_response(url, query, {"Range": "bytes=100-199"})
+    assert (status, start, length) == (206, 100, 100)
+    assert dict(headers)["Content-Range"] == "bytes 100-199/1024"
+
+    status, headers, _, _, _ = media_server.file_response(url, query, {"Range": "bytes=2000-"})
+    assert status == 416 and dict(headers)["Content-Range"] == "bytes */1024"
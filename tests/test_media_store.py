@@ -0,0 +1,39 @@
+import os
+
+import ingest
+import media_store
+from settings import store_dir
+
+
+def test_replacing_a_stored_rendition_releases_the_old_blob(tmp_path):
+    ingest.init_ingest_db()
+    media_store.init_store(store_dir)
+    rendition = tmp_path / "song_original_64k.mp3"
+    rendition.write_bytes(b"first encode")
+    first = ingest.store_media_file(str(rendition), "song", "original_64k")
+    assert os.listdir(tmp_path) == ["song_original_64k.mp3"]
+
+    # A re-encode replaces the file (os.replace), then is stored again
+    (tmp_path / "new.mp3").write_bytes(b"second encode")
+    os.replace(tmp_path / "new.mp3", rendition)
+    second = ingest.store_media_file(str(rendition), "song", "original_64k")
+
+    assert not os.path.exists(media_store.blob_path(first, ".mp3"))
+    assert os.path.samefile(rendition, media_store.blob_path(second, ".mp3"))
+
+
+def test_sweep_removes_only_unlinked_blobs_past_the_grace_period(tmp_path):
+    media_store.init_store(store_dir)
+    kept = tmp_path / "kept.png"
+    kept.write_bytes(b"kept")
+    kept_key = media_store.adopt_file(str(kept))
+    orphan = tmp_path / "orphan.png"
+    orphan.write_bytes(b"orphan")
+    orphan_key = media_store.adopt_file(str(orphan))
+    os.remove(orphan)
+
+    assert media_store.sweep_orphans()[0] == 0
+    later = os.stat(media_store.blob_path(orphan_key, ".png")).st_ctime + media_store.ORPHAN_GRACE_SECONDS + 1
+    assert media_store.sweep_orphans(now=later) == (1, len(b"orphan"))
+    assert os.path.exists(media_store.blob_path(kept_key, ".png"))
+    assert not os.path.exists(media_store.blob_path(orphan_key, ".png"))
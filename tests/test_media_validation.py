@@ -0,0 +1,89 @@
+import struct
+
+import pytest
+
+import media_validation
+from media_validation import ValidationError
+from test_mp3_info import frame, id3_tag, info_frame
+
+SECONDS_PER_FRAME = 1152 / 44100
+
+
+def stream(validator, data, chunk_size):
+    for i in range(0, len(data), chunk_size):
+        validator.feed(data[i:i + chunk_size])
+    return validator.finish()
+
+
+def png(width, height):
+    ihdr = struct.pack(">II", width, height) + b"\x08\x02\x00\x00\x00"
+    return (b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + ihdr + b"\0" * 4
+            + b"\0" * 100 + b"IEND\xaeB`\x82")
+
+
+def jpeg(width, height):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\0" + b"\0" * 9
+    sof = b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, height, width, 1) + b"\x01\x11\x00"
+    return b"\xff\xd8" + app0 + sof + b"\0" * 100 + b"\xff\xd9"
+
+
+@pytest.mark.parametrize("chunk_size", [7, 1000, 1 << 20])
+def test_mp3_result_does_not_depend_on_chunking(chunk_size):
+    data = id3_tag(3000) + frame() * 300
+
+    info = stream(media_validation.Mp3Validator(), data, chunk_size)
+
+    assert info["frames"] == 300
+    assert info["duration"] == pytest.approx(300 * SECONDS_PER_FRAME)
+
+
+def test_mp3_with_info_tag_uses_the_gapless_length():
+    data = info_frame(300, 576, 1000) + frame() * 299
+    info = stream(media_validation.Mp3Validator(), data, 4096)
+    assert info["duration"] == pytest.approx((300 * 1152 - 1576) / 44100)
+
+
+def test_mp3_cut_short_of_its_info_tag_is_truncated():
+    data = info_frame(1000, 0, 0) + frame() * 299
+    with pytest.raises(ValidationError, match="Truncated"):
+        stream(media_validation.Mp3Validator(), data, 4096)
+
+
+def test_non_mp3_is_rejected_within_the_first_window():
+    validator = media_validation.Mp3Validator()
+    with pytest.raises(ValidationError, match="Not an MP3"):
+        validator.feed(b"RIFF" + b"\x01" * media_validation.HEADER_WINDOW)
+
+
+def test_mp3_duration_bounds():
+    with pytest.raises(ValidationError, match="only"):
+        stream(media_validation.Mp3Validator(), frame() * 50, 4096)
+
+
+def test_long_run_of_junk_is_corrupt():
+    data = frame() * 100 + b"\x01" * (media_validation.MAX_JUNK_BYTES + 1000) + frame() * 300
+    with pytest.raises(ValidationError, match="Corrupt"):
+        stream(media_validation.Mp3Validator(), data, 4096)
+
+
+def test_image_dimensions_are_read_from_the_header():
+    assert stream(media_validation.ImageValidator(), png(360, 480), 5) == \
+        {"format": "png", "width": 360, "height": 480}
+    assert stream(media_validation.ImageValidator(), jpeg(1200, 1600), 5) == \
+        {"format": "jpeg", "width": 1200, "height": 1600}
+
+
+def test_images_of_the_wrong_kind_or_size_are_rejected():
+    with pytest.raises(ValidationError, match="Not a JPEG or PNG"):
+        media_validation.ImageValidator().feed(b"GIF89a" + b"\0" * 100)
+    with pytest.raises(ValidationError, match="sides must be"):
+        media_validation.ImageValidator().feed(png(8, 8))
+    with pytest.raises(ValidationError, match="sides must be"):
+        media_validation.ImageValidator().feed(jpeg(10000, 100))
+
+
+def test_validate_file_picks_the_validator_by_extension(tmp_path):
+    path = tmp_path / "song_original.mp3"
+    path.write_bytes(frame() * 300)
+    assert media_validation.validate_file(str(path))["frames"] == 300
+    assert media_validation.validate_file(str(tmp_path / "notes.txt")) is None
@@ -0,0 +1,72 @@
+import struct
+
+import pytest
+
+from mp3_info import id3v2_size, mp3_info, parse_frame_header
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, joint stereo, no padding
+HEADER = b"\xff\xfb\x90\x44"
+FRAME_LENGTH = 144 * 128000 // 44100
+
+
+def frame(body=b""):
+    return HEADER + body + b"\0" * (FRAME_LENGTH - 4 - len(body))
+
+
+def id3_tag(payload_size):
+    size = bytes((payload_size >> shift) & 0x7F for shift in (21, 14, 7, 0))
+    return b"ID3\x03\x00\x00" + size + b"\0" * payload_size
+
+
+def info_frame(frames, delay, padding):
+    """An Info (CBR Xing) frame with a LAME extension, as encoders write it"""
+    lame = bytearray(b"LAME3.100".ljust(36, b"\0"))
+    lame[21] = delay >> 4
+    lame[22] = (delay & 0x0F) << 4 | padding >> 8
+    lame[23] = padding & 0xFF
+    # Side info of a stereo MPEG-1 frame is 32 bytes
+    return frame(b"\0" * 32 + b"Info" + struct.pack(">II", 0x1, frames) + bytes(lame))
+
+
+def test_frame_header_fields():
+    header = parse_frame_header(HEADER)
+    assert header["version"] == 1 and header["layer"] == 3
+    assert header["bitrate"] == 128000 and header["sample_rate"] == 44100
+    assert header["channels"] == 2 and header["samples"] == 1152
+    assert header["length"] == FRAME_LENGTH
+    # Reserved sample rate index
+    assert parse_frame_header(b"\xff\xfb\x9c\x44") is None
+
+
+def test_id3v2_size_is_syncsafe():
+    assert id3v2_size(id3_tag(300)) == 310
+    assert id3v2_size(b"\xff\xfb\x90\x44" + b"\0" * 6) == 0
+
+
+def test_info_tag_gives_exact_duration_without_scanning(tmp_path):
+    path = tmp_path / "song.mp3"
+    path.write_bytes(id3_tag(500) + info_frame(1000, 576, 1000) + frame() * 20)
+
+    info = mp3_info(str(path))
+
+    assert info["method"] == "xing"
+    assert info["duration"] == pytest.approx((1000 * 1152 - 576 - 1000) / 44100)
+    assert info["sample_rate"] == 44100 and info["channels"] == 2 and not info["vbr"]
+
+
+def test_untagged_file_is_measured_by_walking_frames(tmp_path):
+    path = tmp_path / "song.mp3"
+    # A trailing ID3v1 tag is not audio
+    path.write_bytes(id3_tag(100) + frame() * 50 + b"TAG" + b"\0" * 125)
+
+    info = mp3_info(str(path))
+
+    assert info["method"] == "scan"
+    assert info["duration"] == pytest.approx(50 * 1152 / 44100)
+    assert info["bitrate"] == pytest.approx(128000, rel=0.01)
+
+
+def test_non_mp3_returns_none(tmp_path):
+    path = tmp_path / "song.mp3"
+    path.write_bytes(b"not audio at all" * 100)
+    assert mp3_info(str(path)) is None
@@ -0,0 +1,78 @@
+import os
+import json
+import shutil
+import subprocess
+
+import pytest
+
+import ingest
+from mp3_info import parse_frame_header, parse_xing
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+
+def make_mp3(path, seconds=20):
+    """A tagged CBR MP3 with a Xing/Info frame, like a typical upload"""
+    subprocess.run(
+        ['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+         '-c:a', 'libmp3lame', '-b:a', '128k', '-metadata', 'title=Test Song',
+         '-id3v2_version', '3', '-y', path],
+        check=True
+    )
+
+
+@needs_ffmpeg
+def test_segments_after_the_first_are_bare_mpeg_frames(tmp_path):
+    source = str(tmp_path / "song.mp3")
+    make_mp3(source)
+    output_dir = str(tmp_path / "song_segments")
+
+    assert ingest.package_audio_segments(source, output_dir)
+
+    with open(os.path.join(output_dir, ingest.SEGMENT_MANIFEST)) as f:
+        segments = json.load(f)["segments"]
+    assert len(segments) >= 3
+    for segment in segments[1:]:
+        with open(os.path.join(output_dir, segment["file"]), "rb") as f:
+            data = f.read(4096)
+        assert not data.startswith(b"ID3"), segment["file"]
+        header = parse_frame_header(data, 0)
+        assert header is not None, f"{segment['file']} does not start with a frame sync"
+        assert parse_xing(data, 0, header) is None, f"{segment['file']} starts with a Xing/Info frame"
+
+
+def fake_segmenter(durations):
+    """Stands in for ffmpeg's segment muxer: writes the segment files and CSV list"""
+    def run(cmd, **kwargs):
+        output_dir = os.path.dirname(cmd[-1])
+        start = 0.0
+        with open(cmd[cmd.index('-segment_list') + 1], "w") as csv:
+            for i, duration in enumerate(durations):
+                name = f"seg_{i:05d}.mp3"
+                with open(os.path.join(output_dir, name), "wb") as f:
+                    f.write(b"\xff" * (100 + i))
+                csv.write(f"{name},{start:.6f},{start + duration:.6f}\n")
+                start += duration
+        return subprocess.CompletedProcess(cmd, 0, b"", b"")
+    return run
+
+
+def test_manifests_describe_the_segments_and_replace_the_old_package(tmp_path, monkeypatch):
+    output_dir = tmp_path / "song_segments"
+    output_dir.mkdir()
+    (output_dir / "stale.mp3").write_bytes(b"old")
+    monkeypatch.setattr(ingest.subprocess, "run", fake_segmenter([10.0, 10.0, 4.5]))
+
+    assert ingest.package_audio_segments(str(tmp_path / "song.mp3"), str(output_dir))
+
+    with open(output_dir / ingest.SEGMENT_MANIFEST) as f:
+        manifest = json.load(f)
+    assert manifest["duration"] == 24.5
+    assert [(s["file"], s["start"], s["duration"], s["bytes"]) for s in manifest["segments"]] == [
+        ("seg_00000.mp3", 0.0, 10.0, 100), ("seg_00001.mp3", 10.0, 10.0, 101),
+        ("seg_00002.mp3", 20.0, 4.5, 102)]
+    playlist = (output_dir / "index.m3u8").read_text().splitlines()
+    assert playlist[-3:] == ["#EXTINF:4.500,", "seg_00002.mp3", "#EXT-X-ENDLIST"]
+    assert set(os.listdir(output_dir)) == {"index.m3u8", ingest.SEGMENT_MANIFEST,
+                                           "seg_00000.mp3", "seg_00001.mp3", "seg_00002.mp3"}
+    assert os.listdir(tmp_path) == ["song_segments"]
@@ -0,0 +1,34 @@
+import song_search
+
+SONGS = ["దమ్ముంటే", "Dammunte Pattuko", "Chukkalle Thochave", "Nee Kallu", "Samajavaragamana"]
+
+
+def test_romanised_query_finds_telugu_and_latin_titles():
+    song_search.sync(SONGS)
+    results = song_search.search("dammunte", SONGS)
+    assert set(results[:2]) == {"దమ్ముంటే", "Dammunte Pattuko"}
+
+
+def test_spelling_variants_and_typos_match():
+    song_search.sync(SONGS)
+    assert song_search.search("chukkale thochaave", SONGS)[0] == "Chukkalle Thochave"
+    assert song_search.search("samajavargamana", SONGS)[0] == "Samajavaragamana"
+
+
+def test_short_prefix_and_empty_query():
+    song_search.sync(SONGS)
+    assert song_search.search("ne", SONGS)[0] == "Nee Kallu"
+    assert song_search.search("  ", SONGS) == SONGS
+
+
+def test_results_are_limited_to_the_given_names():
+    song_search.sync(SONGS)
+    assert song_search.search("dammunte", ["Dammunte Pattuko", "Nee Kallu"]) == ["Dammunte Pattuko"]
+
+
+def test_sync_drops_removed_songs():
+    song_search.sync(SONGS)
+    song_search.sync(SONGS[1:])
+    assert "దమ్ముంటే" not in song_search._entries
+    assert not any("దమ్ముంటే" in names for names in song_search._postings.values())
+    assert song_search.search("dammunte", SONGS[1:]) == ["Dammunte Pattuko"]
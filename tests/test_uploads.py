@@ -0,0 +1,74 @@
+import io
+
+import pytest
+
+import media_store
+import uploads
+from settings import store_dir
+from test_mp3_info import frame
+
+SONG = frame() * 300
+
+
+@pytest.fixture
+def token():
+    media_store.init_store(store_dir)
+    uploads.init_upload_db()
+    token = uploads.open_upload("original", "admin")
+    yield token
+    uploads.mark_committed(token)
+
+
+def send(token, offset, data, **kwargs):
+    return uploads.append_chunk(token, offset, len(data), io.BytesIO(data), **kwargs)
+
+
+def test_chunks_assemble_the_file(token):
+    assert send(token, 0, SONG[:50000], filename="song.mp3", total_size=len(SONG)) == 50000
+    assert uploads.completed_file(token) is None
+    assert send(token, 50000, SONG[50000:]) == len(SONG)
+
+    path, upload = uploads.completed_file(token)
+    with open(path, "rb") as f:
+        assert f.read() == SONG
+    assert upload["filename"] == "song.mp3" and upload["status"] == "complete"
+
+
+def test_dropped_chunk_resumes_from_the_bytes_received(token):
+    send(token, 0, SONG[:40000], filename="song.mp3", total_size=len(SONG))
+    # The connection closes 10000 bytes into a 40000 byte chunk
+    short = io.BytesIO(SONG[40000:50000])
+    with pytest.raises(uploads.UploadError) as error:
+        uploads.append_chunk(token, 40000, 40000, short)
+    assert error.value.status == 400
+    assert uploads.status(token) == (50000, len(SONG))
+
+    with pytest.raises(uploads.UploadError) as error:
+        send(token, 40000, SONG[40000:])
+    assert error.value.status == 409
+
+    assert send(token, 50000, SONG[50000:]) == len(SONG)
+    path, _ = uploads.completed_file(token)
+    with open(path, "rb") as f:
+        assert f.read() == SONG
+
+
+def test_first_chunk_that_is_not_audio_is_rejected(token):
+    junk = b"\x01" * 70000
+    with pytest.raises(uploads.UploadError) as error:
+        send(token, 0, junk, filename="song.mp3", total_size=len(junk))
+    assert error.value.status == 422
+    # The slot stays open for another try
+    assert uploads.status(token) == (0, None)
+
+
+def test_start_checks_the_declared_file(token):
+    with pytest.raises(uploads.UploadError) as error:
+        send(token, 0, SONG[:1000], filename="song.wav", total_size=len(SONG))
+    assert error.value.status == 415
+    with pytest.raises(uploads.UploadError) as error:
+        send(token, 0, SONG[:1000], filename="song.mp3", total_size=500)
+    assert error.value.status == 413
+    with pytest.raises(uploads.UploadError) as error:
+        send(token, 1000, SONG[:1000])
+    assert error.value.status == 409
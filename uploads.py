@@ -0,0 +1,248 @@
+import os
+import time
+import secrets
+import threading
+from urllib.parse import unquote
+import db
+import media_store
+import media_validation
+
+# =============== RESUMABLE UPLOADS ===============
+# Large files are sent by the browser in chunks straight to the media server
+# (PATCH /uploads/<token> with an Upload-Offset header, HEAD to ask how much
+# has arrived), appended to a part file inside the store and, once complete,
+# moved into the content-addressed store without another copy. Memory use is
+# bounded by CHUNK_SIZE however big the file is, and a dropped connection or
+# a page reload resumes from the last byte received: each admin keeps one
+# open upload per file kind until it is committed. status() and append()
+# are the handler the media server calls for HEAD and PATCH. Every chunk is
+# fed to a media_validation validator as it is written, so a file that is not
+# real audio/image data is rejected (422) on its first chunk and a corrupt or
+# out-of-bounds one by its last; ffmpeg only ever sees validated uploads.
+
+CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_BYTES = 16 * 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "200")) * 1024 * 1024
+UPLOAD_TTL = 24 * 3600
+
+UPLOAD_KINDS = {
+    "original": (".mp3",),
+    "accompaniment": (".mp3",),
+    "lyrics": (".jpg", ".jpeg", ".png"),
+}
+
+UPLOAD_FIELDS = ("token", "kind", "owner", "filename", "ext", "size", "received", "status")
+
+_locks = {}
+_locks_guard = threading.Lock()
+_validators = {}
+
+
+class UploadError(Exception):
+    """Rejected upload request; status is the HTTP status to answer with"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def init_upload_db():
+    db.execute('''CREATE TABLE IF NOT EXISTS uploads
+                  (token TEXT PRIMARY KEY,
+                   kind TEXT,
+                   owner TEXT,
+                   filename TEXT,
+                   ext TEXT,
+                   size INTEGER,
+                   received INTEGER DEFAULT 0,
+                   status TEXT,
+                   created_at REAL,
+                   updated_at REAL)''')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_uploads_owner ON uploads (owner, kind, status)')
+    os.makedirs(_parts_dir(), exist_ok=True)
+    cleanup_uploads()
+
+
+def _parts_dir():
+    return os.path.join(media_store.store_root(), "uploads")
+
+
+def part_path(token):
+    return os.path.join(_parts_dir(), f"{token}.part")
+
+
+def _token_lock(token):
+    with _locks_guard:
+        return _locks.setdefault(token, threading.Lock())
+
+
+def get_upload(token):
+    row = db.query_one(f'SELECT {", ".join(UPLOAD_FIELDS)} FROM uploads WHERE token = ?', (token,))
+    return dict(zip(UPLOAD_FIELDS, row)) if row else None
+
+
+def open_upload(kind, owner):
+    """Token for this owner's pending upload of a kind, reused until committed"""
+    if kind not in UPLOAD_KINDS:
+        raise ValueError(f"Unknown upload kind: {kind}")
+    with db.transaction(immediate=True) as conn:
+        row = conn.execute('''SELECT token FROM uploads WHERE owner = ? AND kind = ?
+                              AND status IN ('open', 'complete') ORDER BY created_at DESC LIMIT 1''',
+                           (owner, kind)).fetchone()
+        if row:
+            return row[0]
+        token = secrets.token_urlsafe(24)
+        now = time.time()
+        conn.execute('''INSERT INTO uploads (token, kind, owner, received, status, created_at, updated_at)
+                        VALUES (?, ?, ?, 0, 'open', ?, ?)''',
+                     (token, kind, owner, now, now))
+        return token
+
+
+def append_chunk(token, offset, length, stream, filename=None, total_size=None):
+    """Append one chunk at offset (offset 0 restarts the upload). Returns the new offset"""
+    with _token_lock(token):
+        upload = get_upload(token)
+        if not upload or upload["status"] == "committed":
+            raise UploadError(404, "Unknown upload")
+        if length > MAX_CHUNK_BYTES:
+            raise UploadError(413, "Chunk too large")
+
+        if offset == 0:
+            # (Re)start: the client declares what it is sending
+            if not filename or total_size is None:
+                raise UploadError(400, "Upload-Name and Upload-Length are required")
+            ext = os.path.splitext(filename)[1].lower()
+            if ext not in UPLOAD_KINDS[upload["kind"]]:
+                raise UploadError(415, f"{ext or 'This file type'} is not accepted for {upload['kind']}")
+            if total_size <= 0 or total_size > MAX_UPLOAD_BYTES:
+                raise UploadError(413, "File is empty or too large")
+            db.execute('''UPDATE uploads SET filename = ?, ext = ?, size = ?, received = 0,
+                              status = 'open', updated_at = ? WHERE token = ?''',
+                       (os.path.basename(filename), ext, total_size, time.time(), token))
+            upload.update(filename=filename, ext=ext, size=total_size, received=0)
+        elif upload["size"] is None or offset != upload["received"] or not os.path.exists(part_path(token)):
+            raise UploadError(409, "Offset does not match the bytes received")
+
+        if offset + length > upload["size"]:
+            raise UploadError(413, "Chunk runs past the declared length")
+
+        written = 0
+        try:
+            validator = _validator(token, upload["ext"], offset)
+            with open(part_path(token), "wb" if offset == 0 else "r+b") as f:
+                # Drop anything past the recorded offset (a write cut short earlier)
+                f.seek(offset)
+                f.truncate()
+                while written < length:
+                    chunk = stream.read(min(CHUNK_SIZE, length - written))
+                    if not chunk:
+                        break
+                    validator.feed(chunk)
+                    f.write(chunk)
+                    written += len(chunk)
+            received = offset + written
+            if received == upload["size"]:
+                validator.finish()
+        except media_validation.ValidationError as e:
+            reject_upload(token)
+            raise UploadError(422, str(e))
+        if written < length:
+            # The validator has seen bytes that were not recorded; rebuild it
+            # from the part file when the client resumes
+            _validators.pop(token, None)
+        status = "complete" if received == upload["size"] else "open"
+        db.execute('UPDATE uploads SET received = ?, status = ?, updated_at = ? WHERE token = ?',
+                   (received, status, time.time(), token))
+        if written < length:
+            raise UploadError(400, "Connection closed before the chunk was complete")
+        return received
+
+
+def _validator(token, ext, offset):
+    """The streaming validator for an upload, positioned at offset"""
+    validator = _validators.get(token)
+    if offset == 0 or validator is None:
+        validator = media_validation.validator_for(ext, part_path(token))
+        if offset:
+            # Resumed after a restart or a dropped request: replay what is on disk
+            with open(part_path(token), "rb") as f:
+                remaining = offset
+                while remaining:
+                    chunk = f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    validator.feed(chunk)
+                    remaining -= len(chunk)
+        _validators[token] = validator
+    return validator
+
+
+def reject_upload(token):
+    """Discard the bytes of an upload that failed validation; the slot stays open"""
+    _validators.pop(token, None)
+    if os.path.exists(part_path(token)):
+        os.remove(part_path(token))
+    db.execute('''UPDATE uploads SET received = 0, size = NULL, status = 'open', updated_at = ?
+                  WHERE token = ?''', (time.time(), token))
+
+
+def status(token):
+    """(received, size) for the HEAD request a client sends before resuming"""
+    upload = get_upload(token)
+    if not upload or upload["status"] == "committed":
+        raise UploadError(404, "Unknown upload")
+    return upload["received"] or 0, upload["size"]
+
+
+def completed_file(token):
+    """Path and metadata of a fully received upload, or None if it is not complete"""
+    upload = get_upload(token)
+    if not upload or upload["status"] != "complete":
+        return None
+    path = part_path(token)
+    # The bytes on disk must be exactly what the client declared
+    if not os.path.exists(path) or os.path.getsize(path) != upload["size"]:
+        db.execute("UPDATE uploads SET status = 'open', received = 0 WHERE token = ?", (token,))
+        return None
+    return path, upload
+
+
+def mark_committed(token):
+    db.execute("UPDATE uploads SET status = 'committed', updated_at = ? WHERE token = ?",
+               (time.time(), token))
+    with _locks_guard:
+        _locks.pop(token, None)
+    _validators.pop(token, None)
+
+
+def cleanup_uploads(now=None):
+    """Drop abandoned uploads and their part files"""
+    now = now or time.time()
+    try:
+        stale = db.query('SELECT token FROM uploads WHERE updated_at < ?', (now - UPLOAD_TTL,))
+        for (token,) in stale:
+            _validators.pop(token, None)
+            if os.path.exists(part_path(token)):
+                os.remove(part_path(token))
+        db.executemany('DELETE FROM uploads WHERE token = ?', stale)
+    except Exception as e:
+        print(f"Cleanup uploads error: {e}")
+
+
+def parse_upload_headers(headers):
+    """Upload-Offset / Upload-Length / Upload-Name from a PATCH request"""
+    try:
+        offset = int(headers.get("Upload-Offset", ""))
+        length = int(headers.get("Content-Length", ""))
+        total = headers.get("Upload-Length")
+        total = int(total) if total else None
+    except ValueError:
+        raise UploadError(400, "Upload-Offset and Content-Length must be integers")
+    name = headers.get("Upload-Name")
+    return offset, length, unquote(name) if name else None, total
+
+
+def append(token, headers, rfile):
+    """PATCH handler for the media server: append the request body"""
+    offset, length, filename, total_size = parse_upload_headers(headers)
+    return append_chunk(token, offset, length, rfile, filename, total_size)
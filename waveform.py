@@ -0,0 +1,69 @@
+import os
+import struct
+
+# =============== WAVEFORM PEAK FILES ===============
+# Compact multi-resolution min/max peaks per track, written at ingest next
+# to the song as <song>_<track>.peaks and served by the media server, so
+# the player can draw the waveform and a scrub bar before any audio has
+# loaded. Every level splits the whole track into a fixed number of
+# buckets, so a file is a few KB whatever the song length.
+#
+# numpy is imported by the function that computes peaks, so the
+# web process can use PEAKS_SUFFIX and peaks_path() without loading it.
+#
+# Layout (little-endian):
+#   header  "SGPK", version u8, level count u8, reserved u16,
+#           sample rate u32, total samples u32
+#   levels  bucket count u32, samples per bucket u32   (finest first)
+#   data    per level, bucket_count (min, max) int8 pairs, interleaved
+
+PEAKS_MAGIC = b"SGPK"
+PEAKS_VERSION = 1
+PEAKS_SUFFIX = ".peaks"
+PEAK_RATE = 8000
+LEVEL_BUCKETS = (2048, 512, 128)
+
+
+def compute_peaks(samples, levels=LEVEL_BUCKETS):
+    """[(samples_per_bucket, int8 array of interleaved min/max)] for each level"""
+    import numpy as np
+    samples = np.asarray(samples, dtype=np.float32)
+    finest = levels[0]
+    per_bucket = max(1, -(-len(samples) // finest))
+    padded = np.zeros(per_bucket * finest, dtype=np.float32)
+    padded[:len(samples)] = samples
+    buckets = padded.reshape(finest, per_bucket)
+    mins, maxs = buckets.min(axis=1), buckets.max(axis=1)
+
+    result = []
+    for count in levels:
+        # Coarser levels fold the finest one instead of rescanning samples
+        factor = finest // count
+        level_min = mins.reshape(count, factor).min(axis=1)
+        level_max = maxs.reshape(count, factor).max(axis=1)
+        pairs = np.empty(count * 2, dtype=np.int8)
+        pairs[0::2] = np.clip(np.floor(level_min * 127), -127, 127)
+        pairs[1::2] = np.clip(np.ceil(level_max * 127), -127, 127)
+        result.append((per_bucket * factor, pairs))
+    return result
+
+
+def encode_peaks(levels, sample_rate, total_samples):
+    header = struct.pack("<4sBBHII", PEAKS_MAGIC, PEAKS_VERSION, len(levels), 0,
+                         sample_rate, total_samples)
+    table = b"".join(struct.pack("<II", len(pairs) // 2, per_bucket) for per_bucket, pairs in levels)
+    return header + table + b"".join(pairs.tobytes() for _, pairs in levels)
+
+
+def peaks_path(audio_path):
+    return os.path.splitext(audio_path)[0] + PEAKS_SUFFIX
+
+
+def write_peaks(samples, output_path, sample_rate=PEAK_RATE):
+    """Compute and atomically write a peaks file. Returns its size in bytes"""
+    data = encode_peaks(compute_peaks(samples), sample_rate, len(samples))
+    temp_path = output_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, output_path)
+    return len(data)
@@ -0,0 +1,35 @@
+import os
+import sys
+import multiprocessing
+import ingest
+
+# =============== INGEST WORKER ===============
+# Usage: python worker.py [processes]
+# Each process claims jobs from the shared queue in session_data.db, so any
+# number of workers can run next to (or instead of) the web app's own. They
+# must see the same session_data.db and media/ as the web app: the same
+# machine or a shared volume, not a separate dyno. The web app already
+# starts INGEST_WORKERS (default 1) of them itself.
+
+def main():
+    if len(sys.argv) > 1:
+        processes = int(sys.argv[1])
+    else:
+        processes = int(os.getenv("INGEST_WORKERS", "1"))
+    
+    ingest.init_ingest_db()
+    if processes <= 1:
+        ingest.run_worker()
+        return
+    
+    workers = [
+        multiprocessing.Process(target=ingest.run_worker, name=f"ingest-worker-{i}")
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+if __name__ == "__main__":
+    main()